@@ -9,6 +9,7 @@ from uvicorn import run as app_run
 from typing import Optional
 
 from travel_pack.constants import APP_HOST, APP_PORT
+from travel_pack.entity.config_entity import is_valid_run_id
 from travel_pack.pipeline.prediction_pipeline import TravelData, TravelClassifier
 from travel_pack.pipeline.training_pipeline import TrainPipeline
 
@@ -18,6 +19,9 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 templates = Jinja2Templates(directory="templates")
 
+# one classifier for the app, its model registry reads the current model pointer at most once per ttl
+model_predictor = TravelClassifier()
+
 origins = ["*"]
 
 app.add_middleware(
@@ -81,13 +85,15 @@ async def index(request: Request):
     
     
 @app.get("/train")
-async def trainRouteClient():
+async def trainRouteClient(run_id: Optional[str] = None, dry_run: bool = False):
+    if run_id is not None and not is_valid_run_id(run_id):
+        return Response(f"Invalid run id: {run_id}", status_code=400)
     try:
-        train_pipeline = TrainPipeline()
+        train_pipeline = TrainPipeline(run_id=run_id, dry_run=dry_run)
         
         train_pipeline.run_pipeline()
         
-        return Response("Training successful !!")
+        return Response(f"Training successful !! Run id: {train_pipeline.run_id}")
     
     except Exception as e:
         return Response(f"Error Occurred! {e}")
@@ -121,8 +127,6 @@ async def predictRouteClient(request: Request):
         
         travel_df = travel_data.get_travel_input_data_frame()
         
-        model_predictor = TravelClassifier()
-        
         value = model_predictor.predict(dataframe=travel_df)[0]
         
         status = None
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+from dataclasses import replace
+from unittest import mock
+
+import numpy as np
+from pandas import DataFrame
+from sklearn.datasets import make_classification
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.constants import RANDOM_STATE, SCHEMA_FILE_PATH, TARGET_COLUMN, MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+from travel_pack.entity.config_entity import DataIngestionConfig, DataTransformationConfig, DataValidationConfig, \
+    ModelTrainerConfig, ModelEvaluationConfig, training_pipeline_config, get_run_config
+from travel_pack.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
+from travel_pack.components.data_transformation import DataTransformation
+from travel_pack.components.model_evaluation import ModelEvaluation
+from travel_pack.pipeline.training_pipeline import TrainPipeline
+from travel_pack.utils.main_utils import read_yaml_file, load_object, load_numpy_array_data
+from travel_pack.utils.dtype_utils import get_schema_column_types, read_csv_with_schema
+from travel_pack.utils.drift_utils import get_dataset_drift_report, get_drift_columns, get_evidently_drift_report, \
+    compare_drift_reports, get_profile_drift_report
+from travel_pack.utils.sketch_utils import DatasetProfile, QuantileSketch
+from travel_pack.utils.split_utils import HashSplitter
+from travel_pack.utils.resampling_utils import RESAMPLING_STRATEGIES, benchmark_resampling_strategies
+from travel_pack.utils.search_utils import SEARCH_STRATEGIES, ModelSearch
+from travel_pack.utils.resource_utils import ResourceManager
+from travel_pack.utils.inference_utils import measure_inference_cost
+from travel_pack.utils.onnx_utils import convert_travel_model_to_onnx, get_prediction_agreement
+from travel_pack.entity.estimator import TravelModel, OnnxTravelModel
+
+
+def make_synthetic_travel_data(schema_config: dict, n_rows: int, missing_share: float = 0.03,
+                               random_state: int = RANDOM_STATE) -> DataFrame:
+    """
+    random data with the columns, types and value constraints of schema.yaml
+    schema_config: dict content of schema.yaml
+    n_rows: number of rows
+    missing_share: share of missing values in the nullable columns
+    random_state: seed, data of different seeds follow the same distribution
+    """
+    random_state = np.random.RandomState(random_state)
+    constraints = schema_config.get("column_constraints", {})
+    column_types = get_schema_column_types(schema_config)
+    columns = {}
+    for column, column_type in column_types.items():
+        constraint = constraints.get(column, {})
+        if "allowed" in constraint:
+            values = random_state.choice(constraint["allowed"], size=n_rows)
+        elif column_type == "category":
+            values = random_state.choice(["a", "b", "c"], size=n_rows)
+        elif column_type == "int":
+            values = random_state.randint(constraint.get("min", 0), constraint.get("max", 10) + 1, size=n_rows)
+        else:
+            low, high = constraint.get("min", 0), min(constraint.get("max", 100), 10 ** 5)
+            values = np.clip(random_state.lognormal(np.log(low + (high - low) / 4 + 1), 0.5, size=n_rows), low, high)
+        columns[column] = values
+    dataframe = DataFrame(columns)
+    for column, column_type in column_types.items():
+        if constraints.get(column, {}).get("nullable", True) and column_type != "category":
+            dataframe.loc[random_state.rand(n_rows) < missing_share, column] = np.nan
+    return dataframe
+
+
+def run_resampling_benchmark(args) -> list:
+    """
+    time and peak memory of every resampling strategy on synthetic data of increasing size,
+    with the class imbalance of the travel package data (about 19% positives)
+    """
+    results = []
+    for n_rows in args.rows:
+        X, y = make_classification(n_samples=n_rows, n_features=args.features, n_informative=args.features // 2,
+                                   weights=[0.81, 0.19], random_state=RANDOM_STATE)
+        for result in benchmark_resampling_strategies(X, y, strategies=args.strategies, n_jobs=args.n_jobs,
+                                                      approximate_neighbors=args.approximate_neighbors,
+                                                      chunk_size=args.chunk_size):
+            results.append(result)
+    return results
+
+
+def run_transformer_benchmark(args) -> list:
+    """
+    fit and transform time of the preprocessor on synthetic travel data of increasing size,
+    for every combination of n_jobs and output dtype
+    """
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    results = []
+    for n_rows in args.rows:
+        dataframe = make_synthetic_travel_data(schema_config, n_rows=n_rows)
+        dataframe = dataframe.drop(columns=[TARGET_COLUMN] + schema_config["drop_columns"])
+        for n_jobs in args.n_jobs:
+            for output_dtype in args.dtypes:
+                config = DataTransformationConfig(use_cache=False, n_jobs=n_jobs, output_dtype=output_dtype)
+                preprocessor = DataTransformation(data_ingestion_artifact=None, data_transformation_config=config,
+                                                  data_validation_artifact=None).get_data_transformer_object()
+                start_time = time.perf_counter()
+                preprocessor.fit(dataframe)
+                fit_seconds = time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                transformed = preprocessor.transform(dataframe)
+                transform_seconds = time.perf_counter() - start_time
+                results.append({"rows": n_rows, "n_jobs": n_jobs, "dtype": output_dtype,
+                                "fit_seconds": round(fit_seconds, 4), "transform_seconds": round(transform_seconds, 4),
+                                "output_mb": round(transformed.data.nbytes / 1024 ** 2, 2)})
+                logging.info(f"Transformer benchmark: {results[-1]}")
+    return results
+
+
+def run_search_benchmark(args) -> list:
+    """
+    number of fits, time and held out F1 of every search strategy for the models of model.yaml
+    """
+    model_config = read_yaml_file(file_path=MODEL_TRAINER_MODEL_CONFIG_FILE_PATH)
+    X, y = make_classification(n_samples=args.rows, n_features=args.features, n_informative=args.features // 2,
+                               random_state=RANDOM_STATE)
+    x_train, x_test, y_train, y_test = train_test_split(X, y, test_size=0.25, stratify=y, random_state=RANDOM_STATE)
+    results = []
+    for model_serial_number in args.models or list(model_config["model_selection"]):
+        for strategy in args.strategies:
+            search_config = dict(model_config.get("search", {}), strategy=strategy, n_jobs=args.n_jobs)
+            model_search = ModelSearch(model_config=dict(model_config, search=search_config))
+            model = model_search.get_model(model_serial_number)
+            param_grid = dict(model_config["model_selection"][model_serial_number]["search_param_grid"])
+            search = model_search.get_search(model, param_grid=param_grid)
+            start_time = time.perf_counter()
+            search.fit(x_train, y_train)
+            seconds = time.perf_counter() - start_time
+            n_fits = search.n_fits_ if hasattr(search, "n_fits_") else len(search.cv_results_["params"]) * search.n_splits_
+            results.append({"model": type(model).__name__, "strategy": strategy, "n_fits": n_fits,
+                            "seconds": round(seconds, 2), "cv_score": round(float(search.best_score_), 4),
+                            "test_f1": round(float(f1_score(y_test, search.best_estimator_.predict(x_test))), 4)})
+            logging.info(f"Search benchmark: {results[-1]}")
+    return results
+
+
+def run_resources_benchmark(args) -> list:
+    """
+    model search time with uncontrolled nested parallelism (parallel fits of estimators which use all cores
+    themselves, unlimited native thread pools) against the same search within the resource manager budget
+    """
+    model_config = read_yaml_file(file_path=MODEL_TRAINER_MODEL_CONFIG_FILE_PATH)
+    model_config["search"] = dict(model_config["search"], max_candidates=args.max_candidates, parallel_models=False)
+    X, y = make_classification(n_samples=args.rows, n_features=args.features, n_informative=args.features // 2,
+                               random_state=RANDOM_STATE)
+    resource_manager = ResourceManager(n_cores=args.n_cores)
+    results = []
+    for model_serial_number in args.models or list(model_config["model_selection"]):
+        model_search = ModelSearch(model_config=model_config)
+        param_grid = dict(model_config["model_selection"][model_serial_number]["search_param_grid"])
+
+        model = model_search.get_model(model_serial_number)
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=-1)
+        search = model_search.get_search(model, param_grid=param_grid, n_jobs=-1)
+        start_time = time.perf_counter()
+        search.fit(X, y)
+        unmanaged_seconds = time.perf_counter() - start_time
+
+        with resource_manager.stage("model_trainer") as n_cores:
+            start_time = time.perf_counter()
+            ModelSearch(model_config=model_config, n_jobs=n_cores).search_model(model_serial_number, X, y,
+                                                                                n_jobs=n_cores)
+            managed_seconds = time.perf_counter() - start_time
+
+        results.append({"model": type(model).__name__, "n_cores": resource_manager.n_cores,
+                        "unmanaged_seconds": round(unmanaged_seconds, 2), "managed_seconds": round(managed_seconds, 2),
+                        "speedup": round(unmanaged_seconds / managed_seconds, 2)})
+        logging.info(f"Resources benchmark: {results[-1]}")
+    return results
+
+
+def run_serving_benchmark(args) -> list:
+    """
+    prediction agreement and single row / batch latency of the pickled TravelModel against its ONNX graph
+    on ONNX Runtime, for the models of model.yaml trained on synthetic travel data
+    """
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    model_config = read_yaml_file(file_path=MODEL_TRAINER_MODEL_CONFIG_FILE_PATH)
+    dataframe = make_synthetic_travel_data(schema_config, n_rows=args.rows)
+    features = dataframe.drop(columns=[TARGET_COLUMN] + schema_config["drop_columns"])
+    x_train, x_test, y_train, y_test = train_test_split(features, dataframe[TARGET_COLUMN].astype(int),
+                                                        test_size=0.25, random_state=RANDOM_STATE)
+    preprocessor = DataTransformation(data_ingestion_artifact=None,
+                                      data_transformation_config=DataTransformationConfig(use_cache=False),
+                                      data_validation_artifact=None).get_data_transformer_object()
+    preprocessor.fit(x_train)
+    results = []
+    for model_serial_number in args.models or list(model_config["model_selection"]):
+        estimator = ModelSearch(model_config=model_config).get_model(model_serial_number)
+        travel_model = TravelModel(preprocessing_object=preprocessor,
+                                   trained_model_object=estimator.fit(preprocessor.transform(x_train), y_train))
+        onnx_model = OnnxTravelModel(convert_travel_model_to_onnx(travel_model, x_test))
+        result = {"model": type(estimator).__name__, "rows": len(x_test),
+                  "prediction_agreement": round(get_prediction_agreement(travel_model, onnx_model, x_test), 6)}
+        for backend, model in [("pickle", travel_model), ("onnx", onnx_model)]:
+            cost = measure_inference_cost(model, x_test, batch_size=args.batch_size, n_repeats=args.repeats)
+            result[f"{backend}_single_row_ms"] = round(cost.single_row_latency_ms, 3)
+            result[f"{backend}_batch_ms"] = round(cost.batch_latency_ms, 3)
+        result["onnx_size_mb"] = round(len(onnx_model.onnx_model) / 1024 ** 2, 2)
+        results.append(result)
+        logging.info(f"Serving benchmark: {results[-1]}")
+    return results
+
+
+def run_drift_parity_check(args) -> list:
+    """
+    per column test and drift decision of the native drift engine against evidently, on the train (reference)
+    and test (current) split of the travel data like data validation compares them. The reference is cut to
+    reference_rows, evidently switches from its p-value tests to distance tests on larger references.
+    Fails when a column is tested differently or the drift decisions differ
+    """
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    data_ingestion_config, data_validation_config = DataIngestionConfig(), DataValidationConfig()
+    dataframe = read_csv_with_schema(args.data_file_path, schema_config, stage="data_validation")
+    splitter = HashSplitter(key_column=data_ingestion_config.split_key_column,
+                            test_ratio=data_ingestion_config.train_test_split_ratio,
+                            stratify_column=data_ingestion_config.stratify_column)
+    reference_df, current_df = splitter.fit(dataframe).split(dataframe)
+    if len(reference_df) > args.reference_rows:
+        reference_df = reference_df.sample(n=args.reference_rows, random_state=RANDOM_STATE)
+    drift_columns = get_drift_columns(schema_config)
+    columns = [column for column in drift_columns if column in dataframe.columns]
+    drift_report = get_dataset_drift_report(reference_df, current_df, drift_columns=drift_columns,
+                                            threshold=data_validation_config.drift_threshold,
+                                            n_bins=data_validation_config.drift_n_bins)
+    results = compare_drift_reports(drift_report, get_evidently_drift_report(reference_df[columns],
+                                                                             current_df[columns]))
+    for result in results:
+        logging.info(f"Drift parity: {result}")
+    mismatches = [result["column"] for result in results if not (result["test_agrees"] and result["drift_agrees"])]
+    if mismatches:
+        raise Exception(f"Native drift tests disagree with evidently on columns {mismatches}")
+    return results
+
+
+def get_chunked_profile(dataframe: DataFrame, schema_config: dict, chunk_size: int, max_centroids: int) \
+        -> DatasetProfile:
+    profile = DatasetProfile(columns=get_drift_columns(schema_config), max_centroids=max_centroids)
+    for start in range(0, len(dataframe), chunk_size):
+        profile.update(dataframe.iloc[start:start + chunk_size])
+    return profile
+
+
+def run_sketch_drift_check(args) -> list:
+    """
+    profile drift of two synthetic datasets of the same distribution, profiled in chunks like data ingestion.
+    Fails when a column of compressed quantile sketches drifts, their drift would only come from the sketch
+    error, or when the dataset drifts. Columns of exact sketches are plain KS tests which drift by chance at
+    the drift threshold. As control the continuous column of the current data scaled by 1 + shift must drift
+    """
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    data_ingestion_config, data_validation_config = DataIngestionConfig(), DataValidationConfig()
+    profiles = [get_chunked_profile(make_synthetic_travel_data(schema_config, args.rows, random_state=random_state),
+                                    schema_config, data_ingestion_config.chunk_size,
+                                    data_ingestion_config.profile_max_centroids)
+                for random_state in [RANDOM_STATE, RANDOM_STATE + 1]]
+    compressed_columns = [column for column, sketch in profiles[0].sketches.items()
+                          if isinstance(sketch, QuantileSketch) and not sketch.is_exact]
+    if not compressed_columns:
+        raise Exception(f"No quantile sketch of {args.rows} rows is compressed")
+
+    results = []
+    for run_name, shift in [("same_distribution", 0.0), ("shifted", args.shift)]:
+        current_profile = profiles[1]
+        if shift:
+            current_df = make_synthetic_travel_data(schema_config, args.rows, random_state=RANDOM_STATE + 1)
+            current_df[compressed_columns[0]] *= 1 + shift
+            current_profile = get_chunked_profile(current_df, schema_config, data_ingestion_config.chunk_size,
+                                                  data_ingestion_config.profile_max_centroids)
+        drift_report = get_profile_drift_report(profiles[0], current_profile,
+                                                threshold=data_validation_config.drift_threshold,
+                                                drift_share=data_validation_config.drift_share,
+                                                n_bins=data_validation_config.drift_n_bins)
+        drifted_columns = [column for column, result in drift_report["columns"].items() if result["drift_detected"]]
+        results.append({"run": run_name, "rows": args.rows, "dataset_drift": drift_report["dataset_drift"],
+                        "drifted_columns": drifted_columns,
+                        "compressed_p_values": {column: round(drift_report["columns"][column]["p_value"], 4)
+                                                for column in compressed_columns}})
+        logging.info(f"Sketch drift check: {results[-1]}")
+        if not shift and (drift_report["dataset_drift"] or set(drifted_columns) & set(compressed_columns)):
+            raise Exception(f"Same distribution data drifted on columns {drifted_columns}")
+        if shift and compressed_columns[0] not in drifted_columns:
+            raise Exception(f"{compressed_columns[0]} scaled by {1 + shift} did not drift")
+    return results
+
+
+class LocalProductionModel:
+    """
+    trained model and training row keys files of an earlier run standing in for the model bucket,
+    like ModelRegistry and TravelEstimator
+    """
+
+    def __init__(self, model_file_path: str, training_row_keys_file_path: str):
+        self.model_file_path = model_file_path
+        self.training_row_keys_file_path = training_row_keys_file_path
+
+    def load_model(self) -> TravelModel:
+        return load_object(file_path=self.model_file_path)
+
+    def load_training_row_keys(self) -> np.ndarray:
+        return load_numpy_array_data(file_path=self.training_row_keys_file_path)
+
+
+def run_warm_start_check(args) -> list:
+    """
+    two training runs of the pipeline with warm_start on the travel data: the first trains from scratch on a part
+    of the train split, the second gets the first model as production model and must warm start it on the rest.
+    A third run like the second but with drift detected must fall back to a full retrain. Only the model bucket
+    is replaced by the first model file, the pipeline's own transformation and model trainer stages run. The
+    expected score is 0, a warm started model is scored on the test split without resampling and would fall
+    back on its score depending on the data
+    """
+    schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+    data_ingestion_config = DataIngestionConfig()
+    dataframe = read_csv_with_schema(args.data_file_path, schema_config, stage="data_ingestion")
+    train_df, test_df = HashSplitter(key_column=data_ingestion_config.split_key_column,
+                                     test_ratio=data_ingestion_config.train_test_split_ratio).split(dataframe)
+    first_train_df = train_df.sample(frac=1 - args.new_share, random_state=RANDOM_STATE)
+    results = []
+    with tempfile.TemporaryDirectory() as artifact_root:
+        production_model = None
+        for run_name, run_train_df, drift_status, expect_warm_start in [("full_retrain", first_train_df, False, False),
+                                                                        ("warm_start", train_df, False, True),
+                                                                        ("drift_fallback", train_df, True, False)]:
+            pipeline = TrainPipeline()
+            pipeline.data_transformation_config = get_run_config(replace(DataTransformationConfig(), use_cache=False),
+                                                                 pipeline.run_id, artifact_root)
+            pipeline.model_trainer_config = get_run_config(
+                replace(ModelTrainerConfig(), warm_start=True, export_onnx=False, expected_accuracy=0.0,
+                        model_config_profile=training_pipeline_config.dry_run_model_profile),
+                pipeline.run_id, artifact_root)
+            pipeline.model_evaluation_config = replace(ModelEvaluationConfig(), score_store_dir=None)
+            ingested_dir = os.path.join(artifact_root, pipeline.run_id, "ingested")
+            os.makedirs(ingested_dir, exist_ok=True)
+            data_ingestion_artifact = DataIngestionArtifact(trained_file_path=os.path.join(ingested_dir, "train.csv"),
+                                                            test_file_path=os.path.join(ingested_dir, "test.csv"),
+                                                            train_profile_file_path=None, test_profile_file_path=None)
+            run_train_df.to_csv(data_ingestion_artifact.trained_file_path, index=False)
+            test_df.to_csv(data_ingestion_artifact.test_file_path, index=False)
+            data_validation_artifact = DataValidationArtifact(validation_status=True, message="",
+                                                              drift_report_file_path=None,
+                                                              validation_report_file_path=None,
+                                                              drift_status=drift_status)
+
+            data_transformation_artifact = pipeline.start_data_transformation(
+                data_ingestion_artifact=data_ingestion_artifact, data_validation_artifact=data_validation_artifact)
+            with mock.patch.object(ModelEvaluation, "get_best_model", return_value=production_model):
+                model_trainer_artifact = pipeline.start_model_trainer(
+                    data_transformation_artifact=data_transformation_artifact,
+                    data_ingestion_artifact=data_ingestion_artifact,
+                    data_validation_artifact=data_validation_artifact)
+            results.append({"run": run_name, "train_rows": len(run_train_df),
+                            "is_warm_started": model_trainer_artifact.is_warm_started,
+                            "f1_score": round(model_trainer_artifact.metric_artifact.f1_score, 4)})
+            logging.info(f"Warm start check: {results[-1]}")
+            if model_trainer_artifact.is_warm_started != expect_warm_start:
+                raise Exception(f"Run {run_name} {'did not warm start' if expect_warm_start else 'warm started'}, "
+                                f"see the model trainer log")
+            if production_model is None:
+                production_model = LocalProductionModel(model_trainer_artifact.trained_model_file_path,
+                                                        model_trainer_artifact.training_row_keys_file_path)
+    return results
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmarks of the travel package training pipeline stages")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    resampling = subparsers.add_parser("resampling", help="compare resampling strategies of data transformation")
+    resampling.add_argument("--rows", type=int, nargs="+", default=[5000, 50000, 200000])
+    resampling.add_argument("--features", type=int, default=30)
+    resampling.add_argument("--strategies", nargs="+", default=RESAMPLING_STRATEGIES, choices=RESAMPLING_STRATEGIES)
+    resampling.add_argument("--n-jobs", type=int, default=-1)
+    resampling.add_argument("--approximate-neighbors", action="store_true")
+    resampling.add_argument("--chunk-size", type=int, default=None)
+    resampling.set_defaults(func=run_resampling_benchmark)
+
+    transformer = subparsers.add_parser("transformer", help="compare preprocessor n_jobs and output dtypes")
+    transformer.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    transformer.add_argument("--n-jobs", type=int, nargs="+", default=[1, -1])
+    transformer.add_argument("--dtypes", nargs="+", default=["float64", "float32"])
+    transformer.set_defaults(func=run_transformer_benchmark)
+
+    search = subparsers.add_parser("search", help="compare hyperparameter search strategies of model.yaml")
+    search.add_argument("--rows", type=int, default=6000)
+    search.add_argument("--features", type=int, default=38)
+    search.add_argument("--models", nargs="+", default=None, help="model_selection keys, e.g. module_0")
+    search.add_argument("--strategies", nargs="+", default=SEARCH_STRATEGIES, choices=SEARCH_STRATEGIES)
+    search.add_argument("--n-jobs", type=int, default=-1)
+    search.set_defaults(func=run_search_benchmark)
+
+    resources = subparsers.add_parser("resources", help="compare nested parallelism with and without core budgets")
+    resources.add_argument("--rows", type=int, default=6000)
+    resources.add_argument("--features", type=int, default=38)
+    resources.add_argument("--models", nargs="+", default=None, help="model_selection keys, e.g. module_0")
+    resources.add_argument("--max-candidates", type=int, default=9)
+    resources.add_argument("--n-cores", type=int, default=None)
+    resources.set_defaults(func=run_resources_benchmark)
+
+    serving = subparsers.add_parser("serving", help="compare pickled and ONNX Runtime inference of TravelModel")
+    serving.add_argument("--rows", type=int, default=8000)
+    serving.add_argument("--models", nargs="+", default=None, help="model_selection keys, e.g. module_0")
+    serving.add_argument("--batch-size", type=int, default=1000)
+    serving.add_argument("--repeats", type=int, default=40)
+    serving.set_defaults(func=run_serving_benchmark)
+
+    drift = subparsers.add_parser("drift", help="check the native drift tests against evidently on the travel data")
+    drift.add_argument("--data-file-path", default=os.path.join("notebooks", "Travel.csv"))
+    drift.add_argument("--reference-rows", type=int, default=1000)
+    drift.set_defaults(func=run_drift_parity_check)
+
+    sketch_drift = subparsers.add_parser("sketch_drift",
+                                         help="check that profile drift passes same distribution data of many rows")
+    sketch_drift.add_argument("--rows", type=int, default=1_000_000)
+    sketch_drift.add_argument("--shift", type=float, default=0.02)
+    sketch_drift.set_defaults(func=run_sketch_drift_check)
+
+    warm_start = subparsers.add_parser("warm_start", help="check that the pipeline warm starts the production model")
+    warm_start.add_argument("--data-file-path", default=os.path.join("notebooks", "Travel.csv"))
+    warm_start.add_argument("--new-share", type=float, default=0.3,
+                            help="share of the train rows the production model was not trained on")
+    warm_start.set_defaults(func=run_warm_start_check)
+    return parser
+
+
+if __name__ == "__main__":
+    try:
+        args = get_parser().parse_args()
+        results = args.func(args)
+        logging.info(f"Benchmark {args.benchmark} results: {results}")
+        print(json.dumps(results, indent=2))
+    except Exception as e:
+        raise TravelException(e, sys) from e
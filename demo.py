@@ -1,10 +1,19 @@
 import sys
+import argparse
 from travel_pack.exception import TravelException
 from travel_pack.logger import logging
 from travel_pack.pipeline.training_pipeline import TrainPipeline
 
+parser = argparse.ArgumentParser(description="Run the travel package training pipeline")
+parser.add_argument("--resume", metavar="RUN_ID", default=None,
+                    help="resume the run with this id (its artifact directory name) from its first unfinished stage")
+parser.add_argument("--dry-run", action="store_true",
+                    help="run every stage on a hash sample stratified on the target, with the reduced dry_run "
+                         "search of model.yaml, in artifacts/dry_run and without pushing the model")
+
 try:
-    pipeline = TrainPipeline()
+    args = parser.parse_args()
+    pipeline = TrainPipeline(run_id=args.resume, dry_run=args.dry_run)
     pipeline.run_pipeline()
 except Exception as e:
-    raise TravelException(e, sys) from e
\ No newline at end of file
+    raise TravelException(e, sys) from e
@@ -106,6 +106,73 @@ class SimpleStorageService:
         except Exception as e:
             raise TravelException(e, sys) from e
 
+    def get_object_version(self, s3_key: str, bucket_name: str) -> str:
+        """
+        Method Name :   get_object_version
+        Description :   This method reads the ETag and version id of an object without downloading it
+
+        Output      :   "<etag>:<version id>" of the object, the version id is "null" in an unversioned bucket
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the get_object_version method of S3Operations class")
+
+        try:
+            response = self.s3_client.head_object(Bucket=bucket_name, Key=s3_key)
+            etag = response["ETag"].strip('"')
+            logging.info("Exited the get_object_version method of S3Operations class")
+            return f"{etag}:{response.get('VersionId') or 'null'}"
+
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def read_object_bytes(self, s3_key: str, bucket_name: str) -> bytes:
+        """
+        Method Name :   read_object_bytes
+        Description :   This method downloads the content of an object without unpickling it
+
+        Output      :   bytes of the object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return self.read_object(self.get_file_object(s3_key, bucket_name), decode=False)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def put_object_bytes(self, content: bytes, s3_key: str, bucket_name: str) -> None:
+        """
+        Method Name :   put_object_bytes
+        Description :   This method writes content to an object in a single put, readers see either the
+                        previous or the new content
+
+        Output      :   object is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the put_object_bytes method of S3Operations class")
+
+        try:
+            self.s3_client.put_object(Bucket=bucket_name, Key=s3_key, Body=content)
+            logging.info("Exited the put_object_bytes method of S3Operations class")
+
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def remove_object(self, s3_key: str, bucket_name: str) -> None:
+        """
+        Method Name :   remove_object
+        Description :   This method deletes an object from the bucket, a missing object is no error
+
+        Output      :   object is deleted
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered the remove_object method of S3Operations class")
+
+        try:
+            self.s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+            logging.info("Exited the remove_object method of S3Operations class")
+
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def load_model(self, model_name: str, bucket_name: str, model_dir: str = None) -> object:
         """
         Method Name :   load_model
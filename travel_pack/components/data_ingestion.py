@@ -1,14 +1,23 @@
 import os
 import sys
+from contextlib import ExitStack
+from typing import Optional
 
+import pandas as pd
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 
+from travel_pack.constants import SCHEMA_FILE_PATH, RANDOM_STATE
 from travel_pack.exception import TravelException
 from travel_pack.logger import logging
 from travel_pack.entity.config_entity import DataIngestionConfig
 from travel_pack.entity.artifact_entity import DataIngestionArtifact
 from travel_pack.data_access.travel_data import TravelData
+from travel_pack.utils.main_utils import read_yaml_file, open_for_replace
+from travel_pack.utils.dtype_utils import compact_dataframe
+from travel_pack.utils.split_utils import HashSplitter
+from travel_pack.utils.sketch_utils import DatasetProfile
+from travel_pack.utils.drift_utils import get_drift_columns
 
 class DataIngestion:
     def __init__(self, data_ingestion_config: DataIngestionConfig=DataIngestionConfig()):
@@ -17,6 +26,7 @@ class DataIngestion:
         """
         try:
             self.data_ingestion_config = data_ingestion_config
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
         except Exception as e:
             raise TravelException(e, sys) from e
         
@@ -34,23 +44,114 @@ class DataIngestion:
             travel_db = TravelData()
             dataframe = travel_db.export_collection_as_dataframe(collection_name=self.data_ingestion_config.collection_name)
             logging.info(f"Shape of dataframe: {dataframe.shape}")
+            dataframe = compact_dataframe(dataframe, self._schema_config, stage="data_ingestion")
+            sampler = self.get_sampler(dataframe)
+            if sampler is not None:
+                _, dataframe = sampler.split(dataframe)
+                logging.info(f"Sampled {len(dataframe)} rows for the dry run")
             feature_store_file_path = self.data_ingestion_config.feature_store_file_path
             dir_path = os.path.dirname(feature_store_file_path)
             os.makedirs(dir_path, exist_ok=True)
             logging.info(f"Saving exported data into feature store file path: {feature_store_file_path}")
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
+            with open_for_replace(feature_store_file_path, "w", newline="") as file_obj:
+                dataframe.to_csv(file_obj, index=False, header=True)
             
             return dataframe
         except Exception as e:
             raise TravelException(e, sys) from e
         
+    def get_hash_splitter(self, split_keys: Optional[DataFrame] = None) -> HashSplitter:
+        """
+        Method Name :   get_hash_splitter
+        Description :   This method creates the hash splitter configured for data ingestion, a stratified
+                        splitter is fitted on split_keys, the key and class of every row to split
+
+        Output      :   Returns HashSplitter object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return HashSplitter(key_column=self.data_ingestion_config.split_key_column,
+                                test_ratio=self.data_ingestion_config.train_test_split_ratio,
+                                stratify_column=self.data_ingestion_config.stratify_column).fit(split_keys)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_sampler(self, split_keys: Optional[DataFrame] = None) -> Optional[HashSplitter]:
+        """
+        Method Name :   get_sampler
+        Description :   This method creates the splitter drawing the hash sample of a dry run, its "test"
+                        side is the sample, stratified like the train/test split. It hashes the split key
+                        with its own salt so the sample is independent of the train/test split. A stratified
+                        sampler is fitted on split_keys, the key and class of every row of the collection
+
+        Output      :   Returns HashSplitter object, None when the whole collection is used
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self.data_ingestion_config.sample_fraction is None:
+                return None
+            return HashSplitter(key_column=self.data_ingestion_config.split_key_column,
+                                test_ratio=self.data_ingestion_config.sample_fraction,
+                                stratify_column=self.data_ingestion_config.stratify_column,
+                                hash_key=self.data_ingestion_config.sample_hash_key).fit(split_keys)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def export_split_keys(self, travel_db: TravelData) -> Optional[DataFrame]:
+        """
+        Method Name :   export_split_keys
+        Description :   This method reads the split key and stratify column of the whole collection in a
+                        first pass over the stream, the thresholds of stratified splitters are ranked on them
+
+        Output      :   Returns DataFrame of the two columns, None when the split is not stratified
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self.data_ingestion_config.stratify_column is None:
+                return None
+            columns = [self.data_ingestion_config.split_key_column, self.data_ingestion_config.stratify_column]
+            chunks = travel_db.export_collection_as_dataframe_chunks(
+                collection_name=self.data_ingestion_config.collection_name,
+                chunk_size=self.data_ingestion_config.chunk_size, columns=columns)
+            split_keys = [compact_dataframe(chunk.reindex(columns=columns), self._schema_config, stage="data_ingestion")
+                          for chunk in chunks]
+            split_keys = pd.concat(split_keys, ignore_index=True) if split_keys else DataFrame(columns=columns)
+            logging.info(f"Read the split keys of {len(split_keys)} rows")
+            return split_keys
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_empty_profile(self) -> DatasetProfile:
+        """
+        Method Name :   get_empty_profile
+        Description :   This method creates an empty profile of the columns compared for drift
+
+        Output      :   Returns DatasetProfile object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return DatasetProfile(columns=get_drift_columns(self._schema_config),
+                                  max_centroids=self.data_ingestion_config.profile_max_centroids)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def split_data_as_train_test(self, dataframe: DataFrame) -> None:
         """
+        Method Name :   split_data_as_train_test
+        Description :   This method splits the whole dataframe into train and test csv files
+
+        Output      :   train and test csv files are written to the ingested dir
+        On Failure  :   Write an exception log and then raise an exception
         """
         logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
 
         try:
-            train_set, test_set = train_test_split(dataframe, test_size=self.data_ingestion_config.train_test_split_ratio)
+            if self.data_ingestion_config.split_mode == "hash":
+                train_set, test_set = self.get_hash_splitter(dataframe).split(dataframe)
+            else:
+                train_set, test_set = train_test_split(dataframe,
+                                                       test_size=self.data_ingestion_config.train_test_split_ratio,
+                                                       random_state=RANDOM_STATE)
             logging.info("Performed train test split on the dataframe")
             logging.info(
                 "Exited split_data_as_train_test method of Data_Ingestion class"
@@ -59,13 +160,71 @@ class DataIngestion:
             os.makedirs(dir_path, exist_ok=True)
             
             logging.info(f"Exporting train and test file path.")
-            train_set.to_csv(self.data_ingestion_config.training_file_path, index=False, header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path, index=False, header=True)
+            for dataset, file_path in [(train_set, self.data_ingestion_config.training_file_path),
+                                       (test_set, self.data_ingestion_config.testing_file_path)]:
+                with open_for_replace(file_path, "w", newline="") as file_obj:
+                    dataset.to_csv(file_obj, index=False, header=True)
             
             logging.info(f"Exported train and test file path.")
+
+            for dataset, profile_file_path in [(train_set, self.data_ingestion_config.train_profile_file_path),
+                                               (test_set, self.data_ingestion_config.test_profile_file_path)]:
+                profile = self.get_empty_profile()
+                profile.update(dataset)
+                profile.save(profile_file_path)
         except Exception as e:
             raise TravelException(e, sys) from e
     
+    def export_and_split_data_as_stream(self) -> None:
+        """
+        Method Name :   export_and_split_data_as_stream
+        Description :   This method exports mongodb data chunk by chunk, appending every chunk to the
+                        feature store file and its hash split rows to the train and test files,
+                        so the collection is never held in memory at once. The train and test
+                        profiles are sketched in the same pass. A stratified split first reads the
+                        split keys of the collection
+
+        Output      :   feature store, train and test csv files and profiles are written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        logging.info("Entered export_and_split_data_as_stream method of Data_Ingestion class")
+
+        try:
+            travel_db = TravelData()
+            split_keys = self.export_split_keys(travel_db)
+            sampler = self.get_sampler(split_keys)
+            if sampler is not None and split_keys is not None:
+                split_keys = split_keys[sampler.get_test_mask(split_keys)]
+            splitter = self.get_hash_splitter(split_keys)
+            train_profile, test_profile = self.get_empty_profile(), self.get_empty_profile()
+            output_file_paths = [self.data_ingestion_config.feature_store_file_path,
+                                 self.data_ingestion_config.training_file_path,
+                                 self.data_ingestion_config.testing_file_path]
+            chunks = travel_db.export_collection_as_dataframe_chunks(
+                collection_name=self.data_ingestion_config.collection_name,
+                chunk_size=self.data_ingestion_config.chunk_size)
+            # chunks are appended to temporary files that replace the outputs once the export is complete
+            with ExitStack() as stack:
+                output_files = [stack.enter_context(open_for_replace(file_path, "w", newline=""))
+                                for file_path in output_file_paths]
+                for chunk_number, chunk in enumerate(chunks):
+                    chunk = compact_dataframe(chunk, self._schema_config, stage="data_ingestion")
+                    if sampler is not None:
+                        _, chunk = sampler.split(chunk)
+                    train_set, test_set = splitter.split(chunk)
+                    train_profile.update(train_set)
+                    test_profile.update(test_set)
+                    for dataframe, file_obj in zip([chunk, train_set, test_set], output_files):
+                        dataframe.to_csv(file_obj, index=False, header=chunk_number == 0)
+
+            train_profile.save(self.data_ingestion_config.train_profile_file_path)
+            test_profile.save(self.data_ingestion_config.test_profile_file_path)
+
+            logging.info(f"Exported {splitter.n_train} train rows and {splitter.n_test} test rows")
+            logging.info("Exited export_and_split_data_as_stream method of Data_Ingestion class")
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def initiate_data_ingestion(self) ->DataIngestionArtifact:
         """
         Method Name :   initiate_data_ingestion
@@ -77,20 +236,27 @@ class DataIngestion:
         logging.info("Entered initiate_data_ingestion method of Data_Ingestion class")
 
         try:
-            dataframe = self.export_data_into_feature_store()
+            if self.data_ingestion_config.split_mode == "hash":
+                self.export_and_split_data_as_stream()
+
+                logging.info("Got the data from mongodb and performed hash split chunk by chunk")
+            else:
+                dataframe = self.export_data_into_feature_store()
 
-            logging.info("Got the data from mongodb")
+                logging.info("Got the data from mongodb")
 
-            self.split_data_as_train_test(dataframe)
+                self.split_data_as_train_test(dataframe)
 
-            logging.info("Performed train test split on the dataset")
+                logging.info("Performed train test split on the dataset")
 
             logging.info(
                 "Exited initiate_data_ingestion method of Data_Ingestion class"
             )
 
             data_ingestion_artifact = DataIngestionArtifact(trained_file_path=self.data_ingestion_config.training_file_path,
-            test_file_path=self.data_ingestion_config.testing_file_path)
+            test_file_path=self.data_ingestion_config.testing_file_path,
+            train_profile_file_path=self.data_ingestion_config.train_profile_file_path,
+            test_profile_file_path=self.data_ingestion_config.test_profile_file_path)
             
             logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
             return data_ingestion_artifact
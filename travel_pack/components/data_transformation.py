@@ -1,9 +1,10 @@
 import os
 import sys
+from typing import Optional
 
 import numpy as np
 import pandas as pd
-from imblearn.combine import SMOTEENN
+from scipy import sparse
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
@@ -13,29 +14,58 @@ from travel_pack.exception import TravelException
 from travel_pack.logger import logging
 from travel_pack.entity.config_entity import DataTransformationConfig
 from travel_pack.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact
-from travel_pack.constants import TARGET_COLUMN, SCHEMA_FILE_PATH, RANDOM_STATE
-from travel_pack.utils.main_utils import save_numpy_array_data, read_yaml_file, drop_columns, save_object
+from travel_pack.constants import TARGET_COLUMN, SCHEMA_FILE_PATH
+from travel_pack.utils.main_utils import save_numpy_array_data, read_yaml_file, drop_columns, save_object, \
+    save_feature_matrix
+from travel_pack.utils.dtype_utils import read_csv_with_schema
+from travel_pack.utils.cache_utils import ArtifactCache, get_file_hash, get_object_hash, link_or_copy
+from travel_pack.utils import resampling_utils, transformer_utils
+from travel_pack.utils.resampling_utils import ResamplingStage
+from travel_pack.utils.transformer_utils import DtypeCaster
+
+# parameters which change how the preprocessor runs but not what it outputs, left out of the fingerprint
+FINGERPRINT_EXCLUDED_PARAMS = ("n_jobs", "verbose")
+
+
+def get_transformation_code_version() -> str:
+    """
+    sha256 of the source files the transformation outputs depend on: this module, the custom transformers
+    and the resampling, so a change of the transformation code does not reuse cached arrays
+    """
+    return get_object_hash([get_file_hash(module_file) for module_file in
+                            [__file__, transformer_utils.__file__, resampling_utils.__file__]])
+
 
 class DataTransformation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact,
                  data_transformation_config: DataTransformationConfig,
-                 data_validation_artifact: DataValidationArtifact):
+                 data_validation_artifact: Optional[DataValidationArtifact]):
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param data_transformation_config: configuration for data transformation
+        :param data_validation_artifact: Output reference of data validation artifact stage, None when validation
+                                         runs concurrently and its status is checked before the result is used
         """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_transformation_config = data_transformation_config
             self.data_validation_artifact = data_validation_artifact
             self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._resampling_stage = ResamplingStage(
+                strategy=self.data_transformation_config.resampling_strategy,
+                n_jobs=self.data_transformation_config.resampling_n_jobs,
+                approximate_neighbors=self.data_transformation_config.resampling_approximate_neighbors,
+                chunk_size=self.data_transformation_config.resampling_chunk_size)
+            self._cache = None
+            if self.data_transformation_config.use_cache:
+                self._cache = ArtifactCache(cache_dir=self.data_transformation_config.cache_dir,
+                                            max_entries=self.data_transformation_config.cache_max_entries)
         except Exception as e:
             raise TravelException(e, sys) from e
 
-    @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_data(self, file_path) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_csv_with_schema(file_path, self._schema_config, stage="data_transformation")
         except Exception as e:
             raise TravelException(e, sys)
         
@@ -59,39 +89,64 @@ class DataTransformation:
             continuous_columns = self._schema_config['continuous_columns']
             categorical_columns = self._schema_config['categorical_columns']
             transformation_columns = self._schema_config['transform_columns']
+
+            # transform columns which are also continuous reuse the mean imputation of the continuous group
+            shared_transformation_columns = [column for column in transformation_columns
+                                             if column in continuous_columns]
+            transformation_columns = [column for column in transformation_columns
+                                      if column not in continuous_columns]
             
             logging.info(
                 "Got numerical cols,one hot cols,binary cols from schema config"
             )
 
             logging.info("Initialized Data Transformer pipeline.")
+
+            output_dtype = self.data_transformation_config.output_dtype
+
+            # numeric groups compute in float64 whatever dtype the ingestion compacted their columns to,
+            # the trees split exactly on data values, so training and serving must see the same features
+            compute_dtype = "float64"
             
             discrete_pipeline = Pipeline(
                 steps=[
+                    ("input_dtype", DtypeCaster(dtype=compute_dtype)),
                     ("imputer", SimpleImputer(strategy="most_frequent")),
                     ("scaler", StandardScaler()),
+                    ("dtype", DtypeCaster(dtype=output_dtype)),
                 ]
             ) 
             
             continuous_pipeline = Pipeline(
                 steps=[
+                    ("input_dtype", DtypeCaster(dtype=compute_dtype)),
                     ("imputer", SimpleImputer(strategy="mean")),
-                    ("scaler", StandardScaler()),
+                    ("branches", ColumnTransformer(
+                        [
+                            ("scaler", StandardScaler(), list(range(len(continuous_columns)))),
+                            ("transformer", PowerTransformer(standardize=True),
+                             [continuous_columns.index(column) for column in shared_transformation_columns]),
+                        ]
+                    )),
+                    ("dtype", DtypeCaster(dtype=output_dtype)),
                 ]
             )
             
             cat_pipeline = Pipeline(
                 steps=[
                     ("imputer", SimpleImputer(strategy="most_frequent")),
-                    ("one_hot_encoder", OneHotEncoder()),
+                    ("one_hot_encoder", OneHotEncoder(dtype=output_dtype)),
                     ("scaler", StandardScaler(with_mean=False)),
+                    ("dtype", DtypeCaster(dtype=output_dtype)),
                 ]
             )
             
             transform_pipeline = Pipeline(
                 steps=[
+                    ("input_dtype", DtypeCaster(dtype=compute_dtype)),
                     ("imputer", SimpleImputer(strategy="mean")),
                     ("transformer", PowerTransformer(standardize=True)),
+                    ("dtype", DtypeCaster(dtype=output_dtype)),
                 ]
             )
             
@@ -101,7 +156,9 @@ class DataTransformation:
                     ("continuous_pipeline", continuous_pipeline, continuous_columns),
                     ("cat_pipeline", cat_pipeline, categorical_columns),
                     ("power_transformation", transform_pipeline, transformation_columns),
-                ]
+                ],
+                sparse_threshold=self.data_transformation_config.sparse_threshold,
+                n_jobs=self.data_transformation_config.n_jobs
             )
             
             logging.info("Created preprocessor object from ColumnTransformer")
@@ -116,6 +173,113 @@ class DataTransformation:
             raise TravelException(e, sys) from e
         
     
+    def get_output_files(self) -> dict:
+        """
+        Method Name :   get_output_files
+        Description :   This method maps the cached file names to the output paths of this run
+
+        Output      :   Returns dict of file name -> file path
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            output_file_paths = [self.data_transformation_config.transformed_object_file_path,
+                                 self.data_transformation_config.transformed_train_file_path,
+                                 self.data_transformation_config.transformed_test_file_path,
+                                 self.data_transformation_config.transformed_train_target_file_path,
+                                 self.data_transformation_config.transformed_test_target_file_path]
+            if self._resampling_stage.strategy == "class_weight":
+                output_file_paths.append(self.data_transformation_config.transformed_train_sample_weight_file_path)
+            return {os.path.basename(file_path): file_path for file_path in output_file_paths}
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_transformation_fingerprint(self, preprocessor: ColumnTransformer) -> str:
+        """
+        Method Name :   get_transformation_fingerprint
+        Description :   This method hashes everything the transformation outputs depend on: the content of
+                        the train and test files, the schema, the transformer parameters (without n_jobs and
+                        verbose), the resampling and the version of the transformation code
+
+        Output      :   Returns the fingerprint used as cache key
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            return get_object_hash({
+                "train_file": get_file_hash(self.data_ingestion_artifact.trained_file_path),
+                "test_file": get_file_hash(self.data_ingestion_artifact.test_file_path),
+                "schema": self._schema_config,
+                "target_column": TARGET_COLUMN,
+                "preprocessor": {name: value for name, value in preprocessor.get_params(deep=True).items()
+                                 if name.split("__")[-1] not in FINGERPRINT_EXCLUDED_PARAMS},
+                "resampler": self._resampling_stage.get_params(),
+                "resample_test": self.data_transformation_config.resample_test,
+                "array_dtype": self.data_transformation_config.array_dtype,
+                "code_version": get_transformation_code_version(),
+            })
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def load_from_cache(self, fingerprint: str) -> bool:
+        """
+        Method Name :   load_from_cache
+        Description :   This method links the cached preprocessor and arrays of a fingerprint into this run
+
+        Output      :   Returns True on a cache hit
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self._cache is None:
+                return False
+            output_files = self.get_output_files()
+            entry_dir = self._cache.lookup(key=fingerprint, file_names=list(output_files))
+            if entry_dir is None:
+                return False
+            for file_name, file_path in output_files.items():
+                link_or_copy(os.path.join(entry_dir, file_name), file_path)
+            logging.info(f"Reused cached preprocessor and transformed arrays, cache stats: {self._cache.get_stats()}")
+            return True
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def store_in_cache(self, fingerprint: str) -> None:
+        """
+        Method Name :   store_in_cache
+        Description :   This method stores the fitted preprocessor and arrays of this run under a fingerprint
+
+        Output      :   cache entry is written
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self._cache is None:
+                return
+            self._cache.store(key=fingerprint, files=self.get_output_files())
+            logging.info(f"Preprocessor cache stats: {self._cache.get_stats()}")
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_data_transformation_artifact(self) -> DataTransformationArtifact:
+        """
+        Method Name :   get_data_transformation_artifact
+        Description :   This method creates the artifact pointing to the outputs of this run
+
+        Output      :   Returns data transformation artifact
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            sample_weight_file_path = None
+            if self._resampling_stage.strategy == "class_weight":
+                sample_weight_file_path = self.data_transformation_config.transformed_train_sample_weight_file_path
+            return DataTransformationArtifact(
+                transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
+                transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
+                transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                transformed_train_target_file_path=self.data_transformation_config.transformed_train_target_file_path,
+                transformed_test_target_file_path=self.data_transformation_config.transformed_test_target_file_path,
+                transformed_train_sample_weight_file_path=sample_weight_file_path
+            )
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def initiate_data_transformation(self, ) -> DataTransformationArtifact:
         """
         Method Name :   initiate_data_transformation
@@ -125,13 +289,18 @@ class DataTransformation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            if self.data_validation_artifact.validation_status:
+            if self.data_validation_artifact is None or self.data_validation_artifact.validation_status:
                 logging.info("Starting data transformation")
                 preprocessor = self.get_data_transformer_object()
                 logging.info("Got the Preprocessor object")
+
+                fingerprint = self.get_transformation_fingerprint(preprocessor)
+                if self.load_from_cache(fingerprint):
+                    logging.info("Skipped fitting the preprocessor, train data and configuration are unchanged")
+                    return self.get_data_transformation_artifact()
                 
-                train_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
-                test_df = DataTransformation.read_data(file_path=self.data_ingestion_artifact.test_file_path)
+                train_df = self.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
+                test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path)
                 
                 input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
                 target_feature_train_df = train_df[TARGET_COLUMN]
@@ -175,49 +344,50 @@ class DataTransformation:
                 
                 logging.info("Used the preprocessor object to transform the test features")
 
-                logging.info("Applying SMOTEENN on Training dataset")
+                logging.info(f"Applying {self._resampling_stage.strategy} resampling on Training dataset")
                 
-                smt = SMOTEENN(sampling_strategy="minority", random_state=RANDOM_STATE)
-                
-                input_feature_train_final, target_feature_train_final = smt.fit_resample(
-                    input_feature_train_arr, target_feature_train_df
-                )
+                input_feature_train_final, target_feature_train_final, train_sample_weight = \
+                    self._resampling_stage.fit_resample(input_feature_train_arr, target_feature_train_df)
 
-                logging.info("Applied SMOTEENN on training dataset")
+                logging.info("Applied resampling on training dataset")
 
-                logging.info("Applying SMOTEENN on testing dataset")
+                if self.data_transformation_config.resample_test:
+                    logging.info(f"Applying {self._resampling_stage.strategy} resampling on testing dataset")
 
-                input_feature_test_final, target_feature_test_final = smt.fit_resample(
-                    input_feature_test_arr, target_feature_test_df
-                )
-
-                logging.info("Applied SMOTEENN on testing dataset")
+                    input_feature_test_final, target_feature_test_final, _ = \
+                        self._resampling_stage.fit_resample(input_feature_test_arr, target_feature_test_df)
 
-                logging.info("Created train array and test array")
+                    logging.info("Applied resampling on testing dataset")
+                else:
+                    input_feature_test_final, target_feature_test_final = input_feature_test_arr, target_feature_test_df
 
-                train_arr = np.c_[
-                    input_feature_train_final, np.array(target_feature_train_final)
-                ]
-
-                test_arr = np.c_[
-                    input_feature_test_final, np.array(target_feature_test_final)
-                ]
+                logging.info(f"Created train and test feature matrices, sparse: {sparse.issparse(input_feature_train_final)}")
 
                 save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-                save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array=train_arr)
-                save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, array=test_arr)
+                save_feature_matrix(self.data_transformation_config.transformed_train_file_path,
+                                    matrix=input_feature_train_final,
+                                    dtype=self.data_transformation_config.array_dtype)
+                save_feature_matrix(self.data_transformation_config.transformed_test_file_path,
+                                    matrix=input_feature_test_final,
+                                    dtype=self.data_transformation_config.array_dtype)
+                save_numpy_array_data(self.data_transformation_config.transformed_train_target_file_path,
+                                      array=np.asarray(target_feature_train_final))
+                save_numpy_array_data(self.data_transformation_config.transformed_test_target_file_path,
+                                      array=np.asarray(target_feature_test_final))
+                if train_sample_weight is not None:
+                    save_numpy_array_data(self.data_transformation_config.transformed_train_sample_weight_file_path,
+                                          array=train_sample_weight,
+                                          dtype=self.data_transformation_config.array_dtype)
 
                 logging.info("Saved the preprocessor object")
 
+                self.store_in_cache(fingerprint)
+
                 logging.info(
                     "Exited initiate_data_transformation method of Data_Transformation class"
                 )
 
-                data_transformation_artifact = DataTransformationArtifact(
-                    transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
-                    transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                    transformed_test_file_path=self.data_transformation_config.transformed_test_file_path
-                )
+                data_transformation_artifact = self.get_data_transformation_artifact()
                 return data_transformation_artifact
             else:
                 raise Exception(self.data_validation_artifact.message)
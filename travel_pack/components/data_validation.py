@@ -3,9 +3,6 @@ import sys
 import json
 
 import pandas as pd
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-
 from pandas import DataFrame
 
 from travel_pack.constants import SCHEMA_FILE_PATH
@@ -15,7 +12,12 @@ from travel_pack.logger import logging
 
 from travel_pack.entity.config_entity import DataValidationConfig
 from travel_pack.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
-from travel_pack.utils.main_utils import read_yaml_file, write_yaml_file
+from travel_pack.utils.main_utils import read_yaml_file, write_json_file
+from travel_pack.utils.drift_utils import get_dataset_drift_report, get_drift_columns, get_profile_drift_report, \
+    get_evidently_drift_report
+from travel_pack.utils.sketch_utils import DatasetProfile
+from travel_pack.utils.dtype_utils import read_csv_with_schema
+from travel_pack.utils.validation_utils import SchemaValidator
 
 class DataValidation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig):
@@ -54,21 +56,13 @@ class DataValidation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            dataframe_columns = df.columns
-            missing_numerical_columns = []
-            missing_categorical_columns = []
-            for column in self._schema_config["numerical_columns"]:
-                if column not in dataframe_columns:
-                    missing_numerical_columns.append(column)
+            dataframe_columns = set(df.columns)
+            missing_numerical_columns = sorted(set(self._schema_config["numerical_columns"]) - dataframe_columns)
+            missing_categorical_columns = sorted(set(self._schema_config["categorical_columns"]) - dataframe_columns)
 
             if len(missing_numerical_columns)>0:
                 logging.info(f"Missing numerical column: {missing_numerical_columns}")
 
-
-            for column in self._schema_config["categorical_columns"]:
-                if column not in dataframe_columns:
-                    missing_categorical_columns.append(column)
-
             if len(missing_categorical_columns)>0:
                 logging.info(f"Missing categorical column: {missing_categorical_columns}")
 
@@ -77,9 +71,15 @@ class DataValidation:
             raise TravelException(e, sys) from e
 
     @staticmethod
-    def read_data(file_path) -> DataFrame:
+    def read_columns(file_path) -> DataFrame:
+        try:
+            return pd.read_csv(file_path, nrows=0)
+        except Exception as e:
+            raise TravelException(e, sys)
+
+    def read_data(self, file_path) -> DataFrame:
         try:
-            return pd.read_csv(file_path)
+            return read_csv_with_schema(file_path, self._schema_config, stage="data_validation")
         except Exception as e:
             raise TravelException(e, sys)
 
@@ -92,14 +92,71 @@ class DataValidation:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            data_drift_profile = Profile(sections=[DataDriftProfileSection()])
+            if self.data_validation_config.drift_engine == "evidently":
+                return self.detect_dataset_drift_with_evidently(reference_df, current_df)
+
+            drift_report = get_dataset_drift_report(reference_df, current_df,
+                                                    drift_columns=get_drift_columns(self._schema_config),
+                                                    threshold=self.data_validation_config.drift_threshold,
+                                                    drift_share=self.data_validation_config.drift_share,
+                                                    n_bins=self.data_validation_config.drift_n_bins,
+                                                    n_jobs=self.data_validation_config.drift_n_jobs,
+                                                    sample_size=self.data_validation_config.drift_sample_size)
+
+            write_json_file(file_path=self.data_validation_config.drift_report_file_path, content=drift_report)
 
-            data_drift_profile.calculate(reference_df, current_df)
+            logging.info(f"{drift_report['n_drifted_features']}/{drift_report['n_features']} drift detected.")
+            return drift_report["dataset_drift"]
+        except Exception as e:
+            raise TravelException(e, sys) from e
 
-            report = data_drift_profile.json()
-            json_report = json.loads(report)
+    def detect_profile_drift(self) -> bool:
+        """
+        Method Name :   detect_profile_drift
+        Description :   This method validates if drift is detected from the sketches written at ingestion.
+                        The current run is compared with the stored reference profile when there is one,
+                        otherwise the test profile is compared with the train profile
 
-            write_yaml_file(file_path=self.data_validation_config.drift_report_file_path, content=json_report)
+        Output      :   Returns bool value based on validation results
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            train_profile = DatasetProfile.load(self.data_ingestion_artifact.train_profile_file_path)
+            test_profile = DatasetProfile.load(self.data_ingestion_artifact.test_profile_file_path)
+
+            reference_profile_file_path = self.data_validation_config.reference_profile_file_path
+            if os.path.exists(reference_profile_file_path):
+                logging.info(f"Comparing current data with reference profile: {reference_profile_file_path}")
+                reference_profile = DatasetProfile.load(reference_profile_file_path)
+                current_profile = DatasetProfile.merged([train_profile, test_profile])
+            else:
+                logging.info("No reference profile found, comparing test profile with train profile")
+                reference_profile, current_profile = train_profile, test_profile
+
+            drift_report = get_profile_drift_report(reference_profile, current_profile,
+                                                    threshold=self.data_validation_config.drift_threshold,
+                                                    drift_share=self.data_validation_config.drift_share,
+                                                    n_bins=self.data_validation_config.drift_n_bins)
+
+            write_json_file(file_path=self.data_validation_config.drift_report_file_path, content=drift_report)
+
+            logging.info(f"{drift_report['n_drifted_features']}/{drift_report['n_features']} drift detected.")
+            return drift_report["dataset_drift"]
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def detect_dataset_drift_with_evidently(self, reference_df: DataFrame, current_df: DataFrame) -> bool:
+        """
+        Method Name :   detect_dataset_drift_with_evidently
+        Description :   This method validates if drift is detected using the evidently data drift profile
+
+        Output      :   Returns bool value based on validation results
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            json_report = get_evidently_drift_report(reference_df, current_df)
+
+            write_json_file(file_path=self.data_validation_config.drift_report_file_path, content=json_report)
 
             n_features = json_report["data_drift"]["data"]["metrics"]["n_features"]
             n_drifted_features = json_report["data_drift"]["data"]["metrics"]["n_drifted_features"]
@@ -110,6 +167,32 @@ class DataValidation:
         except Exception as e:
             raise TravelException(e, sys) from e
 
+    def validate_column_values(self) -> bool:
+        """
+        Method Name :   validate_column_values
+        Description :   This method validates dtype, nullability, numeric ranges and allowed categories
+                        of the train and test files in one chunked scan and writes the violation report
+
+        Output      :   Returns bool value based on validation results
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            validation_report = {}
+            for dataset_name, file_path in [("train", self.data_ingestion_artifact.trained_file_path),
+                                            ("test", self.data_ingestion_artifact.test_file_path)]:
+                schema_validator = SchemaValidator(schema_config=self._schema_config)
+                schema_validator.validate_file(file_path=file_path, chunk_size=self.data_validation_config.chunk_size)
+                validation_report[dataset_name] = schema_validator.get_report()
+                if not schema_validator.is_valid:
+                    logging.info(f"Schema violations in {dataset_name} data: "
+                                 f"{validation_report[dataset_name]['violations']}")
+
+            write_json_file(file_path=self.data_validation_config.validation_report_file_path,
+                            content=validation_report)
+            return all(report["is_valid"] for report in validation_report.values())
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def initiate_data_validation(self) -> DataValidationArtifact:
         """
         Method Name :   initiate_data_validation
@@ -122,8 +205,8 @@ class DataValidation:
         try:
             validation_error_msg = ""
             logging.info("Starting data validation")
-            train_df, test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                 DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path))
+            train_df, test_df = (DataValidation.read_columns(file_path=self.data_ingestion_artifact.trained_file_path),
+                                 DataValidation.read_columns(file_path=self.data_ingestion_artifact.test_file_path))
 
             status = self.validate_number_of_columns(dataframe=train_df)
             logging.info(f"All required columns present in training dataframe: {status}")
@@ -144,10 +227,21 @@ class DataValidation:
             if not status:
                 validation_error_msg += f"columns are missing in test dataframe."
 
+            status = self.validate_column_values()
+
+            if not status:
+                validation_error_msg += f"Column values violate the schema constraints."
+
             validation_status = len(validation_error_msg) == 0
 
+            drift_status = None
             if validation_status:
-                drift_status = self.detect_dataset_drift(train_df, test_df)
+                if self.data_validation_config.drift_engine == "sketch":
+                    drift_status = self.detect_profile_drift()
+                else:
+                    train_df, test_df = (self.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
+                                         self.read_data(file_path=self.data_ingestion_artifact.test_file_path))
+                    drift_status = self.detect_dataset_drift(train_df, test_df)
                 if drift_status:
                     logging.info(f"Drift detected.")
                     validation_error_msg = "Drift detected"
@@ -160,7 +254,9 @@ class DataValidation:
             data_validation_artifact = DataValidationArtifact(
                 validation_status=validation_status,
                 message=validation_error_msg,
-                drift_report_file_path=self.data_validation_config.drift_report_file_path
+                drift_report_file_path=self.data_validation_config.drift_report_file_path,
+                validation_report_file_path=self.data_validation_config.validation_report_file_path,
+                drift_status=None if drift_status is None else bool(drift_status)
             )
 
             logging.info(f"Data validation artifact: {data_validation_artifact}")
@@ -1,15 +1,22 @@
 from travel_pack.entity.config_entity import ModelEvaluationConfig
-from travel_pack.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact
+from travel_pack.entity.artifact_entity import (ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact,
+                                                ProductionModelScoreArtifact)
 from sklearn.metrics import f1_score
 from travel_pack.exception import TravelException
 from travel_pack.logger import logging
-from travel_pack.constants import TARGET_COLUMN
+from travel_pack.constants import TARGET_COLUMN, SCHEMA_FILE_PATH
 import sys
 import pandas as pd
-from typing import Optional
+from typing import Optional, Union
 from travel_pack.entity.s3_estimator import TravelEstimator
-from dataclasses import dataclass
+from travel_pack.entity.model_registry import ModelRegistry
+from dataclasses import dataclass, field
 from travel_pack.entity.estimator import TravelModel
+from travel_pack.utils.main_utils import read_yaml_file
+from travel_pack.utils.dtype_utils import read_csv_with_schema
+from travel_pack.utils.cache_utils import get_file_hash
+from travel_pack.utils.trial_utils import TrialStore
+from travel_pack.utils.inference_utils import InferenceBudget
 
 
 @dataclass
@@ -18,29 +25,47 @@ class EvaluateModelResponse:
     best_model_f1_score: float
     is_model_accepted: bool
     difference: float
+    inference_budget_violations: list = field(default_factory=list)
 
 
 class ModelEvaluation:
 
     def __init__(self, model_eval_config: ModelEvaluationConfig, data_ingestion_artifact: DataIngestionArtifact,
-                 model_trainer_artifact: ModelTrainerArtifact):
+                 model_trainer_artifact: Optional[ModelTrainerArtifact],
+                 production_model_score_artifact: Optional[ProductionModelScoreArtifact] = None):
+        """
+        :param model_trainer_artifact: trained model to evaluate, None when only the production model is scored
+        :param production_model_score_artifact: score of the production model computed while the model was
+                                                trained, None scores it during evaluation
+        """
         try:
             self.model_eval_config = model_eval_config
             self.data_ingestion_artifact = data_ingestion_artifact
             self.model_trainer_artifact = model_trainer_artifact
+            self.production_model_score_artifact = production_model_score_artifact
+            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._score_store = None
+            if self.model_eval_config.score_store_dir is not None:
+                self._score_store = TrialStore(store_dir=self.model_eval_config.score_store_dir,
+                                               name="production_model_scores")
         except Exception as e:
             raise TravelException(e, sys) from e
 
-    def get_best_model(self) -> Optional[TravelEstimator]:
+    def get_best_model(self) -> Optional[Union[ModelRegistry, TravelEstimator]]:
         """
         Method Name :   get_best_model
-        Description :   This function is used to get model in production
+        Description :   This function is used to get model in production,
+                        the current version of the model registry or the pickled model while the registry is empty
         
         Output      :   Returns model object if available in s3 storage
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
             bucket_name = self.model_eval_config.bucket_name
+            if self.model_eval_config.registry_key is not None:
+                registry = ModelRegistry(bucket_name=bucket_name, registry_key=self.model_eval_config.registry_key)
+                if registry.is_model_present():
+                    return registry
             model_path=self.model_eval_config.s3_model_key_path
             usvisa_estimator = TravelEstimator(bucket_name=bucket_name,
                                                model_path=model_path)
@@ -51,35 +76,101 @@ class ModelEvaluation:
         except Exception as e:
             raise  TravelException(e,sys)
 
+    def compute_best_model_f1_score(self, best_model: TravelEstimator) -> float:
+        """
+        Method Name :   compute_best_model_f1_score
+        Description :   This function downloads the model in production and computes its f1 score on the test data
+
+        Output      :   Returns f1 score of the production model
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            test_df = read_csv_with_schema(self.data_ingestion_artifact.test_file_path, self._schema_config,
+                                           stage="model_evaluation")
+            test_df['Gender'] = test_df['Gender'].replace('Fe Male', 'Female')
+
+            x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
+            y_hat_best_model = best_model.predict(x)
+            return float(f1_score(y, y_hat_best_model))
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def score_production_model(self) -> ProductionModelScoreArtifact:
+        """
+        Method Name :   score_production_model
+        Description :   This function scores the model in production on the test data, it does not need the
+                        trained model so it can run while the model is trained. Scores are stored by the ETag/version
+                        of the production model and the hash of the test data, so an unchanged model is neither
+                        downloaded nor scored again on unchanged test data
+
+        Output      :   Returns production model score artifact
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            best_model_f1_score, model_version = None, None
+            best_model = self.get_best_model()
+            if best_model is not None:
+                model_version = best_model.get_model_version()
+                score_key, score = None, None
+                if self._score_store is not None:
+                    score_key = self._score_store.get_trial_key(
+                        bucket_name=self.model_eval_config.bucket_name,
+                        s3_model_path=self.model_eval_config.s3_model_key_path,
+                        model_version=model_version,
+                        test_data_hash=get_file_hash(self.data_ingestion_artifact.test_file_path),
+                        scoring="f1")
+                    score = self._score_store.lookup(score_key)
+                if score is not None:
+                    logging.info("Production model and test data unchanged, reusing the stored production model score")
+                    best_model_f1_score = score["f1_score"]
+                else:
+                    best_model_f1_score = self.compute_best_model_f1_score(best_model)
+                    if score_key is not None:
+                        self._score_store.record(score_key, {"f1_score": best_model_f1_score})
+
+            production_model_score_artifact = ProductionModelScoreArtifact(
+                is_model_present=best_model is not None,
+                s3_model_path=self.model_eval_config.s3_model_key_path,
+                f1_score=best_model_f1_score,
+                model_version=model_version)
+            logging.info(f"Production model score artifact: {production_model_score_artifact}")
+            return production_model_score_artifact
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def evaluate_model(self) -> EvaluateModelResponse:
         """
         Method Name :   evaluate_model
         Description :   This function is used to evaluate trained model 
-                        with production model and choose best model 
+                        with production model and choose best model,
+                        a trained model outside the inference budget is not accepted
         
         Output      :   Returns bool value based on validation results
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
-            test_df['Gender'] = test_df['Gender'].replace('Fe Male', 'Female') 
-
-            x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
-
             # trained_model = load_object(file_path=self.model_trainer_artifact.trained_model_file_path)
             trained_model_f1_score = self.model_trainer_artifact.metric_artifact.f1_score
 
-            best_model_f1_score=None
-            best_model = self.get_best_model()
-            if best_model is not None:
-                y_hat_best_model = best_model.predict(x)
-                best_model_f1_score = f1_score(y, y_hat_best_model)
+            production_model_score_artifact = self.production_model_score_artifact
+            if production_model_score_artifact is None:
+                production_model_score_artifact = self.score_production_model()
+            best_model_f1_score = production_model_score_artifact.f1_score
             
+            inference_budget = InferenceBudget(max_single_row_latency_ms=self.model_eval_config.max_single_row_latency_ms,
+                                               max_batch_latency_ms=self.model_eval_config.max_batch_latency_ms,
+                                               max_model_size_mb=self.model_eval_config.max_model_size_mb)
+            violations = inference_budget.get_violations(self.model_trainer_artifact.metric_artifact)
+            if violations:
+                logging.info(f"Trained model exceeds the inference budget: {violations}")
+
             tmp_best_model_score = 0 if best_model_f1_score is None else best_model_f1_score
             result = EvaluateModelResponse(trained_model_f1_score=trained_model_f1_score,
                                            best_model_f1_score=best_model_f1_score,
-                                           is_model_accepted=trained_model_f1_score > tmp_best_model_score,
-                                           difference=trained_model_f1_score - tmp_best_model_score
+                                           is_model_accepted=trained_model_f1_score > tmp_best_model_score
+                                                             and not violations,
+                                           difference=trained_model_f1_score - tmp_best_model_score,
+                                           inference_budget_violations=violations
                                            )
             logging.info(f"Result: {result}")
             return result
@@ -103,6 +194,8 @@ class ModelEvaluation:
                 is_model_accepted=evaluate_model_response.is_model_accepted,
                 s3_model_path=s3_model_path,
                 trained_model_path=self.model_trainer_artifact.trained_model_file_path,
+                onnx_model_path=self.model_trainer_artifact.onnx_model_file_path,
+                training_row_keys_path=self.model_trainer_artifact.training_row_keys_file_path,
                 changed_accuracy=evaluate_model_response.difference)
 
             logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
@@ -1,4 +1,5 @@
 import sys
+import tempfile
 
 from travel_pack.cloud_storage.aws_storage import SimpleStorageService
 from travel_pack.exception import TravelException
@@ -6,6 +7,11 @@ from travel_pack.logger import logging
 from travel_pack.entity.config_entity import ModelPusherConfig
 from travel_pack.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact
 from travel_pack.entity.s3_estimator import TravelEstimator
+from travel_pack.entity.model_registry import ModelRegistry
+from travel_pack.constants import SCHEMA_FILE_PATH, TARGET_COLUMN, MODEL_ONNX_FILE_NAME
+from travel_pack.utils.main_utils import load_object, read_yaml_file
+from travel_pack.utils.dtype_utils import get_schema_column_types
+from travel_pack.utils.bundle_utils import save_model_bundle, add_bundle_file
 
 
 class ModelPusher:
@@ -21,6 +27,46 @@ class ModelPusher:
         self.usvisa_estimator = TravelEstimator(bucket_name=model_pusher_config.bucket_name,
                                 model_path=model_pusher_config.s3_model_key_path)
 
+    def push_to_registry(self) -> ModelPusherArtifact:
+        """
+        Method Name :   push_to_registry
+        Description :   This function writes the trained model as a compressed bundle with its ONNX graph and
+                        a manifest of version, hashes and input schema, and pushes it as the current version
+                        of the model registry with the training row keys as a side file
+
+        Output      :   Returns model pusher artifact
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            travel_model = load_object(file_path=self.model_evaluation_artifact.trained_model_path)
+            column_types = get_schema_column_types(read_yaml_file(file_path=SCHEMA_FILE_PATH))
+            feature_names = getattr(travel_model.preprocessing_object, "feature_names_in_", [])
+            schema = {"features": {str(column): column_types.get(str(column)) for column in feature_names},
+                      "target": TARGET_COLUMN}
+            registry = ModelRegistry(bucket_name=self.model_pusher_config.bucket_name,
+                                     registry_key=self.model_pusher_config.registry_key)
+            with tempfile.TemporaryDirectory() as bundle_dir:
+                manifest = save_model_bundle(travel_model, bundle_dir,
+                                             compression=self.model_pusher_config.compression,
+                                             buffer_threshold_bytes=self.model_pusher_config.buffer_threshold_bytes,
+                                             schema=schema,
+                                             metadata={"changed_accuracy": self.model_evaluation_artifact.changed_accuracy})
+                if self.model_evaluation_artifact.onnx_model_path is not None:
+                    manifest = add_bundle_file(bundle_dir, self.model_evaluation_artifact.onnx_model_path)
+                side_file_paths = [file_path for file_path in [self.model_evaluation_artifact.training_row_keys_path]
+                                   if file_path is not None]
+                manifest_key = registry.push(bundle_dir, manifest, side_file_paths=side_file_paths)
+
+            s3_onnx_model_path = None
+            if MODEL_ONNX_FILE_NAME in manifest["files"]:
+                s3_onnx_model_path = registry.get_key(manifest["model_version"], MODEL_ONNX_FILE_NAME)
+            return ModelPusherArtifact(bucket_name=self.model_pusher_config.bucket_name,
+                                       s3_model_path=manifest_key,
+                                       s3_onnx_model_path=s3_onnx_model_path,
+                                       model_version=manifest["model_version"])
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def initiate_model_pusher(self) -> ModelPusherArtifact:
         """
         Method Name :   initiate_model_evaluation
@@ -34,11 +80,27 @@ class ModelPusher:
         try:
             logging.info("Uploading artifacts folder to s3 bucket")
 
+            if self.model_pusher_config.registry_key is not None:
+                model_pusher_artifact = self.push_to_registry()
+                logging.info(f"Model pusher artifact: [{model_pusher_artifact}]")
+                return model_pusher_artifact
+
             self.usvisa_estimator.save_model(from_file=self.model_evaluation_artifact.trained_model_path)
 
+            # the ONNX graph of the previous model must not outlive it, a model without one removes it
+            s3_onnx_model_path = None
+            onnx_estimator = TravelEstimator(bucket_name=self.model_pusher_config.bucket_name,
+                                             model_path=self.model_pusher_config.s3_onnx_model_key_path,
+                                             backend="onnx")
+            if self.model_evaluation_artifact.onnx_model_path is not None:
+                s3_onnx_model_path = self.model_pusher_config.s3_onnx_model_key_path
+                onnx_estimator.save_model(from_file=self.model_evaluation_artifact.onnx_model_path)
+            else:
+                onnx_estimator.remove_model()
 
             model_pusher_artifact = ModelPusherArtifact(bucket_name=self.model_pusher_config.bucket_name,
-                                                        s3_model_path=self.model_pusher_config.s3_model_key_path)
+                                                        s3_model_path=self.model_pusher_config.s3_model_key_path,
+                                                        s3_onnx_model_path=s3_onnx_model_path)
 
             logging.info("Uploaded artifacts folder to s3 bucket")
             logging.info(f"Model pusher artifact: [{model_pusher_artifact}]")
@@ -1,5 +1,6 @@
 import sys
-from typing import Tuple
+import os
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -10,52 +11,230 @@ from neuro_mf import ModelFactory
 
 from travel_pack.exception import TravelException
 from travel_pack.logger import logging
-from travel_pack.utils.main_utils import load_numpy_array_data, read_yaml_file, load_object, save_object
+from travel_pack.constants import SCHEMA_FILE_PATH, TARGET_COLUMN
+from travel_pack.utils.main_utils import load_numpy_array_data, read_yaml_file, load_object, save_object, \
+    load_feature_matrix, merge_config, write_yaml_file, open_for_replace, save_numpy_array_data
 from travel_pack.entity.config_entity import ModelTrainerConfig
-from travel_pack.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
-from travel_pack.entity.estimator import TravelModel
+from travel_pack.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, \
+    DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
+from travel_pack.entity.estimator import TravelModel, OnnxTravelModel
+from travel_pack.utils.search_utils import ModelSearch
+from travel_pack.utils.dtype_utils import read_csv_with_schema
+from travel_pack.utils.inference_utils import InferenceBudget, measure_inference_cost
+from travel_pack.utils.onnx_utils import convert_travel_model_to_onnx, check_prediction_agreement
+from travel_pack.utils.warm_start_utils import get_preprocessor_signature, supports_warm_start, warm_start_estimator
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig,
+                 data_ingestion_artifact: Optional[DataIngestionArtifact] = None,
+                 data_validation_artifact: Optional[DataValidationArtifact] = None,
+                 production_model: Optional[TravelModel] = None,
+                 production_training_row_keys: Optional[np.ndarray] = None):
         """
         :param data_ingestion_artifact: Output reference of data ingestion artifact stage
         :param data_transformation_config: Configuration for data transformation
+        :param data_ingestion_artifact: Ingested train and test files, the new rows of a warm start
+        :param data_validation_artifact: Output reference of data validation artifact stage, drift check of warm start
+        :param production_model: Model in production which a warm start continues training
+        :param production_training_row_keys: Keys of the rows the production model was trained on,
+                                             stored next to it in the model registry
         """
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.data_ingestion_artifact = data_ingestion_artifact
+        self.data_validation_artifact = data_validation_artifact
+        self.production_model = production_model
+        self.production_training_row_keys = production_training_row_keys
+        self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
         
-    def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
+    def get_model_config(self) -> Tuple[dict, str]:
+        """
+        Method Name :   get_model_config
+        Description :   This function reads model.yaml and applies the configured profile, e.g. the reduced
+                        search of a dry run. The profiled config is written next to the trained model so
+                        neuro_mf and later readers see the config which was used
+
+        Output      :   Returns model config dict and the path of the config file used
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            model_config_file_path = self.model_trainer_config.model_config_file_path
+            model_config = read_yaml_file(file_path=model_config_file_path)
+            profiles = model_config.pop("profiles", None) or {}
+            profile = self.model_trainer_config.model_config_profile
+            if profile is None:
+                return model_config, model_config_file_path
+            if profile not in profiles:
+                raise Exception(f"Profile {profile} not found in {model_config_file_path}")
+            logging.info(f"Applying the {profile} profile of {model_config_file_path}")
+            model_config = merge_config(model_config, profiles[profile])
+            profiled_config_file_path = os.path.join(self.model_trainer_config.model_trainer_dir,
+                                                     os.path.basename(model_config_file_path))
+            write_yaml_file(file_path=profiled_config_file_path, content=model_config, replace=True)
+            return model_config, profiled_config_file_path
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_model_object_and_report(self, x_train: object, y_train: np.array, x_test: object, y_test: np.array,
+                                    sample_weight: Optional[np.array] = None) -> Tuple[object, object]:
         """
         Method Name :   get_model_object_and_report
-        Description :   This function uses neuro_mf to get the best model object and report of the best model
+        Description :   This function searches the best model with the search configured in model.yaml,
+                        or with the neuro_mf grid search when model.yaml has no search section,
+                        and gets the report of the best model
         
         Output      :   Returns metric artifact object and best model object
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            logging.info("Using neuro_mf to get best model object and report")
-            model_factory = ModelFactory(model_config_path=self.model_trainer_config.model_config_file_path)
-            
-            x_train, y_train, x_test, y_test = train[:, :-1], train[:, -1], test[:, :-1], test[:, -1]
-            
-            best_model_detail = model_factory.get_best_model(
-                X=x_train,y=y_train,base_accuracy=self.model_trainer_config.expected_accuracy
-            )
+            model_config, model_config_file_path = self.get_model_config()
+            if "search" in model_config:
+                logging.info(f"Using {model_config['search'].get('strategy', 'successive_halving')} search "
+                             f"to get best model object and report")
+                model_factory = ModelSearch(model_config=model_config,
+                                            trial_store_dir=self.model_trainer_config.trial_store_dir,
+                                            n_jobs=self.model_trainer_config.n_jobs,
+                                            inference_budget=self.get_inference_budget())
+                if sample_weight is not None:
+                    logging.info("Searching with balanced sample weights")
+                best_model_detail = model_factory.get_best_model(
+                    X=x_train, y=y_train, base_accuracy=self.model_trainer_config.expected_accuracy,
+                    sample_weight=sample_weight
+                )
+            else:
+                logging.info("Using neuro_mf to get best model object and report")
+                # the neuro_mf grid search takes no sample weights, its model is scored and kept unweighted
+                if sample_weight is not None:
+                    logging.info("neuro_mf search ignores the balanced sample weights, "
+                                 "add a search section to model.yaml to use them")
+                model_factory = ModelFactory(model_config_path=model_config_file_path)
+                best_model_detail = model_factory.get_best_model(
+                    X=x_train,y=y_train,base_accuracy=self.model_trainer_config.expected_accuracy
+                )
             model_obj = best_model_detail.best_model
 
-            y_pred = model_obj.predict(x_test)
-            
-            accuracy = accuracy_score(y_test, y_pred) 
-            f1 = f1_score(y_test, y_pred)  
-            precision = precision_score(y_test, y_pred)  
-            recall = recall_score(y_test, y_pred)
-            metric_artifact = ClassificationMetricArtifact(f1_score=f1, precision_score=precision, recall_score=recall)
-            
+            metric_artifact = self.get_metric_artifact(model_obj, x_test=x_test, y_test=y_test)
+            violations = self.get_inference_budget().get_violations(metric_artifact)
+            if violations:
+                logging.info(f"{type(model_obj).__name__} exceeds the inference budget: {violations}")
+
             return best_model_detail, metric_artifact
         except Exception as e:
             raise TravelException(e, sys) from e
+
+    def get_inference_budget(self) -> InferenceBudget:
+        return InferenceBudget(max_single_row_latency_ms=self.model_trainer_config.max_single_row_latency_ms,
+                               max_batch_latency_ms=self.model_trainer_config.max_batch_latency_ms,
+                               max_model_size_mb=self.model_trainer_config.max_model_size_mb,
+                               batch_size=self.model_trainer_config.inference_batch_size)
+
+    def get_metric_artifact(self, model_obj: object, x_test: object, y_test: np.array) -> ClassificationMetricArtifact:
+        """
+        Method Name :   get_metric_artifact
+        Description :   This function scores a fitted estimator on the test data and measures its single row and
+                        batch predict latency and its pickled size
+
+        Output      :   Returns metric artifact object
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            y_pred = model_obj.predict(x_test)
+            inference_cost = measure_inference_cost(model_obj, x_test,
+                                                    batch_size=self.model_trainer_config.inference_batch_size)
+            logging.info(f"Inference cost of {type(model_obj).__name__}: {inference_cost}")
+            return ClassificationMetricArtifact(f1_score=f1_score(y_test, y_pred),
+                                                precision_score=precision_score(y_test, y_pred),
+                                                recall_score=recall_score(y_test, y_pred),
+                                                single_row_latency_ms=inference_cost.single_row_latency_ms,
+                                                batch_latency_ms=inference_cost.batch_latency_ms,
+                                                model_size_bytes=inference_cost.model_size_bytes)
+        except Exception as e:
+            raise TravelException(e, sys) from e
         
+    def read_features(self, file_path: str) -> Tuple[DataFrame, np.ndarray, np.ndarray]:
+        """
+        Method Name :   read_features
+        Description :   This function reads an ingested csv file and cleans its features like data transformation
+
+        Output      :   Returns raw feature dataframe, target and row keys
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            dataframe = read_csv_with_schema(file_path, self._schema_config, stage="model_trainer")
+            row_keys = dataframe[self.model_trainer_config.row_key_column].to_numpy()
+            target = dataframe[TARGET_COLUMN].to_numpy()
+            features = dataframe.drop(columns=[TARGET_COLUMN] + self._schema_config['drop_columns'])
+            features['Gender'] = features['Gender'].replace("Fe Male", "Female")
+            return features, target, row_keys
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_training_row_keys(self) -> Optional[np.ndarray]:
+        if self.data_ingestion_artifact is None:
+            return None
+        key_column = self.model_trainer_config.row_key_column
+        return pd.read_csv(self.data_ingestion_artifact.trained_file_path, usecols=[key_column])[key_column].to_numpy()
+
+    def get_warm_start_fallback_reason(self, preprocessing_obj: object) -> Optional[str]:
+        """
+        Method Name :   get_warm_start_fallback_reason
+        Description :   This function checks if the production model can be trained further on the new rows
+
+        Output      :   Returns the reason for a full retrain, None when the model can be warm started
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self.production_model is None:
+                return "no production model"
+            if self.data_ingestion_artifact is None or self.data_validation_artifact is None:
+                return "ingested data or validation result not available"
+            if self.data_validation_artifact.drift_status is not False:
+                return "drift detected against the data of the production model"
+            if self.production_training_row_keys is None:
+                return "production model does not record its training rows"
+            if get_preprocessor_signature(self.production_model.preprocessing_object) != \
+                    get_preprocessor_signature(preprocessing_obj):
+                return "preprocessor changed"
+            if not supports_warm_start(self.production_model.trained_model_object):
+                return f"{type(self.production_model.trained_model_object).__name__} does not support warm start"
+            return None
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def warm_start_model(self) -> Tuple[TravelModel, ClassificationMetricArtifact, np.ndarray]:
+        """
+        Method Name :   warm_start_model
+        Description :   This function continues training the production model on the rows ingested since it was
+                        trained, XGBoost keeps boosting from the production booster and forests add trees.
+                        The production preprocessor is kept so the existing trees see the same features
+
+        Output      :   Returns warm started model, its metric artifact on the test data and its training row keys
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            preprocessor = self.production_model.preprocessing_object
+            estimator = self.production_model.trained_model_object
+            features, target, row_keys = self.read_features(self.data_ingestion_artifact.trained_file_path)
+            is_new = ~np.isin(row_keys, self.production_training_row_keys)
+            n_new_rows = int(is_new.sum())
+            logging.info(f"{n_new_rows} of {len(row_keys)} train rows are new since the production model")
+
+            if n_new_rows < self.model_trainer_config.warm_start_min_new_rows or len(np.unique(target[is_new])) < 2:
+                logging.info("Not enough new rows to warm start, keeping the production estimator")
+            else:
+                estimator = warm_start_estimator(estimator, preprocessor.transform(features[is_new]), target[is_new],
+                                                 n_estimators=self.model_trainer_config.warm_start_n_estimators)
+                logging.info(f"Warm started {type(estimator).__name__} on {n_new_rows} new rows")
+
+            test_features, test_target, _ = self.read_features(self.data_ingestion_artifact.test_file_path)
+            metric_artifact = self.get_metric_artifact(estimator, x_test=preprocessor.transform(test_features),
+                                                       y_test=test_target)
+            travel_model = TravelModel(preprocessing_object=preprocessor, trained_model_object=estimator)
+            return travel_model, metric_artifact, np.union1d(self.production_training_row_keys, row_keys)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def initiate_model_trainer(self, ) -> ModelTrainerArtifact:
         logging.info("Entered initiate_model_trainer method of ModelTrainer class")
         """
@@ -66,13 +245,40 @@ class ModelTrainer:
         On Failure  :   Write an exception log and then raise an exception
         """
         try:
-            train_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_file_path)
-            
-            best_model_detail ,metric_artifact = self.get_model_object_and_report(train=train_arr, test=test_arr)
-            
             preprocessing_obj = load_object(file_path=self.data_transformation_artifact.transformed_object_file_path)
 
+            if self.model_trainer_config.warm_start:
+                fallback_reason = self.get_warm_start_fallback_reason(preprocessing_obj)
+                if fallback_reason is None:
+                    travel_model, metric_artifact, training_row_keys = self.warm_start_model()
+                    violations = self.get_inference_budget().get_violations(metric_artifact)
+                    if metric_artifact.f1_score < self.model_trainer_config.expected_accuracy:
+                        fallback_reason = "warm started model scores below the expected score"
+                    elif violations:
+                        fallback_reason = f"warm started model exceeds the inference budget: {violations}"
+                    else:
+                        return self.save_model(travel_model, metric_artifact, training_row_keys=training_row_keys,
+                                               is_warm_started=True)
+                logging.info(f"Training from scratch: {fallback_reason}")
+
+            mmap_mode = self.model_trainer_config.mmap_mode
+            x_train = load_feature_matrix(file_path=self.data_transformation_artifact.transformed_train_file_path,
+                                          mmap_mode=mmap_mode)
+            y_train = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_target_file_path,
+                                            mmap_mode=mmap_mode)
+            x_test = load_feature_matrix(file_path=self.data_transformation_artifact.transformed_test_file_path,
+                                         mmap_mode=mmap_mode)
+            y_test = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_target_file_path,
+                                           mmap_mode=mmap_mode)
+            
+            sample_weight = None
+            sample_weight_file_path = self.data_transformation_artifact.transformed_train_sample_weight_file_path
+            if sample_weight_file_path is not None and os.path.exists(sample_weight_file_path):
+                sample_weight = load_numpy_array_data(file_path=sample_weight_file_path, mmap_mode=mmap_mode)
+
+            best_model_detail ,metric_artifact = self.get_model_object_and_report(x_train=x_train, y_train=y_train,
+                                                                                  x_test=x_test, y_test=y_test,
+                                                                                  sample_weight=sample_weight)
 
             if best_model_detail.best_score < self.model_trainer_config.expected_accuracy:
                 logging.info("No best model found with score more than base score")
@@ -81,12 +287,63 @@ class ModelTrainer:
             usvisa_model = TravelModel(preprocessing_object=preprocessing_obj,
                                        trained_model_object=best_model_detail.best_model)
             logging.info("Created usvisa model object with preprocessor and model")
+            return self.save_model(usvisa_model, metric_artifact, training_row_keys=self.get_training_row_keys())
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def export_onnx_model(self, travel_model: TravelModel) -> Optional[str]:
+        """
+        Method Name :   export_onnx_model
+        Description :   This function converts the preprocessor and estimator of the trained model into one ONNX
+                        graph and gates it on predicting the labels of the pickled model on the test data.
+                        The onnx serving backend relies on the exported graph, so a model which can not be
+                        converted fails the export like a graph below the minimum agreement
+
+        Output      :   Returns file path of the ONNX model, None when it is not exported
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if not self.model_trainer_config.export_onnx or self.data_ingestion_artifact is None:
+                return None
+            features, _, _ = self.read_features(self.data_ingestion_artifact.test_file_path)
+            onnx_model = OnnxTravelModel(convert_travel_model_to_onnx(travel_model, features))
+            agreement = check_prediction_agreement(
+                travel_model, onnx_model, features,
+                min_agreement=self.model_trainer_config.onnx_min_prediction_agreement)
+            logging.info(f"ONNX model predicts the label of the pickled model on {agreement:.4%} of the test rows")
+
+            onnx_model_file_path = self.model_trainer_config.onnx_model_file_path
+            with open_for_replace(onnx_model_file_path, "wb") as file_obj:
+                file_obj.write(onnx_model.onnx_model)
+            return onnx_model_file_path
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def save_model(self, travel_model: TravelModel, metric_artifact: ClassificationMetricArtifact,
+                   training_row_keys: Optional[np.ndarray] = None,
+                   is_warm_started: bool = False) -> ModelTrainerArtifact:
+        """
+        Method Name :   save_model
+        Description :   This function saves the trained model, and the keys of its training rows as a separate
+                        file which is pushed next to the model but never served with it
+
+        Output      :   Returns model trainer artifact
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
             logging.info("Created best model file path.")
-            save_object(self.model_trainer_config.trained_model_file_path, usvisa_model)
+            save_object(self.model_trainer_config.trained_model_file_path, travel_model)
+            training_row_keys_file_path = None
+            if training_row_keys is not None:
+                training_row_keys_file_path = self.model_trainer_config.training_row_keys_file_path
+                save_numpy_array_data(training_row_keys_file_path, array=training_row_keys)
 
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path=self.model_trainer_config.trained_model_file_path,
                 metric_artifact=metric_artifact,
+                onnx_model_file_path=self.export_onnx_model(travel_model),
+                training_row_keys_file_path=training_row_keys_file_path,
+                is_warm_started=is_warm_started,
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
@@ -9,6 +9,7 @@ DATABASE_NAME = "iNeuron"
 COLLECTION_NAME = "travel"
 
 MODEL_FILE_NAME = "model.pkl"
+MODEL_ONNX_FILE_NAME = "model.onnx"
 PREROCESSING_OBEJCT_FILE_NAME = "preprocessing.pkl"
 TARGET_COLUMN = "ProdTaken"
 RANDOM_STATE = 42
@@ -19,11 +20,60 @@ TRAIN_FILE_NAME: str = "train.csv"
 TEST_FILE_NAME: str = "test.csv"
 SCHEMA_FILE_PATH: str = os.path.join("config", "schema.yaml")
 
+# compact dtypes used for the column types declared in schema.yaml
+SCHEMA_FLOAT_DTYPE: str = "float32"
+SCHEMA_CATEGORY_DTYPE: str = "category"
+# int columns get the smallest of these nullable dtypes holding their allowed or min/max values, the last one
+# when they are unbounded, so a chunk with nulls keeps its integers
+SCHEMA_INT_DTYPES: list = ["Int8", "Int16", "Int32", "Int64"]
+
 AWS_ACCESS_KEY_ID_ENV_KEY = "AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY_ENV_KEY = "AWS_SECRET_ACCESS_KEY"
 REGION_NAME = "us-east-1"
 
 
+"""
+Training pipeline related constant start with TRAINING_PIPELINE VAR NAME
+"""
+# run ids are start timestamps like 10_19_2026_14_03_27_512034, a resumed run id must match to name a run directory,
+# the microseconds are optional so runs named by the %m_%d_%Y_%H_%M_%S timestamp before them can be resumed
+TRAINING_PIPELINE_RUN_ID_FORMAT: str = "%m_%d_%Y_%H_%M_%S_%f"
+TRAINING_PIPELINE_RUN_ID_PATTERN: str = r"^\d{2}_\d{2}_\d{4}_\d{2}_\d{2}_\d{2}(_\d{6})?$"
+# stages whose data, config and code are unchanged reuse the artifacts of an earlier run
+TRAINING_PIPELINE_USE_STAGE_CACHE: bool = True
+TRAINING_PIPELINE_STAGE_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "cache", "stages")
+# code version of the stage cache keys, e.g. a git sha set at build time, else the hash of the package sources
+TRAINING_PIPELINE_CODE_VERSION_ENV_KEY = "TRAVEL_PACK_CODE_VERSION"
+# status and artifacts of every stage of a run, read back to resume the run from its first unfinished stage
+TRAINING_PIPELINE_MANIFEST_FILE_NAME: str = "manifest.json"
+# stages whose dependencies finished run at the same time, e.g. production model scoring while the model is trained
+TRAINING_PIPELINE_MAX_CONCURRENT_STAGES: int = 3
+# transform the data while drift is detected, a failed validation still fails the run before training
+TRAINING_PIPELINE_CONCURRENT_VALIDATION: bool = True
+# dry runs go through every stage on a hash sample, stratified on DATA_INGESTION_STRATIFY_COLUMN, with the
+# reduced search of the model.yaml profile, in their own artifact directory (caches and stores included) and without pushing the model to s3
+TRAINING_PIPELINE_DRY_RUN_ARTIFACT_DIR: str = os.path.join(ARTIFACT_DIR, "dry_run")
+TRAINING_PIPELINE_DRY_RUN_SAMPLE_FRACTION: float = 0.1
+TRAINING_PIPELINE_DRY_RUN_MODEL_PROFILE: str = "dry_run"
+# finished runs are hard linked into a content addressed store so identical outputs take disk space once,
+# runs beyond the newest KEEP_LAST_RUNS and KEEP_ACCEPTED_RUNS accepted ones (None keeps all accepted runs)
+# are deleted with the blobs and stage cache entries only they used, logs/ keeps the newest KEEP_LOG_FILES
+TRAINING_PIPELINE_USE_ARTIFACT_STORE: bool = True
+TRAINING_PIPELINE_ARTIFACT_STORE_DIR: str = os.path.join(ARTIFACT_DIR, "store")
+TRAINING_PIPELINE_KEEP_LAST_RUNS: int = 5
+TRAINING_PIPELINE_KEEP_ACCEPTED_RUNS = 3
+TRAINING_PIPELINE_KEEP_LOG_FILES: int = 30
+
+
+"""
+Resource manager related constant start with RESOURCE VAR NAME
+"""
+# cores used by the training pipeline, None uses every core available to the process
+RESOURCE_N_CORES = None
+# optional maximum cores per stage, e.g. {"data_transformation": 4}, other stages get RESOURCE_N_CORES
+RESOURCE_STAGE_MAX_CORES: dict = {}
+
+
 """
 Data Ingestion related constant start with DATA_INGESTION VAR NAME
 """
@@ -32,6 +82,21 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.2
+# "hash" assigns rows by hashing DATA_INGESTION_SPLIT_KEY_COLUMN chunk by chunk, "random" uses train_test_split
+DATA_INGESTION_SPLIT_MODE: str = "hash"
+DATA_INGESTION_SPLIT_KEY_COLUMN: str = "CustomerID"
+# every class of this column sends exactly the split (and dry run sample) ratio of its rows to the test side,
+# the thresholds are ranked on the keys of a first key only pass over the collection, None skips that pass
+DATA_INGESTION_STRATIFY_COLUMN: str = TARGET_COLUMN
+DATA_INGESTION_CHUNK_SIZE: int = 10000
+DATA_INGESTION_PROFILE_DIR: str = "profile"
+DATA_INGESTION_TRAIN_PROFILE_FILE_NAME: str = "train_profile.json"
+DATA_INGESTION_TEST_PROFILE_FILE_NAME: str = "test_profile.json"
+DATA_INGESTION_PROFILE_MAX_CENTROIDS: int = 200
+# share of the collection kept per class, None keeps every row, dry runs use TRAINING_PIPELINE_DRY_RUN_SAMPLE_FRACTION
+DATA_INGESTION_SAMPLE_FRACTION = None
+# 16 character salt of the sample hash, independent of the train/test split hash
+DATA_INGESTION_SAMPLE_HASH_KEY: str = "travel_dry_run01"
 
 
 """
@@ -39,7 +104,20 @@ Data Validation related constant start with DATA_VALIDATION VAR NAME
 """
 DATA_VALIDATION_DIR_NAME: str = "data_validation"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = "drift_report"
-DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.yaml"
+DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.json"
+DATA_VALIDATION_VALIDATION_REPORT_DIR: str = "validation_report"
+DATA_VALIDATION_VALIDATION_REPORT_FILE_NAME: str = "report.json"
+DATA_VALIDATION_CHUNK_SIZE: int = 100000
+# "sketch" compares the ingestion profiles, "native" computes KS/PSI and chi-square with numpy on the raw data,
+# "evidently" runs the evidently DataDriftProfileSection
+DATA_VALIDATION_DRIFT_ENGINE: str = "sketch"
+# profile of the data behind the production model, updated when a model is pushed
+DATA_VALIDATION_REFERENCE_PROFILE_FILE_PATH: str = os.path.join(ARTIFACT_DIR, "reference_profile", "profile.json")
+DATA_VALIDATION_DRIFT_THRESHOLD: float = 0.05
+DATA_VALIDATION_DRIFT_SHARE: float = 0.5
+DATA_VALIDATION_DRIFT_N_BINS: int = 50
+DATA_VALIDATION_DRIFT_N_JOBS: int = 1
+DATA_VALIDATION_DRIFT_SAMPLE_SIZE = None
 
 
 """
@@ -48,6 +126,27 @@ Data Transformation related constant start with DATA_TRANSFORMATION VAR NAME
 DATA_TRANSFORMATION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformed_object"
+# fitted preprocessor and transformed arrays are reused while train data, schema and transformer config are unchanged
+DATA_TRANSFORMATION_USE_CACHE: bool = True
+DATA_TRANSFORMATION_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "cache", "preprocessor")
+DATA_TRANSFORMATION_CACHE_MAX_ENTRIES: int = 5
+# "smoteenn", "smote", "random_under", "class_weight" or "none"
+DATA_TRANSFORMATION_RESAMPLING_STRATEGY: str = "smoteenn"
+DATA_TRANSFORMATION_RESAMPLING_N_JOBS: int = -1
+DATA_TRANSFORMATION_RESAMPLING_APPROXIMATE_NEIGHBORS: bool = False
+DATA_TRANSFORMATION_RESAMPLING_CHUNK_SIZE = None
+DATA_TRANSFORMATION_RESAMPLE_TEST: bool = True
+DATA_TRANSFORMATION_SAMPLE_WEIGHT_FILE_NAME: str = "train_sample_weight.npy"
+# features and target are stored in separate files, features stay a sparse csr matrix
+# whenever the density of the transformed output is below the threshold
+DATA_TRANSFORMATION_TRAIN_TARGET_FILE_NAME: str = "train_target.npy"
+DATA_TRANSFORMATION_TEST_TARGET_FILE_NAME: str = "test_target.npy"
+DATA_TRANSFORMATION_SPARSE_THRESHOLD: float = 0.3
+# dtype of the stored feature matrices and sample weights
+DATA_TRANSFORMATION_ARRAY_DTYPE: str = "float32"
+# column groups of the preprocessor are fitted in parallel with n_jobs and cast to the output dtype
+DATA_TRANSFORMATION_N_JOBS: int = 1
+DATA_TRANSFORMATION_OUTPUT_DTYPE: str = "float32"
 
 
 """
@@ -58,11 +157,55 @@ MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
 MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH: str = os.path.join("config", "model.yaml")
+# transformed arrays are memory mapped read only, None loads them in memory
+MODEL_TRAINER_MMAP_MODE = "r"
+# finished search fits are kept across runs, so interrupted and repeated searches resume, None disables it
+MODEL_TRAINER_TRIAL_STORE_DIR: str = os.path.join(ARTIFACT_DIR, "trial_store")
+# n_jobs of the model search, None uses the n_jobs of the search section of model.yaml
+MODEL_TRAINER_N_JOBS = None
+# profile of model.yaml whose sections override the top level ones, None uses model.yaml as it is
+MODEL_TRAINER_MODEL_CONFIG_PROFILE = None
+# warm start continues training the production model on the rows ingested since it was trained, falling back
+# to a full retrain on drift, a changed preprocessor or a warm started model below MODEL_TRAINER_EXPECTED_SCORE
+MODEL_TRAINER_WARM_START = False
+MODEL_TRAINER_WARM_START_N_ESTIMATORS = 50
+MODEL_TRAINER_WARM_START_MIN_NEW_ROWS = 100
+MODEL_TRAINER_ROW_KEY_COLUMN: str = DATA_INGESTION_SPLIT_KEY_COLUMN
+# keys of the rows the model was trained on, kept next to the model in the registry but outside the pickled
+# model and the bundle manifest, so prediction servers never download them
+MODEL_TRAINER_TRAINING_ROW_KEYS_FILE_NAME: str = "training_row_keys.npy"
+# inference budget of model selection: median predict latency of the estimator on one transformed row and on
+# MODEL_TRAINER_INFERENCE_BATCH_SIZE rows, and its pickled size, None leaves a limit out
+MODEL_TRAINER_INFERENCE_BATCH_SIZE: int = 1000
+MODEL_TRAINER_MAX_SINGLE_ROW_LATENCY_MS = 50.0
+MODEL_TRAINER_MAX_BATCH_LATENCY_MS = 500.0
+MODEL_TRAINER_MAX_MODEL_SIZE_MB = 50.0
+# the trained model is also exported as one ONNX graph of preprocessor and estimator, the export fails the
+# training when the model can not be converted or the graph predicts the label of the pickled model on less than this share of the test rows
+MODEL_TRAINER_EXPORT_ONNX = True
+MODEL_TRAINER_ONNX_MIN_PREDICTION_AGREEMENT = 0.999
 
 
 MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE: float = 0.02
+# f1 scores of production models keyed by s3 ETag/version and test data hash, None disables the store
+MODEL_EVALUATION_SCORE_STORE_DIR: str = os.path.join(ARTIFACT_DIR, "cache", "production_scores")
+# a trained model exceeding the inference budget is not accepted, whatever its score
+MODEL_EVALUATION_MAX_SINGLE_ROW_LATENCY_MS = MODEL_TRAINER_MAX_SINGLE_ROW_LATENCY_MS
+MODEL_EVALUATION_MAX_BATCH_LATENCY_MS = MODEL_TRAINER_MAX_BATCH_LATENCY_MS
+MODEL_EVALUATION_MAX_MODEL_SIZE_MB = MODEL_TRAINER_MAX_MODEL_SIZE_MB
 MODEL_BUCKET_NAME = "travel-model2024"
+# models are pushed as compressed bundles under versioned keys of this prefix with a current.json pointer,
+# the pickle at MODEL_FILE_NAME is read only while the registry is empty
 MODEL_PUSHER_S3_KEY = "model-registry"
+# zstd, lz4 or zlib, falls back to the next installed codec
+MODEL_PUSHER_COMPRESSION = "zstd"
+# numpy buffers of at least this size are stored and compressed apart from the pickle
+MODEL_PUSHER_BUFFER_THRESHOLD_BYTES = 16384
+
+# "pickle" predicts with the dill pickled TravelModel, "onnx" with its ONNX graph on ONNX Runtime
+MODEL_PREDICTOR_BACKEND = "pickle"
+# seconds a served model keeps the registry pointer before reading it again to pick up a newly pushed version
+MODEL_PREDICTOR_REGISTRY_POINTER_TTL_SECONDS: float = 30.0
 
 APP_HOST = "0.0.0.0"
 APP_PORT = 8080
\ No newline at end of file
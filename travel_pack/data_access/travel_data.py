@@ -6,7 +6,7 @@ from travel_pack.configuration.mongo_db_connection import MongoDBClient
 from travel_pack.constants import DATABASE_NAME
 import pandas as pd
 import numpy as np
-from typing import Optional
+from typing import Optional, Iterator
 
 class TravelData:
     """
@@ -39,3 +39,39 @@ class TravelData:
             return df
         except Exception as e:
             raise TravelException(e, sys) from e
+
+    def export_collection_as_dataframe_chunks(self, collection_name: str, chunk_size: int,
+                                              database_name: Optional[str] = None,
+                                              columns: Optional[list] = None) -> Iterator[pd.DataFrame]:
+        try:
+            """
+            export collection as a stream of dataframes of at most chunk_size rows,
+            records are read in insertion (_id) order so the stream is the same across runs,
+            columns optionally restricts the exported fields:
+            yield pd.DataFrame of each chunk
+            """
+            if database_name is None:
+                collection = self.mongo_client.database[collection_name]
+            else:
+                collection = self.mongo_client[database_name][collection_name]
+
+            projection = None if columns is None else {column: 1 for column in columns}
+            cursor = collection.find({}, projection).sort("_id", 1).batch_size(chunk_size)
+            records = []
+            for record in cursor:
+                records.append(record)
+                if len(records) == chunk_size:
+                    yield self._records_to_dataframe(records)
+                    records = []
+            if len(records) > 0:
+                yield self._records_to_dataframe(records)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    @staticmethod
+    def _records_to_dataframe(records: list) -> pd.DataFrame:
+        df = pd.DataFrame(records)
+        if "_id" in df.columns.to_list():
+            df = df.drop(columns=["_id"], axis=1)
+        df.replace({"na": np.nan}, inplace=True)
+        return df
@@ -1,21 +1,29 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class DataIngestionArtifact:
     trained_file_path: str
     test_file_path: str
+    train_profile_file_path: str
+    test_profile_file_path: str
     
 @dataclass
 class DataValidationArtifact:
     validation_status: bool
     message: str
     drift_report_file_path: str
+    validation_report_file_path: str
+    drift_status: Optional[bool] = None
 
 @dataclass
 class DataTransformationArtifact:
     transformed_object_file_path: str
     transformed_train_file_path: str
     transformed_test_file_path: str
+    transformed_train_target_file_path: str
+    transformed_test_target_file_path: str
+    transformed_train_sample_weight_file_path: Optional[str] = None
     
 
 @dataclass
@@ -23,22 +31,40 @@ class ClassificationMetricArtifact:
     f1_score: float
     precision_score: float
     recall_score: float
+    single_row_latency_ms: Optional[float] = None
+    batch_latency_ms: Optional[float] = None
+    model_size_bytes: Optional[int] = None
     
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path: str
     metric_artifact: ClassificationMetricArtifact
+    onnx_model_file_path: Optional[str] = None
+    training_row_keys_file_path: Optional[str] = None
+    is_warm_started: bool = False
     
 
+@dataclass
+class ProductionModelScoreArtifact:
+    is_model_present: bool
+    s3_model_path: str
+    f1_score: Optional[float] = None
+    model_version: Optional[str] = None
+
+
 @dataclass
 class ModelEvaluationArtifact:
     is_model_accepted: bool
     changed_accuracy: float
     s3_model_path: str
     trained_model_path: str
+    onnx_model_path: Optional[str] = None
+    training_row_keys_path: Optional[str] = None
     
     
 @dataclass
 class ModelPusherArtifact:
     bucket_name: str
-    s3_model_path: str
\ No newline at end of file
+    s3_model_path: str
+    s3_onnx_model_path: Optional[str] = None
+    model_version: Optional[str] = None
\ No newline at end of file
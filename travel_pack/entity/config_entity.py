@@ -1,8 +1,10 @@
 import os
+import re
 import sys
 from travel_pack.constants import *
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields, replace
+from typing import Optional
 
 TIMESTAMP: str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
 
@@ -11,9 +13,72 @@ class TrainingPipelineConfig:
     pipeline_name: str = PIPELINE_NAME
     artifact_dir = os.path.join(ARTIFACT_DIR, TIMESTAMP)
     timestamp: str = TIMESTAMP
+    n_cores: Optional[int] = RESOURCE_N_CORES
+    stage_max_cores: dict = field(default_factory=lambda: dict(RESOURCE_STAGE_MAX_CORES))
+    use_stage_cache: bool = TRAINING_PIPELINE_USE_STAGE_CACHE
+    stage_cache_dir: str = TRAINING_PIPELINE_STAGE_CACHE_DIR
+    code_version_env_key: str = TRAINING_PIPELINE_CODE_VERSION_ENV_KEY
+    manifest_file_name: str = TRAINING_PIPELINE_MANIFEST_FILE_NAME
+    max_concurrent_stages: int = TRAINING_PIPELINE_MAX_CONCURRENT_STAGES
+    concurrent_validation: bool = TRAINING_PIPELINE_CONCURRENT_VALIDATION
+    dry_run_artifact_dir: str = TRAINING_PIPELINE_DRY_RUN_ARTIFACT_DIR
+    dry_run_sample_fraction: float = TRAINING_PIPELINE_DRY_RUN_SAMPLE_FRACTION
+    dry_run_model_profile: str = TRAINING_PIPELINE_DRY_RUN_MODEL_PROFILE
+    use_artifact_store: bool = TRAINING_PIPELINE_USE_ARTIFACT_STORE
+    artifact_store_dir: str = TRAINING_PIPELINE_ARTIFACT_STORE_DIR
+    keep_last_runs: int = TRAINING_PIPELINE_KEEP_LAST_RUNS
+    keep_accepted_runs: Optional[int] = TRAINING_PIPELINE_KEEP_ACCEPTED_RUNS
+    keep_log_files: int = TRAINING_PIPELINE_KEEP_LOG_FILES
     
 training_pipeline_config: TrainingPipelineConfig = TrainingPipelineConfig()
 
+
+def get_new_run_id() -> str:
+    """
+    id of a new run, its start time to the microsecond, so every TrainPipeline of a long running process
+    (e.g. the app) gets its own artifact directory instead of the TIMESTAMP of the module import
+    """
+    return datetime.now().strftime(TRAINING_PIPELINE_RUN_ID_FORMAT)
+
+
+def is_valid_run_id(run_id: str) -> bool:
+    """
+    True when run_id can name a run directory: a timestamp of TRAINING_PIPELINE_RUN_ID_FORMAT, with or without
+    its microseconds, no path
+    """
+    return isinstance(run_id, str) and re.fullmatch(TRAINING_PIPELINE_RUN_ID_PATTERN, run_id) is not None
+
+
+def get_run_artifact_dir(run_id: str, artifact_root: str = ARTIFACT_DIR) -> str:
+    return os.path.join(artifact_root, run_id)
+
+
+def get_run_path(path: str, run_id: str, artifact_root: str = ARTIFACT_DIR) -> str:
+    """
+    path inside the artifact directory of this run moved to the artifact directory of run_id under
+    artifact_root, other paths inside ARTIFACT_DIR (caches, stores, reference profile) are moved under
+    artifact_root so an isolated run such as a dry run shares nothing with regular runs
+    """
+    if path.startswith(training_pipeline_config.artifact_dir):
+        return get_run_artifact_dir(run_id, artifact_root) + path[len(training_pipeline_config.artifact_dir):]
+    if artifact_root != ARTIFACT_DIR and path.startswith(ARTIFACT_DIR + os.sep):
+        return os.path.join(artifact_root, path[len(ARTIFACT_DIR + os.sep):])
+    return path
+
+
+def get_run_config(config, run_id: str, artifact_root: str = ARTIFACT_DIR):
+    """
+    copy of a stage config with its artifact paths moved by get_run_path, used to resume an earlier run
+    or to isolate a dry run
+    """
+    run_paths = {}
+    for config_field in fields(config):
+        value = getattr(config, config_field.name)
+        if isinstance(value, str):
+            run_paths[config_field.name] = get_run_path(value, run_id, artifact_root)
+    return replace(config, **run_paths)
+
+
 @dataclass
 class DataIngestionConfig:
     data_ingestion_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_INGESTION_DIR_NAME)
@@ -22,12 +87,33 @@ class DataIngestionConfig:
     testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
     collection_name: str = COLLECTION_NAME
+    split_mode: str = DATA_INGESTION_SPLIT_MODE
+    split_key_column: str = DATA_INGESTION_SPLIT_KEY_COLUMN
+    stratify_column: Optional[str] = DATA_INGESTION_STRATIFY_COLUMN
+    chunk_size: int = DATA_INGESTION_CHUNK_SIZE
+    train_profile_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_PROFILE_DIR,
+                                                DATA_INGESTION_TRAIN_PROFILE_FILE_NAME)
+    test_profile_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_PROFILE_DIR,
+                                               DATA_INGESTION_TEST_PROFILE_FILE_NAME)
+    profile_max_centroids: int = DATA_INGESTION_PROFILE_MAX_CENTROIDS
+    sample_fraction: Optional[float] = DATA_INGESTION_SAMPLE_FRACTION
+    sample_hash_key: str = DATA_INGESTION_SAMPLE_HASH_KEY
     
 @dataclass
 class DataValidationConfig:
     data_validation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_VALIDATION_DIR_NAME)
     drift_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_DRIFT_REPORT_DIR,
                                                DATA_VALIDATION_DRIFT_REPORT_FILE_NAME)
+    validation_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_VALIDATION_REPORT_DIR,
+                                                    DATA_VALIDATION_VALIDATION_REPORT_FILE_NAME)
+    chunk_size: int = DATA_VALIDATION_CHUNK_SIZE
+    drift_engine: str = DATA_VALIDATION_DRIFT_ENGINE
+    drift_threshold: float = DATA_VALIDATION_DRIFT_THRESHOLD
+    drift_share: float = DATA_VALIDATION_DRIFT_SHARE
+    drift_n_bins: int = DATA_VALIDATION_DRIFT_N_BINS
+    drift_n_jobs: int = DATA_VALIDATION_DRIFT_N_JOBS
+    drift_sample_size: Optional[int] = DATA_VALIDATION_DRIFT_SAMPLE_SIZE
+    reference_profile_file_path: str = DATA_VALIDATION_REFERENCE_PROFILE_FILE_PATH
     
     
 @dataclass
@@ -40,6 +126,27 @@ class DataTransformationConfig:
     transformed_object_file_path: str = os.path.join(data_transformation_dir,
                                                      DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
                                                      PREROCESSING_OBEJCT_FILE_NAME)
+    use_cache: bool = DATA_TRANSFORMATION_USE_CACHE
+    cache_dir: str = DATA_TRANSFORMATION_CACHE_DIR
+    cache_max_entries: int = DATA_TRANSFORMATION_CACHE_MAX_ENTRIES
+    transformed_train_sample_weight_file_path: str = os.path.join(data_transformation_dir,
+                                                                  DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                                  DATA_TRANSFORMATION_SAMPLE_WEIGHT_FILE_NAME)
+    resampling_strategy: str = DATA_TRANSFORMATION_RESAMPLING_STRATEGY
+    resampling_n_jobs: int = DATA_TRANSFORMATION_RESAMPLING_N_JOBS
+    resampling_approximate_neighbors: bool = DATA_TRANSFORMATION_RESAMPLING_APPROXIMATE_NEIGHBORS
+    resampling_chunk_size: Optional[int] = DATA_TRANSFORMATION_RESAMPLING_CHUNK_SIZE
+    resample_test: bool = DATA_TRANSFORMATION_RESAMPLE_TEST
+    transformed_train_target_file_path: str = os.path.join(data_transformation_dir,
+                                                           DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                           DATA_TRANSFORMATION_TRAIN_TARGET_FILE_NAME)
+    transformed_test_target_file_path: str = os.path.join(data_transformation_dir,
+                                                          DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                          DATA_TRANSFORMATION_TEST_TARGET_FILE_NAME)
+    sparse_threshold: float = DATA_TRANSFORMATION_SPARSE_THRESHOLD
+    array_dtype: str = DATA_TRANSFORMATION_ARRAY_DTYPE
+    n_jobs: int = DATA_TRANSFORMATION_N_JOBS
+    output_dtype: str = DATA_TRANSFORMATION_OUTPUT_DTYPE
     
 @dataclass
 class ModelTrainerConfig:
@@ -47,6 +154,23 @@ class ModelTrainerConfig:
     trained_model_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_FILE_NAME)
     expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
     model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    mmap_mode: Optional[str] = MODEL_TRAINER_MMAP_MODE
+    trial_store_dir: Optional[str] = MODEL_TRAINER_TRIAL_STORE_DIR
+    n_jobs: Optional[int] = MODEL_TRAINER_N_JOBS
+    model_config_profile: Optional[str] = MODEL_TRAINER_MODEL_CONFIG_PROFILE
+    warm_start: bool = MODEL_TRAINER_WARM_START
+    warm_start_n_estimators: int = MODEL_TRAINER_WARM_START_N_ESTIMATORS
+    warm_start_min_new_rows: int = MODEL_TRAINER_WARM_START_MIN_NEW_ROWS
+    row_key_column: str = MODEL_TRAINER_ROW_KEY_COLUMN
+    training_row_keys_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR,
+                                                    MODEL_TRAINER_TRAINING_ROW_KEYS_FILE_NAME)
+    inference_batch_size: int = MODEL_TRAINER_INFERENCE_BATCH_SIZE
+    max_single_row_latency_ms: Optional[float] = MODEL_TRAINER_MAX_SINGLE_ROW_LATENCY_MS
+    max_batch_latency_ms: Optional[float] = MODEL_TRAINER_MAX_BATCH_LATENCY_MS
+    max_model_size_mb: Optional[float] = MODEL_TRAINER_MAX_MODEL_SIZE_MB
+    export_onnx: bool = MODEL_TRAINER_EXPORT_ONNX
+    onnx_model_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_ONNX_FILE_NAME)
+    onnx_min_prediction_agreement: float = MODEL_TRAINER_ONNX_MIN_PREDICTION_AGREEMENT
     
     
 @dataclass
@@ -54,15 +178,28 @@ class ModelEvaluationConfig:
     changed_threshold_score: float = MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    score_store_dir: Optional[str] = MODEL_EVALUATION_SCORE_STORE_DIR
+    max_single_row_latency_ms: Optional[float] = MODEL_EVALUATION_MAX_SINGLE_ROW_LATENCY_MS
+    max_batch_latency_ms: Optional[float] = MODEL_EVALUATION_MAX_BATCH_LATENCY_MS
+    max_model_size_mb: Optional[float] = MODEL_EVALUATION_MAX_MODEL_SIZE_MB
+    registry_key: Optional[str] = MODEL_PUSHER_S3_KEY
     
 
 @dataclass
 class ModelPusherConfig:
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    s3_onnx_model_key_path: str = MODEL_ONNX_FILE_NAME
+    registry_key: Optional[str] = MODEL_PUSHER_S3_KEY
+    compression: str = MODEL_PUSHER_COMPRESSION
+    buffer_threshold_bytes: int = MODEL_PUSHER_BUFFER_THRESHOLD_BYTES
     
     
 @dataclass
 class TravelPredictorConfig:
     model_file_path: str = MODEL_FILE_NAME
-    model_bucket_name: str = MODEL_BUCKET_NAME
\ No newline at end of file
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    onnx_model_file_path: str = MODEL_ONNX_FILE_NAME
+    backend: str = MODEL_PREDICTOR_BACKEND
+    registry_key: Optional[str] = MODEL_PUSHER_S3_KEY
+    registry_pointer_ttl_seconds: float = MODEL_PREDICTOR_REGISTRY_POINTER_TTL_SECONDS
\ No newline at end of file
@@ -2,7 +2,9 @@ from travel_pack.exception import TravelException
 from travel_pack.logger import logging
 from sklearn.pipeline import Pipeline
 import sys
+import numpy as np
 from pandas import DataFrame
+from travel_pack.utils.onnx_utils import get_onnx_inputs
 
 
 class TravelModel:
@@ -37,4 +39,48 @@ class TravelModel:
         return f"{type(self.trained_model_object).__name__}()"
 
     def __str__(self):
-        return f"{type(self.trained_model_object).__name__}()"
\ No newline at end of file
+        return f"{type(self.trained_model_object).__name__}()"
+
+
+class OnnxTravelModel:
+    """
+    TravelModel converted into one ONNX graph, predicting with ONNX Runtime on CPU
+    """
+
+    def __init__(self, onnx_model: bytes):
+        """
+        :param onnx_model: serialized ONNX model of preprocessor and estimator
+        """
+        self.onnx_model = onnx_model
+        self._session = None
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "OnnxTravelModel":
+        with open(file_path, "rb") as file_obj:
+            return cls(file_obj.read())
+
+    def get_session(self) -> object:
+        if self._session is None:
+            import onnxruntime
+            self._session = onnxruntime.InferenceSession(self.onnx_model, providers=["CPUExecutionProvider"])
+        return self._session
+
+    def predict(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Function accepts raw inputs like TravelModel.predict, the preprocessing runs inside the graph
+        """
+        try:
+            session = self.get_session()
+            label_output = session.get_outputs()[0].name
+            return session.run([label_output], get_onnx_inputs(session, dataframe))[0]
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def __getstate__(self):
+        return {"onnx_model": self.onnx_model, "_session": None}
+
+    def __repr__(self):
+        return "OnnxTravelModel()"
+
+    def __str__(self):
+        return "OnnxTravelModel()"
@@ -0,0 +1,178 @@
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+from pandas import DataFrame
+
+from travel_pack.cloud_storage.aws_storage import SimpleStorageService
+from travel_pack.constants import MODEL_ONNX_FILE_NAME, MODEL_TRAINER_TRAINING_ROW_KEYS_FILE_NAME
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.entity.estimator import TravelModel, OnnxTravelModel
+from travel_pack.utils.bundle_utils import BUNDLE_MANIFEST_FILE_NAME, load_model_bundle_files
+
+
+class ModelRegistry:
+    """
+    Versioned model bundles in the model bucket:
+        <registry_key>/<model_version>/manifest.json and the bundle files (compressed pickle, buffers, model.onnx)
+        <registry_key>/<model_version>/ side files of the training pipeline outside the manifest, never loaded
+        for predictions (training_row_keys.npy)
+        <registry_key>/current.json pointing to the current version
+    A push uploads the version first and replaces the pointer last in a single put, so readers never see a
+    partly uploaded model. Pointers and loaded models are kept per process: a server reads the small pointer
+    at most once per pointer_ttl_seconds and downloads a model only when the version changes.
+    """
+
+    POINTER_FILE_NAME = "current.json"
+    # (bucket name, registry key, backend) -> (model version, loaded model)
+    _loaded_models = {}
+    # (bucket name, registry key) -> (time.monotonic() of the read, pointer or None)
+    _pointers = {}
+
+    def __init__(self, bucket_name: str, registry_key: str, backend: str = "pickle", pointer_ttl_seconds: float = 0):
+        """
+        :param bucket_name: Name of your model bucket
+        :param registry_key: Key prefix of the registry in the bucket
+        :param backend: "pickle" loads the TravelModel, "onnx" its ONNX graph when the version has one
+        :param pointer_ttl_seconds: seconds a pointer read by this process is reused, 0 reads it on every call
+        """
+        self.bucket_name = bucket_name
+        self.registry_key = registry_key
+        self.backend = backend
+        self.pointer_ttl_seconds = pointer_ttl_seconds
+        self.s3 = SimpleStorageService()
+        self.current: Optional[dict] = None
+
+    def get_key(self, *parts: str) -> str:
+        return "/".join([self.registry_key.rstrip("/"), *parts])
+
+    def get_current(self) -> Optional[dict]:
+        """
+        Read the pointer of the current version, reusing the pointer this process read less than
+        pointer_ttl_seconds ago
+        :return: dict with model_version and manifest_key, None when nothing was pushed
+        """
+        try:
+            pointer_cache_key = (self.bucket_name, self.registry_key)
+            read_time, pointer = self._pointers.get(pointer_cache_key, (None, None))
+            if read_time is not None and time.monotonic() - read_time < self.pointer_ttl_seconds:
+                self.current = pointer
+                return self.current
+            pointer_key = self.get_key(self.POINTER_FILE_NAME)
+            if not self.s3.s3_key_path_available(bucket_name=self.bucket_name, s3_key=pointer_key):
+                self.current = None
+            else:
+                self.current = json.loads(self.s3.read_object_bytes(pointer_key, bucket_name=self.bucket_name))
+            self._pointers[pointer_cache_key] = (time.monotonic(), self.current)
+            return self.current
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def is_model_present(self, model_path: Optional[str] = None) -> bool:
+        return self.get_current() is not None
+
+    def get_model_version(self) -> str:
+        current = self.current or self.get_current()
+        return current["model_version"]
+
+    def get_manifest(self, model_version: str) -> dict:
+        manifest_key = self.get_key(model_version, BUNDLE_MANIFEST_FILE_NAME)
+        return json.loads(self.s3.read_object_bytes(manifest_key, bucket_name=self.bucket_name))
+
+    def push(self, bundle_dir: str, manifest: dict, side_file_paths: Optional[List[str]] = None) -> str:
+        """
+        Upload a model bundle as a new version and make it current
+        :param bundle_dir: local bundle directory written by save_model_bundle
+        :param manifest: manifest of the bundle
+        :param side_file_paths: local files stored under the version by their file name but left out of the
+                                manifest, e.g. the training row keys read by a warm start
+        :return: key of the manifest of the pushed version
+        """
+        try:
+            model_version = manifest["model_version"]
+            manifest_key = self.get_key(model_version, BUNDLE_MANIFEST_FILE_NAME)
+            if self.s3.s3_key_path_available(bucket_name=self.bucket_name, s3_key=manifest_key):
+                logging.info(f"Model version {model_version} is already in the registry")
+            else:
+                # the manifest goes last, a version with a manifest is complete
+                file_paths = [os.path.join(bundle_dir, file_name) for file_name in manifest["files"]]
+                file_paths += list(side_file_paths or []) + [os.path.join(bundle_dir, BUNDLE_MANIFEST_FILE_NAME)]
+                for file_path in file_paths:
+                    self.s3.upload_file(file_path, to_filename=self.get_key(model_version, os.path.basename(file_path)),
+                                        bucket_name=self.bucket_name, remove=False)
+            pointer = {"model_version": model_version, "manifest_key": manifest_key,
+                       "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+            self.s3.put_object_bytes(json.dumps(pointer).encode(), s3_key=self.get_key(self.POINTER_FILE_NAME),
+                                     bucket_name=self.bucket_name)
+            self.current = pointer
+            self._pointers[(self.bucket_name, self.registry_key)] = (time.monotonic(), pointer)
+            logging.info(f"Registry {self.registry_key} points to model version {model_version}")
+            return manifest_key
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def load_model(self) -> TravelModel:
+        """
+        Load the current model, reusing the model loaded by this process while the version is unchanged
+        :return:
+        """
+        try:
+            current = self.current or self.get_current()
+            if current is None:
+                raise Exception(f"No model in the registry {self.registry_key} of bucket {self.bucket_name}")
+            model_version = current["model_version"]
+            cache_key = (self.bucket_name, self.registry_key, self.backend)
+            loaded_version, loaded_model = self._loaded_models.get(cache_key, (None, None))
+            if loaded_version == model_version:
+                return loaded_model
+
+            manifest = self.get_manifest(model_version)
+
+            def read_file(file_name: str) -> bytes:
+                return self.s3.read_object_bytes(self.get_key(model_version, file_name), bucket_name=self.bucket_name)
+
+            if self.backend == "onnx" and MODEL_ONNX_FILE_NAME in manifest["files"]:
+                content = read_file(MODEL_ONNX_FILE_NAME)
+                if hashlib.sha256(content).hexdigest() != manifest["files"][MODEL_ONNX_FILE_NAME]["sha256"]:
+                    raise Exception(f"{MODEL_ONNX_FILE_NAME} of version {model_version} does not match its manifest")
+                model = OnnxTravelModel(content)
+            else:
+                model = load_model_bundle_files(manifest, read_file)
+            self._loaded_models[cache_key] = (model_version, model)
+            logging.info(f"Loaded model version {model_version} from the registry {self.registry_key}")
+            return model
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def load_training_row_keys(self) -> Optional[np.ndarray]:
+        """
+        Load the keys of the rows the current version was trained on, a side file of the version
+        :return: row keys, None when the version was pushed without them
+        """
+        try:
+            current = self.current or self.get_current()
+            if current is None:
+                return None
+            row_keys_key = self.get_key(current["model_version"], MODEL_TRAINER_TRAINING_ROW_KEYS_FILE_NAME)
+            if not self.s3.s3_key_path_available(bucket_name=self.bucket_name, s3_key=row_keys_key):
+                return None
+            return np.load(io.BytesIO(self.s3.read_object_bytes(row_keys_key, bucket_name=self.bucket_name)))
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def predict(self, dataframe: DataFrame):
+        """
+        :param dataframe:
+        :return:
+        """
+        try:
+            return self.load_model().predict(dataframe)
+        except Exception as e:
+            raise TravelException(e, sys) from e
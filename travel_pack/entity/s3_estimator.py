@@ -1,6 +1,6 @@
 from travel_pack.cloud_storage.aws_storage import SimpleStorageService
 from travel_pack.exception import TravelException
-from travel_pack.entity.estimator import TravelModel
+from travel_pack.entity.estimator import TravelModel, OnnxTravelModel
 import sys
 from pandas import DataFrame
 
@@ -10,14 +10,16 @@ class TravelEstimator:
     This class is used to save and retrieve us_visas model in s3 bucket and to do prediction
     """
 
-    def __init__(self,bucket_name,model_path,):
+    def __init__(self,bucket_name,model_path,backend:str="pickle"):
         """
         :param bucket_name: Name of your model bucket
         :param model_path: Location of your model in bucket
+        :param backend: "pickle" for a pickled TravelModel, "onnx" for its ONNX graph run by ONNX Runtime
         """
         self.bucket_name = bucket_name
         self.s3 = SimpleStorageService()
         self.model_path = model_path
+        self.backend = backend
         self.loaded_model:TravelModel=None
 
 
@@ -28,14 +30,40 @@ class TravelEstimator:
             print(e)
             return False
 
+    def get_model_version(self) -> str:
+        """
+        ETag and version id of the model in the bucket, changes whenever the model is replaced
+        :return:
+        """
+        return self.s3.get_object_version(self.model_path, bucket_name=self.bucket_name)
+
     def load_model(self,)->TravelModel:
         """
         Load the model from the model_path
         :return:
         """
 
+        if self.backend == "onnx":
+            return OnnxTravelModel(self.s3.read_object_bytes(self.model_path, bucket_name=self.bucket_name))
         return self.s3.load_model(self.model_path,bucket_name=self.bucket_name)
 
+    def load_training_row_keys(self):
+        """
+        The pickled model outside the registry is pushed without its training row keys
+        :return: None
+        """
+        return None
+
+    def remove_model(self)->None:
+        """
+        Remove the model from the model_path
+        :return:
+        """
+        try:
+            self.s3.remove_object(self.model_path, bucket_name=self.bucket_name)
+        except Exception as e:
+            raise TravelException(e, sys)
+
     def save_model(self,from_file,remove:bool=False)->None:
         """
         Save the model to the model_path
@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 from travel_pack.entity.config_entity import TravelPredictorConfig
 from travel_pack.entity.s3_estimator import TravelEstimator
+from travel_pack.entity.model_registry import ModelRegistry
 from travel_pack.exception import TravelException
 from travel_pack.logger import logging
 from travel_pack.utils.main_utils import read_yaml_file
@@ -115,8 +116,23 @@ class TravelClassifier:
         try:
             # self.schema_config = read_yaml_file(SCHEMA_FILE_PATH)
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.registry = None
         except Exception as e:
             raise TravelException(e, sys) from e
+
+    def get_registry(self) -> ModelRegistry:
+        """
+        model registry of the classifier, created on the first prediction and kept so the pointer of the
+        current model is read once per ttl instead of on every request
+        """
+        if self.registry is None:
+            self.registry = ModelRegistry(
+                bucket_name=self.prediction_pipeline_config.model_bucket_name,
+                registry_key=self.prediction_pipeline_config.registry_key,
+                backend=self.prediction_pipeline_config.backend,
+                pointer_ttl_seconds=self.prediction_pipeline_config.registry_pointer_ttl_seconds,
+            )
+        return self.registry
         
     def predict(self, dataframe) -> str:
         """
@@ -125,10 +141,25 @@ class TravelClassifier:
         """
         try:
             logging.info("Entered predict method of TravelClassifier class")
+            if self.prediction_pipeline_config.registry_key is not None:
+                registry = self.get_registry()
+                if registry.is_model_present():
+                    return registry.predict(dataframe)
+                logging.info("Model registry is empty, predicting with the pickled model")
             model = TravelEstimator(
                 bucket_name=self.prediction_pipeline_config.model_bucket_name,
                 model_path=self.prediction_pipeline_config.model_file_path,
             )
+            if self.prediction_pipeline_config.backend == "onnx":
+                onnx_model = TravelEstimator(
+                    bucket_name=self.prediction_pipeline_config.model_bucket_name,
+                    model_path=self.prediction_pipeline_config.onnx_model_file_path,
+                    backend="onnx",
+                )
+                if onnx_model.is_model_present(model_path=self.prediction_pipeline_config.onnx_model_file_path):
+                    model = onnx_model
+                else:
+                    logging.info("No ONNX model in the bucket, predicting with the pickled model")
             result = model.predict(dataframe)
             
             return result
@@ -1,8 +1,11 @@
 import os
 import sys
+import shutil
+
+from typing import List, Optional
 
 from travel_pack.exception import TravelException
-from travel_pack.logger import logging
+from travel_pack.logger import logging, logs_path
 
 from travel_pack.components.data_ingestion import DataIngestion
 from travel_pack.components.data_validation import DataValidation
@@ -11,7 +14,13 @@ from travel_pack.components.model_trainer import ModelTrainer
 from travel_pack.components.model_evaluation import ModelEvaluation
 from travel_pack.components.model_pusher import ModelPusher
 
-from travel_pack.entity.config_entity import (DataIngestionConfig,
+from travel_pack.entity.config_entity import (training_pipeline_config,
+                                              get_new_run_id,
+                                              is_valid_run_id,
+                                              get_run_artifact_dir,
+                                              get_run_path,
+                                              get_run_config,
+                                              DataIngestionConfig,
                                               DataValidationConfig,
                                               DataTransformationConfig,
                                               ModelTrainerConfig,
@@ -23,17 +32,43 @@ from travel_pack.entity.artifact_entity import (DataIngestionArtifact,
                                                 DataTransformationArtifact,
                                                 ModelTrainerArtifact,
                                                 ModelEvaluationArtifact,
-                                                ModelPusherArtifact)
+                                                ModelPusherArtifact,
+                                                ProductionModelScoreArtifact)
+from travel_pack.utils.sketch_utils import DatasetProfile
+from travel_pack.utils.resource_utils import ResourceManager
+from travel_pack.utils.stage_utils import Stage, StageCache, StageExecutor, RunManifest, get_code_version
+from travel_pack.utils.store_utils import ArtifactStore, get_runs, select_expired_runs, remove_old_log_files
+from travel_pack.constants import SCHEMA_FILE_PATH, ARTIFACT_DIR
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class TrainPipeline:
-    def __init__(self):
-        self.data_ingestion_config = DataIngestionConfig()
-        self.data_validation_config = DataValidationConfig()
-        self.data_transformation_config = DataTransformationConfig()
-        self.model_trainer_config = ModelTrainerConfig()
-        self.model_evaluation_config = ModelEvaluationConfig()
+    def __init__(self, run_id: Optional[str] = None, dry_run: bool = False):
+        """
+        :param run_id: id of an earlier run to resume from its first unfinished stage, None starts a new run
+        :param dry_run: run every stage on a hash sample, stratified like the train/test split, with the reduced
+                        search of the model.yaml dry run profile, in the dry run artifact directory and without
+                        pushing the model
+        """
+        if run_id is not None and not is_valid_run_id(run_id):
+            raise ValueError(f"Invalid run id: {run_id!r}, expected a run directory name like {get_new_run_id()}")
+        self.resume = run_id is not None
+        self.dry_run = dry_run
+        self.run_id = run_id or get_new_run_id()
+        self.artifact_root = training_pipeline_config.dry_run_artifact_dir if dry_run else ARTIFACT_DIR
+        self.artifact_dir = get_run_artifact_dir(self.run_id, self.artifact_root)
+        self.data_ingestion_config = get_run_config(DataIngestionConfig(), self.run_id, self.artifact_root)
+        self.data_validation_config = get_run_config(DataValidationConfig(), self.run_id, self.artifact_root)
+        self.data_transformation_config = get_run_config(DataTransformationConfig(), self.run_id, self.artifact_root)
+        self.model_trainer_config = get_run_config(ModelTrainerConfig(), self.run_id, self.artifact_root)
+        self.model_evaluation_config = get_run_config(ModelEvaluationConfig(), self.run_id, self.artifact_root)
         self.model_pusher_config = ModelPusherConfig()
+        if dry_run:
+            self.data_ingestion_config.sample_fraction = training_pipeline_config.dry_run_sample_fraction
+            self.model_trainer_config.model_config_profile = training_pipeline_config.dry_run_model_profile
+        self.resource_manager = ResourceManager(n_cores=training_pipeline_config.n_cores,
+                                                stage_max_cores=training_pipeline_config.stage_max_cores)
         
     def start_data_ingestion(self) -> DataIngestionArtifact:
         """
@@ -58,10 +93,17 @@ class TrainPipeline:
         """
         logging.info("Entered the start_data_validation method of TrainPipeline class")
         try:
-            data_validation = DataValidation(data_ingestion_artifact=data_ingestion_artifact,
-                                             data_validation_config=self.data_validation_config)
-            
-            data_validation_artifact = data_validation.initiate_data_validation()
+            with self.resource_manager.stage("data_validation",
+                                             n_concurrent_stages=self.get_concurrent_stages()) as n_cores:
+                data_validation_config = self.resource_manager.limit_n_jobs(self.data_validation_config, n_cores,
+                                                                            fields=["drift_n_jobs"])
+                data_validation = DataValidation(data_ingestion_artifact=data_ingestion_artifact,
+                                                 data_validation_config=data_validation_config)
+                
+                data_validation_artifact = data_validation.initiate_data_validation()
+
+            if not data_validation_artifact.validation_status:
+                raise Exception(data_validation_artifact.message)
             
             logging.info("Performed the data validation operation")
             
@@ -75,44 +117,83 @@ class TrainPipeline:
         
     def start_data_transformation(self,
                                   data_ingestion_artifact: DataIngestionArtifact, 
-                                  data_validation_artifact: DataValidationArtifact) -> DataTransformationArtifact:
+                                  data_validation_artifact: Optional[DataValidationArtifact]) -> DataTransformationArtifact:
         """
         This method of TrainPipeline class is responsible for starting data transformation component
         """
         try:
-            data_transformation = DataTransformation(data_ingestion_artifact=data_ingestion_artifact,
-                                                     data_transformation_config=self.data_transformation_config,
-                                                     data_validation_artifact=data_validation_artifact)
-            data_transformation_artifact = data_transformation.initiate_data_transformation()
+            with self.resource_manager.stage("data_transformation",
+                                             n_concurrent_stages=self.get_concurrent_stages()) as n_cores:
+                data_transformation_config = self.resource_manager.limit_n_jobs(
+                    self.data_transformation_config, n_cores, fields=["n_jobs", "resampling_n_jobs"])
+                data_transformation = DataTransformation(data_ingestion_artifact=data_ingestion_artifact,
+                                                         data_transformation_config=data_transformation_config,
+                                                         data_validation_artifact=data_validation_artifact)
+                data_transformation_artifact = data_transformation.initiate_data_transformation()
             return data_transformation_artifact
         except Exception as e:
             raise TravelException(e, sys) from e
         
         
-    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact,
+                            data_ingestion_artifact: Optional[DataIngestionArtifact] = None,
+                            data_validation_artifact: Optional[DataValidationArtifact] = None) -> ModelTrainerArtifact:
         """
-        This method of TrainPipeline class is responsible for starting model training
+        This method of TrainPipeline class is responsible for starting model training,
+        a warm start loads the production model to continue training it
         """
         try:
-            model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
-                                         model_trainer_config=self.model_trainer_config
-                                         )
-            model_trainer_artifact = model_trainer.initiate_model_trainer()
+            production_model, production_training_row_keys = None, None
+            if self.model_trainer_config.warm_start and data_ingestion_artifact is not None:
+                best_model = ModelEvaluation(model_eval_config=self.model_evaluation_config,
+                                             data_ingestion_artifact=data_ingestion_artifact,
+                                             model_trainer_artifact=None).get_best_model()
+                if best_model is not None:
+                    production_model = best_model.load_model()
+                    production_training_row_keys = best_model.load_training_row_keys()
+            with self.resource_manager.stage("model_trainer") as n_cores:
+                model_trainer_config = self.resource_manager.limit_n_jobs(self.model_trainer_config, n_cores,
+                                                                          fields=["n_jobs"])
+                model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
+                                             model_trainer_config=model_trainer_config,
+                                             data_ingestion_artifact=data_ingestion_artifact,
+                                             data_validation_artifact=data_validation_artifact,
+                                             production_model=production_model,
+                                             production_training_row_keys=production_training_row_keys
+                                             )
+                model_trainer_artifact = model_trainer.initiate_model_trainer()
             return model_trainer_artifact
 
         except Exception as e:
             raise TravelException(e, sys) from e
         
         
+    def start_production_model_scoring(self,
+                                       data_ingestion_artifact: DataIngestionArtifact) -> ProductionModelScoreArtifact:
+        """
+        This method of TrainPipeline class is responsible for scoring the production model on the test data,
+        independent of the trained model so it runs while the model is trained
+        """
+        try:
+            model_evaluation = ModelEvaluation(model_eval_config=self.model_evaluation_config,
+                                               data_ingestion_artifact=data_ingestion_artifact,
+                                               model_trainer_artifact=None)
+            return model_evaluation.score_production_model()
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def start_model_evaluation(self, data_ingestion_artifact: DataIngestionArtifact,
-                               model_trainer_artifact: ModelTrainerArtifact) -> ModelEvaluationArtifact:
+                               model_trainer_artifact: ModelTrainerArtifact,
+                               production_model_score_artifact: ProductionModelScoreArtifact = None
+                               ) -> ModelEvaluationArtifact:
         """
         This method of TrainPipeline class is responsible for starting modle evaluation
         """
         try:
             model_evaluation = ModelEvaluation(model_eval_config=self.model_evaluation_config,
                                                data_ingestion_artifact=data_ingestion_artifact,
-                                               model_trainer_artifact=model_trainer_artifact)
+                                               model_trainer_artifact=model_trainer_artifact,
+                                               production_model_score_artifact=production_model_score_artifact)
             model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
             return model_evaluation_artifact
         except Exception as e:
@@ -132,29 +213,175 @@ class TrainPipeline:
         except Exception as e:
             raise TravelException(e, sys) from e
 
+    def update_reference_profile(self, data_ingestion_artifact: DataIngestionArtifact) -> None:
+        """
+        This method of TrainPipeline class stores the profile of the data behind the pushed model
+        as the reference for drift detection of the next runs
+        """
+        try:
+            reference_profile = DatasetProfile.merged([
+                DatasetProfile.load(data_ingestion_artifact.train_profile_file_path),
+                DatasetProfile.load(data_ingestion_artifact.test_profile_file_path),
+            ])
+            reference_profile.save(self.data_validation_config.reference_profile_file_path)
+            logging.info("Updated the reference profile used for drift detection")
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
         
         
+    def get_stages(self) -> List[Stage]:
+        """
+        This method of TrainPipeline class declares the stages of the pipeline with their dependencies and inputs,
+        ingestion, production model scoring, evaluation and pushing read mongodb or s3 and always run, the other
+        stages are reused while their inputs are unchanged. Production model scoring runs while the model is
+        trained and with concurrent validation the data is transformed while drift is detected, a failed
+        validation fails the run and the transformation result is not used
+        """
+        concurrent_validation = training_pipeline_config.concurrent_validation
+        return [
+            Stage(name="data_ingestion", artifact_class=DataIngestionArtifact,
+                  run=lambda artifacts: self.start_data_ingestion()),
+            Stage(name="data_transformation", artifact_class=DataTransformationArtifact,
+                  depends_on=["data_ingestion"] if concurrent_validation else ["data_ingestion", "data_validation"],
+                  config=self.data_transformation_config,
+                  run=lambda artifacts: self.start_data_transformation(
+                      data_ingestion_artifact=artifacts["data_ingestion"],
+                      data_validation_artifact=artifacts.get("data_validation")),
+                  inputs=lambda artifacts: {
+                      "train": artifacts["data_ingestion"].trained_file_path,
+                      "test": artifacts["data_ingestion"].test_file_path,
+                      "schema": SCHEMA_FILE_PATH}),
+            Stage(name="data_validation", artifact_class=DataValidationArtifact, depends_on=["data_ingestion"],
+                  config=self.data_validation_config,
+                  run=lambda artifacts: self.start_data_validation(
+                      data_ingestion_artifact=artifacts["data_ingestion"]),
+                  inputs=lambda artifacts: {
+                      "train": artifacts["data_ingestion"].trained_file_path,
+                      "test": artifacts["data_ingestion"].test_file_path,
+                      "train_profile": artifacts["data_ingestion"].train_profile_file_path,
+                      "test_profile": artifacts["data_ingestion"].test_profile_file_path,
+                      "schema": SCHEMA_FILE_PATH,
+                      "reference_profile": self.data_validation_config.reference_profile_file_path}),
+            Stage(name="production_model_score", artifact_class=ProductionModelScoreArtifact,
+                  depends_on=["data_ingestion"],
+                  run=lambda artifacts: self.start_production_model_scoring(
+                      data_ingestion_artifact=artifacts["data_ingestion"])),
+            Stage(name="model_trainer", artifact_class=ModelTrainerArtifact,
+                  depends_on=["data_ingestion", "data_validation", "data_transformation"]
+                             + (["production_model_score"] if self.model_trainer_config.warm_start else []),
+                  config=self.model_trainer_config,
+                  run=lambda artifacts: self.start_model_trainer(
+                      data_transformation_artifact=artifacts["data_transformation"],
+                      data_ingestion_artifact=artifacts["data_ingestion"],
+                      data_validation_artifact=artifacts["data_validation"]),
+                  inputs=self.get_model_trainer_inputs),
+            Stage(name="model_evaluation", artifact_class=ModelEvaluationArtifact,
+                  depends_on=["data_ingestion", "model_trainer", "production_model_score"],
+                  run=lambda artifacts: self.start_model_evaluation(
+                      data_ingestion_artifact=artifacts["data_ingestion"],
+                      model_trainer_artifact=artifacts["model_trainer"],
+                      production_model_score_artifact=artifacts["production_model_score"])),
+            Stage(name="model_pusher", artifact_class=ModelPusherArtifact, depends_on=["model_evaluation"],
+                  condition=lambda artifacts: artifacts["model_evaluation"].is_model_accepted and not self.dry_run,
+                  run=lambda artifacts: self.start_model_pusher(
+                      model_evaluation_artifact=artifacts["model_evaluation"])),
+            Stage(name="reference_profile", depends_on=["data_ingestion", "model_pusher"],
+                  run=lambda artifacts: self.update_reference_profile(
+                      data_ingestion_artifact=artifacts["data_ingestion"])),
+        ]
+
+    @staticmethod
+    def get_concurrent_stages() -> int:
+        """
+        number of core budgeted stages sharing the cores while data validation and data transformation run,
+        both at once with concurrent validation
+        """
+        return 2 if training_pipeline_config.concurrent_validation else 1
+
+    def get_model_trainer_inputs(self, artifacts: dict) -> dict:
+        """
+        inputs of the model trainer stage, a warm started model also depends on the production model
+        and on the drift check deciding between warm start and full retrain
+        """
+        inputs = dict(vars(artifacts["data_transformation"]),
+                      model_config=self.model_trainer_config.model_config_file_path,
+                      trained_file_path=artifacts["data_ingestion"].trained_file_path,
+                      test_file_path=artifacts["data_ingestion"].test_file_path)
+        if self.model_trainer_config.warm_start:
+            inputs.update(production_model_version=artifacts["production_model_score"].model_version,
+                          drift_status=artifacts["data_validation"].drift_status)
+        return inputs
+
+    def manage_artifacts(self, artifact_store: ArtifactStore, stage_cache: Optional[StageCache]) -> None:
+        """
+        This method of TrainPipeline class adds the finished run to the artifact store, deletes the runs outside
+        the retention policy with the blobs and stage cache entries only they used, and removes old log files
+        """
+        try:
+            artifact_store.add_dir(self.artifact_dir)
+            corrupted_blob_paths = artifact_store.verify()
+            if corrupted_blob_paths:
+                raise Exception(f"{len(corrupted_blob_paths)} artifact store blobs do not match their hash: "
+                                f"{corrupted_blob_paths[:5]}")
+            runs = get_runs(self.artifact_root, training_pipeline_config.manifest_file_name)
+            expired_runs = select_expired_runs(runs, keep_last_runs=training_pipeline_config.keep_last_runs,
+                                               keep_accepted_runs=training_pipeline_config.keep_accepted_runs,
+                                               protected_run_ids=[self.run_id])
+            for run in expired_runs:
+                logging.info(f"Deleting run {run['run_id']} outside the retention policy")
+                shutil.rmtree(run["run_dir"], ignore_errors=True)
+            if stage_cache is not None:
+                stage_cache.collect_garbage()
+            artifact_store.collect_garbage()
+            log_dir = os.path.dirname(logs_path)
+            removed_log_files = remove_old_log_files(log_dir, keep_log_files=training_pipeline_config.keep_log_files,
+                                                     protected_file_names=[os.path.basename(logs_path)])
+            logging.info(f"Removed {removed_log_files} old log files from {log_dir}")
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
     def run_pipeline(self, ) -> None:
         """
-        This method of TrainPipeline class is responsible for running complete pipeline
+        This method of TrainPipeline class is responsible for running complete pipeline,
+        or the unfinished stages of the resumed run
         """
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
-            
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            
-            data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                          data_validation_artifact=data_validation_artifact)
+            manifest = RunManifest(file_path=os.path.join(self.artifact_dir, training_pipeline_config.manifest_file_name),
+                                   run_id=self.run_id)
+            if self.resume:
+                if not manifest.exists():
+                    raise Exception(f"No manifest of run {self.run_id} found at {manifest.file_path}")
+                manifest.load()
+            logging.info(f"{'Resuming' if self.resume else 'Starting'} training pipeline "
+                         f"{'dry run' if self.dry_run else 'run'} {self.run_id}")
+            stage_cache = None
+            if training_pipeline_config.use_stage_cache:
+                stage_cache = StageCache(cache_dir=get_run_path(training_pipeline_config.stage_cache_dir,
+                                                                self.run_id, self.artifact_root))
+            artifact_store = None
+            if training_pipeline_config.use_artifact_store:
+                artifact_store = ArtifactStore(store_dir=get_run_path(training_pipeline_config.artifact_store_dir,
+                                                                      self.run_id, self.artifact_root))
+                # a rerun into an existing run directory must not write through links into the blobs
+                artifact_store.detach_dir(self.artifact_dir)
+            code_version = get_code_version(PACKAGE_DIR, env_key=training_pipeline_config.code_version_env_key)
+            stage_executor = StageExecutor(stages=self.get_stages(),
+                                           run_artifact_dir=self.artifact_dir,
+                                           code_version=code_version,
+                                           stage_cache=stage_cache,
+                                           manifest=manifest,
+                                           max_workers=training_pipeline_config.max_concurrent_stages)
+            with self.resource_manager.limit_native_threads():
+                artifacts = stage_executor.run(resume=self.resume)
 
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
-            
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                    model_trainer_artifact=model_trainer_artifact)
-            
-            if not model_evaluation_artifact.is_model_accepted:
+            if artifact_store is not None:
+                self.manage_artifacts(artifact_store, stage_cache)
+
+            if self.dry_run:
+                logging.info(f"Dry run finished, artifacts are in {self.artifact_dir}, model not pushed.")
+            elif "model_pusher" not in artifacts:
                 logging.info(f"Model no accepted.")
-                return None
-            model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
         
         except Exception as e:
-            raise TravelException(e, sys) from e
\ No newline at end of file
+            raise TravelException(e, sys) from e
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import zlib
+import pickle
+import hashlib
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+
+BUNDLE_FORMAT = "travel_pack.model_bundle"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_MANIFEST_FILE_NAME = "manifest.json"
+BUNDLE_PICKLE_FILE_NAME = "model.pkl"
+BUNDLE_BUFFERS_FILE_NAME = "buffers.bin"
+
+# preferred first, zlib is the stdlib fallback when neither zstandard nor lz4 is installed
+COMPRESSION_CODECS = ["zstd", "lz4", "zlib"]
+
+
+def get_codec(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """
+    compress and decompress functions of a codec, ImportError when its package is not installed
+    """
+    if name == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    if name == "lz4":
+        import lz4.frame
+        return lz4.frame.compress, lz4.frame.decompress
+    if name == "zlib":
+        return lambda data: zlib.compress(data, 1), zlib.decompress
+    raise Exception(f"Unknown compression codec: {name}, expected one of {COMPRESSION_CODECS}")
+
+
+def get_available_codec(preferred: str) -> str:
+    """
+    the preferred codec when installed, else the first installed one of COMPRESSION_CODECS
+    """
+    for name in [preferred] + [codec for codec in COMPRESSION_CODECS if codec != preferred]:
+        try:
+            get_codec(name)
+            return name
+        except ImportError:
+            logging.info(f"Compression codec {name} is not installed")
+    raise Exception("No compression codec available")
+
+
+def get_bundle_file_name(file_name: str, compression: str) -> str:
+    return f"{file_name}.{compression}"
+
+
+def save_model_bundle(obj: object, bundle_dir: str, compression: str = "zstd", buffer_threshold_bytes: int = 16384,
+                      schema: Optional[dict] = None, metadata: Optional[dict] = None) -> dict:
+    """
+    Method Name :   save_model_bundle
+    Description :   This function writes an object as a compressed model bundle: a pickle (protocol 5) whose
+                    numpy buffers of at least buffer_threshold_bytes are taken out of band, compressed one
+                    by one into a buffers file, and a small manifest with the format version, the model
+                    version (hash of the uncompressed content), file hashes, schema and metadata
+
+    Output      :   Returns manifest dict, written to bundle_dir/manifest.json
+    On Failure  :   Write an exception log and then raise an exception
+    """
+    try:
+        compression = get_available_codec(compression)
+        compress, _ = get_codec(compression)
+        buffers = []
+
+        def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+            if buffer.raw().nbytes < buffer_threshold_bytes:
+                return True
+            buffers.append(buffer)
+            return False
+
+        payload = pickle.dumps(obj, protocol=5, buffer_callback=buffer_callback)
+        content_hash = hashlib.sha256(payload)
+        os.makedirs(bundle_dir, exist_ok=True)
+        pickle_file_name = get_bundle_file_name(BUNDLE_PICKLE_FILE_NAME, compression)
+        buffers_file_name = get_bundle_file_name(BUNDLE_BUFFERS_FILE_NAME, compression)
+
+        buffer_index, offset = [], 0
+        with open(os.path.join(bundle_dir, buffers_file_name), "wb") as file_obj:
+            for buffer in buffers:
+                raw = buffer.raw()
+                content_hash.update(raw)
+                compressed = compress(raw)
+                file_obj.write(compressed)
+                buffer_index.append({"offset": offset, "size": len(compressed), "raw_size": raw.nbytes})
+                offset += len(compressed)
+        with open(os.path.join(bundle_dir, pickle_file_name), "wb") as file_obj:
+            file_obj.write(compress(payload))
+
+        files = {}
+        for file_name in [pickle_file_name, buffers_file_name]:
+            file_path = os.path.join(bundle_dir, file_name)
+            with open(file_path, "rb") as file_obj:
+                files[file_name] = {"sha256": hashlib.sha256(file_obj.read()).hexdigest(),
+                                    "size": os.path.getsize(file_path)}
+        manifest = {"format": BUNDLE_FORMAT, "format_version": BUNDLE_FORMAT_VERSION,
+                    "model_version": content_hash.hexdigest()[:16],
+                    "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "model": repr(obj), "compression": compression,
+                    "pickle_file": pickle_file_name, "buffers_file": buffers_file_name, "buffers": buffer_index,
+                    "raw_size": len(payload) + sum(buffer["raw_size"] for buffer in buffer_index),
+                    "files": files, "schema": schema or {}, "metadata": metadata or {}}
+        with open(os.path.join(bundle_dir, BUNDLE_MANIFEST_FILE_NAME), "w") as file_obj:
+            json.dump(manifest, file_obj, indent=2)
+        logging.info(f"Saved model bundle {manifest['model_version']} to {bundle_dir}: "
+                     f"{manifest['raw_size']} bytes compressed to {sum(f['size'] for f in files.values())} "
+                     f"with {compression}, {len(buffer_index)} out of band buffers")
+        return manifest
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def add_bundle_file(bundle_dir: str, file_path: str) -> dict:
+    """
+    copy a file (e.g. the ONNX graph of the model) into a model bundle and record its hash in the manifest
+    return: updated manifest dict
+    """
+    try:
+        manifest = read_bundle_manifest(bundle_dir)
+        file_name = os.path.basename(file_path)
+        with open(file_path, "rb") as file_obj:
+            content = file_obj.read()
+        with open(os.path.join(bundle_dir, file_name), "wb") as file_obj:
+            file_obj.write(content)
+        manifest["files"][file_name] = {"sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+        with open(os.path.join(bundle_dir, BUNDLE_MANIFEST_FILE_NAME), "w") as file_obj:
+            json.dump(manifest, file_obj, indent=2)
+        return manifest
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def load_model_bundle_files(manifest: dict, read_file: Callable[[str], bytes]) -> object:
+    """
+    Method Name :   load_model_bundle_files
+    Description :   This function loads the object of a model bundle, read_file returns the content of a bundle
+                    file by name (local file or bucket object). Every file is checked against its manifest hash
+
+    Output      :   Returns the object of the bundle
+    On Failure  :   Write an exception log and then raise an exception
+    """
+    try:
+        if manifest.get("format") != BUNDLE_FORMAT or manifest.get("format_version", 0) > BUNDLE_FORMAT_VERSION:
+            raise Exception(f"Unsupported model bundle format {manifest.get('format')} "
+                            f"version {manifest.get('format_version')}")
+        _, decompress = get_codec(manifest["compression"])
+        contents = {}
+        for file_name in [manifest["pickle_file"], manifest["buffers_file"]]:
+            contents[file_name] = read_file(file_name)
+            if hashlib.sha256(contents[file_name]).hexdigest() != manifest["files"][file_name]["sha256"]:
+                raise Exception(f"Model bundle file {file_name} does not match its manifest hash")
+        buffers_content = memoryview(contents[manifest["buffers_file"]])
+        # writable buffers, so the loaded arrays are writable like unpickled ones
+        buffers = [bytearray(decompress(buffers_content[buffer["offset"]:buffer["offset"] + buffer["size"]]))
+                   for buffer in manifest["buffers"]]
+        return pickle.loads(decompress(contents[manifest["pickle_file"]]), buffers=buffers)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def read_bundle_manifest(bundle_dir: str) -> dict:
+    with open(os.path.join(bundle_dir, BUNDLE_MANIFEST_FILE_NAME), "r") as file_obj:
+        return json.load(file_obj)
+
+
+def load_model_bundle(bundle_dir: str) -> object:
+    """
+    load the object of a model bundle directory written by save_model_bundle
+    """
+    def read_file(file_name: str) -> bytes:
+        with open(os.path.join(bundle_dir, file_name), "rb") as file_obj:
+            return file_obj.read()
+
+    return load_model_bundle_files(read_bundle_manifest(bundle_dir), read_file)
@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from typing import Optional
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.utils.main_utils import open_for_replace
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_file_hash(file_path: str) -> str:
+    """
+    sha256 of the content of a file, read block by block
+    file_path: str location of file
+    return: hex digest
+    """
+    try:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(HASH_BLOCK_SIZE), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def describe_params(value: object) -> object:
+    """
+    json friendly description of a configuration value, estimators are replaced by their class name
+    so only their (separately listed) parameters take part in a fingerprint
+    """
+    if hasattr(value, "get_params"):
+        return type(value).__name__
+    if isinstance(value, dict):
+        return {str(key): describe_params(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [describe_params(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def get_object_hash(obj: object) -> str:
+    """
+    sha256 of the json description of a configuration object
+    obj: dict / list / estimator parameters
+    return: hex digest
+    """
+    try:
+        content = json.dumps(describe_params(obj), sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """
+    hard link src to dst, falling back to a copy across file systems
+    """
+    try:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+class ArtifactCache:
+    """
+    Directory cache of files keyed by a content fingerprint with least recently used eviction.
+
+    Every key is a sub directory holding the cached files, hit/miss/eviction counts are kept in stats.json.
+    """
+
+    STATS_FILE_NAME = "stats.json"
+
+    def __init__(self, cache_dir: str, max_entries: int):
+        """
+        :param cache_dir: directory of the cache
+        :param max_entries: number of keys kept before the least recently used ones are evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def stats_file_path(self) -> str:
+        return os.path.join(self.cache_dir, self.STATS_FILE_NAME)
+
+    def _read_stats(self) -> dict:
+        if os.path.exists(self.stats_file_path):
+            with open(self.stats_file_path, "r") as file_obj:
+                return json.load(file_obj)
+        return {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _update_stats(self, **increments) -> None:
+        stats = self._read_stats()
+        for name, increment in increments.items():
+            stats[name] = stats.get(name, 0) + increment
+        with open_for_replace(self.stats_file_path, "w") as file_obj:
+            json.dump(stats, file_obj)
+
+    def _entry_dirs(self) -> list:
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if os.path.isdir(os.path.join(self.cache_dir, name)) and not name.startswith(".")]
+
+    def get_entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, key: str, file_names: list) -> Optional[str]:
+        """
+        Method Name :   lookup
+        Description :   This method looks up the files cached under a key and marks the key as recently used
+
+        Output      :   Returns the entry directory on a hit, None on a miss
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            entry_dir = self.get_entry_dir(key)
+            if all(os.path.exists(os.path.join(entry_dir, file_name)) for file_name in file_names):
+                os.utime(entry_dir)
+                self._update_stats(hits=1)
+                logging.info(f"Cache hit for key {key} in {self.cache_dir}")
+                return entry_dir
+            self._update_stats(misses=1)
+            logging.info(f"Cache miss for key {key} in {self.cache_dir}")
+            return None
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def store(self, key: str, files: dict) -> str:
+        """
+        Method Name :   store
+        Description :   This method stores files under a key, the entry only becomes visible once complete,
+                        then evicts the least recently used entries above max_entries
+
+        Output      :   Returns the entry directory
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            entry_dir = self.get_entry_dir(key)
+            tmp_dir = os.path.join(self.cache_dir, f".{key}.{os.getpid()}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            for file_name, src in files.items():
+                link_or_copy(src, os.path.join(tmp_dir, file_name))
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            logging.info(f"Stored cache entry {key} in {self.cache_dir}")
+            self.evict()
+            return entry_dir
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def evict(self) -> None:
+        """
+        Method Name :   evict
+        Description :   This method removes the least recently used entries above max_entries
+
+        Output      :   evicted entry directories are deleted
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            entry_dirs = sorted(self._entry_dirs(), key=os.path.getmtime, reverse=True)
+            evicted = entry_dirs[self.max_entries:]
+            for entry_dir in evicted:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                logging.info(f"Evicted cache entry {entry_dir}")
+            if len(evicted) > 0:
+                self._update_stats(evictions=len(evicted))
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_stats(self) -> dict:
+        """
+        Method Name :   get_stats
+        Description :   This method returns hit/miss/eviction counts with the current number and size of entries
+
+        Output      :   Returns dict of cache statistics
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            stats = self._read_stats()
+            entry_dirs = self._entry_dirs()
+            stats["entries"] = len(entry_dirs)
+            stats["size_bytes"] = sum(os.path.getsize(os.path.join(root, file_name))
+                                      for entry_dir in entry_dirs
+                                      for root, _, file_names in os.walk(entry_dir)
+                                      for file_name in file_names)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = stats["hits"] / lookups if lookups > 0 else 0.0
+            return stats
+        except Exception as e:
+            raise TravelException(e, sys) from e
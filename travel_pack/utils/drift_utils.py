@@ -0,0 +1,317 @@
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from scipy.special import kolmogorov
+from scipy.stats import chi2_contingency
+
+from travel_pack.constants import RANDOM_STATE
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+
+PSI_EPSILON = 1e-6
+# numeric columns with at most this many distinct values (flags, scores, small counts) are tested with chi-square
+# on their value frequencies like categorical columns, as evidently does
+NUMERIC_CATEGORICAL_MAX_UNIQUE = 5
+
+
+def get_numeric_bin_edges(reference: np.ndarray, n_bins: int) -> np.ndarray:
+    """
+    get the inner bin edges of a numeric column from the quantiles of its reference values
+    discrete columns collapse to one bin per distinct value
+    reference: np.array of reference values without nulls
+    n_bins: maximum number of bins
+    return: np.array of sorted unique edges
+    """
+    try:
+        quantiles = np.quantile(reference, np.linspace(0, 1, n_bins + 1)[1:-1])
+        return np.unique(quantiles)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_numeric_histogram(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    count the values falling in each bin, the first and last bins are open ended
+    values: np.array of values without nulls
+    edges: inner bin edges from get_numeric_bin_edges
+    return: np.array of len(edges) + 1 counts
+    """
+    try:
+        return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_psi(reference_counts: np.ndarray, current_counts: np.ndarray) -> float:
+    """
+    population stability index between two histograms on the same bins
+    """
+    reference_share = np.clip(reference_counts / max(reference_counts.sum(), 1), PSI_EPSILON, None)
+    current_share = np.clip(current_counts / max(current_counts.sum(), 1), PSI_EPSILON, None)
+    return float(np.sum((current_share - reference_share) * np.log(current_share / reference_share)))
+
+
+def numeric_drift_from_counts(reference_counts: np.ndarray, current_counts: np.ndarray, threshold: float,
+                              statistic_error: float = 0.0) -> dict:
+    """
+    two sample Kolmogorov-Smirnov test and PSI from two histograms on the same bins
+    the KS statistic is taken on the bin edges and the p-value uses the asymptotic distribution
+    reference_counts: np.array of reference counts per bin
+    current_counts: np.array of current counts per bin
+    threshold: p-value below which drift is detected
+    statistic_error: known error of the CDFs behind approximate histograms, e.g. the rank error of quantile
+        sketches. The p-value is taken on the statistic less this error, so on large data the sketch error
+        alone does not flag drift
+    return: dict drift result of the column
+    """
+    try:
+        n_reference, n_current = reference_counts.sum(), current_counts.sum()
+        if n_reference == 0 or n_current == 0:
+            return {"stattest": "ks", "statistic": None, "p_value": None, "psi": None, "drift_detected": False}
+        reference_cdf = np.cumsum(reference_counts) / n_reference
+        current_cdf = np.cumsum(current_counts) / n_current
+        statistic = float(np.max(np.abs(reference_cdf - current_cdf)))
+        effective_n = np.sqrt(n_reference * n_current / (n_reference + n_current))
+        p_value = float(kolmogorov(effective_n * max(statistic - statistic_error, 0.0)))
+        return {"stattest": "ks", "statistic": statistic, "p_value": p_value,
+                "psi": get_psi(reference_counts, current_counts), "drift_detected": p_value < threshold}
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def categorical_drift_from_counts(reference_counts: dict, current_counts: dict, threshold: float) -> dict:
+    """
+    chi-square test of homogeneity and PSI from the category frequencies of both datasets
+    reference_counts: dict category -> count in the reference data
+    current_counts: dict category -> count in the current data
+    threshold: p-value below which drift is detected
+    return: dict drift result of the column
+    """
+    try:
+        categories = sorted(set(reference_counts) | set(current_counts), key=str)
+        reference = np.array([reference_counts.get(category, 0) for category in categories], dtype=np.float64)
+        current = np.array([current_counts.get(category, 0) for category in categories], dtype=np.float64)
+        if reference.sum() == 0 or current.sum() == 0:
+            return {"stattest": "chisquare", "statistic": None, "p_value": None, "psi": None, "drift_detected": False}
+        if len(categories) < 2:
+            statistic, p_value = 0.0, 1.0
+        else:
+            statistic, p_value, _, _ = chi2_contingency(np.vstack([reference, current]))
+        return {"stattest": "chisquare", "statistic": float(statistic), "p_value": float(p_value),
+                "psi": get_psi(reference, current), "drift_detected": bool(p_value < threshold)}
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_category_counts(series: pd.Series) -> dict:
+    """
+    frequency of every non null category of a column, keys are strings so they survive json
+    """
+    counts = series.value_counts(dropna=True, sort=False)
+    return {str(category): int(count) for category, count in counts.items() if count > 0}
+
+
+def get_value_counts(values: np.ndarray, weights: Optional[np.ndarray] = None) -> dict:
+    """
+    frequency of every value of a numeric column, keys are strings so they survive json
+    values: np.array of values without nulls, or the exact centroids of a quantile sketch with their weights
+    """
+    if weights is None:
+        values, weights = np.unique(values, return_counts=True)
+    return {repr(float(value)): float(weight) for value, weight in zip(values, weights) if weight > 0}
+
+
+def is_low_cardinality(reference_values: np.ndarray, current_values: np.ndarray) -> bool:
+    return len(np.union1d(reference_values, current_values)) <= NUMERIC_CATEGORICAL_MAX_UNIQUE
+
+
+def get_drift_columns(schema_config: dict) -> dict:
+    """
+    get the columns compared for drift with their kind ("numeric" / "categorical")
+    identifier columns listed in drop_columns are left out since they drift by construction
+    schema_config: dict content of schema.yaml
+    return: dict of column name -> kind
+    """
+    drop_columns = set(schema_config.get("drop_columns", []))
+    drift_columns = {column: "numeric" for column in schema_config["numerical_columns"]
+                     if column not in drop_columns}
+    drift_columns.update({column: "categorical" for column in schema_config["categorical_columns"]
+                          if column not in drop_columns})
+    return drift_columns
+
+
+def _column_drift(reference: pd.Series, current: pd.Series, kind: str, threshold: float, n_bins: int) -> dict:
+    if kind == "categorical":
+        return categorical_drift_from_counts(get_category_counts(reference), get_category_counts(current), threshold)
+    reference_values = pd.to_numeric(reference).dropna().to_numpy(dtype=np.float64)
+    current_values = pd.to_numeric(current).dropna().to_numpy(dtype=np.float64)
+    if len(reference_values) == 0:
+        return numeric_drift_from_counts(np.zeros(1), np.zeros(1), threshold)
+    if is_low_cardinality(reference_values, current_values):
+        return categorical_drift_from_counts(get_value_counts(reference_values), get_value_counts(current_values),
+                                             threshold)
+    edges = get_numeric_bin_edges(reference_values, n_bins)
+    return numeric_drift_from_counts(get_numeric_histogram(reference_values, edges),
+                                     get_numeric_histogram(current_values, edges), threshold)
+
+
+def summarize_drift(columns_report: dict, drift_share: float) -> dict:
+    """
+    build the dataset level drift decision from the per column results
+    dataset drift is detected when at least drift_share of the columns drifted
+    columns_report: dict column -> drift result
+    drift_share: share of drifted columns which flags the dataset
+    return: dict drift report
+    """
+    n_features = len(columns_report)
+    n_drifted_features = sum(1 for result in columns_report.values() if result["drift_detected"])
+    share_drifted_features = n_drifted_features / n_features if n_features > 0 else 0.0
+    return {
+        "dataset_drift": bool(n_features > 0 and share_drifted_features >= drift_share),
+        "n_features": n_features,
+        "n_drifted_features": n_drifted_features,
+        "share_drifted_features": share_drifted_features,
+        "columns": columns_report,
+    }
+
+
+def get_dataset_drift_report(reference_df: DataFrame, current_df: DataFrame, drift_columns: dict,
+                             threshold: float = 0.05, drift_share: float = 0.5, n_bins: int = 50,
+                             n_jobs: int = 1, sample_size: Optional[int] = None) -> dict:
+    """
+    compare every drift column of the current data with the reference data
+    numeric columns use KS and PSI on histograms over the reference quantiles, categorical columns and
+    numeric columns of at most NUMERIC_CATEGORICAL_MAX_UNIQUE distinct values use chi-square and PSI on frequencies
+    reference_df: pandas DataFrame of reference data
+    current_df: pandas DataFrame of current data
+    drift_columns: dict column -> kind from get_drift_columns
+    threshold: p-value below which a column drifted
+    drift_share: share of drifted columns which flags the dataset
+    n_bins: maximum number of histogram bins of numeric columns
+    n_jobs: number of threads computing columns in parallel
+    sample_size: optional maximum number of rows used from each dataset
+    return: dict drift report
+    """
+    logging.info("Entered get_dataset_drift_report method of utils")
+    try:
+        if sample_size is not None:
+            if len(reference_df) > sample_size:
+                reference_df = reference_df.sample(n=sample_size, random_state=RANDOM_STATE)
+            if len(current_df) > sample_size:
+                current_df = current_df.sample(n=sample_size, random_state=RANDOM_STATE)
+
+        columns = [column for column in drift_columns if column in reference_df.columns and column in current_df.columns]
+
+        def compute(column):
+            return _column_drift(reference_df[column], current_df[column], drift_columns[column], threshold, n_bins)
+
+        if n_jobs == 1:
+            results = [compute(column) for column in columns]
+        else:
+            with ThreadPoolExecutor(max_workers=n_jobs if n_jobs > 0 else None) as executor:
+                results = list(executor.map(compute, columns))
+
+        columns_report = dict(zip(columns, results))
+        logging.info("Exited get_dataset_drift_report method of utils")
+        return summarize_drift(columns_report, drift_share)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_profile_drift_report(reference_profile, current_profile, threshold: float = 0.05,
+                             drift_share: float = 0.5, n_bins: int = 50) -> dict:
+    """
+    compare two DatasetProfile sketches column by column without touching the raw data
+    the tests are the same as get_dataset_drift_report, bins come from the reference quantile sketch
+    reference_profile: DatasetProfile of reference data
+    current_profile: DatasetProfile of current data
+    threshold: p-value below which a column drifted
+    drift_share: share of drifted columns which flags the dataset
+    n_bins: maximum number of histogram bins of numeric columns
+    return: dict drift report
+    """
+    logging.info("Entered get_profile_drift_report method of utils")
+    try:
+        columns_report = {}
+        for column, kind in reference_profile.columns.items():
+            if column not in current_profile.sketches:
+                continue
+            reference_sketch = reference_profile.sketches[column]
+            current_sketch = current_profile.sketches[column]
+            if kind == "categorical":
+                columns_report[column] = categorical_drift_from_counts(reference_sketch.counts,
+                                                                       current_sketch.counts, threshold)
+            elif is_low_cardinality(reference_sketch.means, current_sketch.means):
+                # sketches of so few distinct values are exact
+                columns_report[column] = categorical_drift_from_counts(
+                    get_value_counts(reference_sketch.means, reference_sketch.weights),
+                    get_value_counts(current_sketch.means, current_sketch.weights), threshold)
+            else:
+                edges = np.unique(reference_sketch.quantiles(np.linspace(0, 1, n_bins + 1)[1:-1]))
+                edges = edges[~np.isnan(edges)]
+                columns_report[column] = numeric_drift_from_counts(
+                    reference_sketch.histogram(edges), current_sketch.histogram(edges), threshold,
+                    statistic_error=reference_sketch.rank_error + current_sketch.rank_error)
+        logging.info("Exited get_profile_drift_report method of utils")
+        return summarize_drift(columns_report, drift_share)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_evidently_drift_report(reference_df: DataFrame, current_df: DataFrame) -> dict:
+    """
+    json report of the evidently DataDriftProfileSection, imported here since only the evidently drift
+    engine and the parity check need it
+    """
+    try:
+        from evidently.model_profile import Profile
+        from evidently.model_profile.sections import DataDriftProfileSection
+
+        data_drift_profile = Profile(sections=[DataDriftProfileSection()])
+        data_drift_profile.calculate(reference_df, current_df)
+        return json.loads(data_drift_profile.json())
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_evidently_test_kind(stattest_name: str) -> str:
+    """
+    "chisquare" for the frequency tests of evidently (chi-square, and the z-test of two valued columns which
+    is the chi-square test of a 2x2 table), "ks" for Kolmogorov-Smirnov, else the test name
+    """
+    name = stattest_name.lower()
+    if "chi" in name or "z-test" in name:
+        return "chisquare"
+    if "k-s" in name or "kolmogorov" in name:
+        return "ks"
+    return stattest_name
+
+
+def compare_drift_reports(drift_report: dict, evidently_report: dict) -> list:
+    """
+    per column parity of a native drift report with the evidently report of the same data: the kind of test
+    and the drift decision of both
+    drift_report: dict from get_dataset_drift_report
+    evidently_report: dict from get_evidently_drift_report
+    return: list of dict per column present in both reports, with "test_agrees" and "drift_agrees"
+    """
+    evidently_metrics = evidently_report["data_drift"]["data"]["metrics"]
+    rows = []
+    for column, result in drift_report["columns"].items():
+        evidently_result = evidently_metrics.get(column)
+        if not isinstance(evidently_result, dict):
+            continue
+        evidently_test = get_evidently_test_kind(evidently_result.get("stattest_name", ""))
+        evidently_score = evidently_result.get("drift_score", evidently_result.get("p_value"))
+        evidently_drift = bool(evidently_result.get("drift_detected", False))
+        rows.append({"column": column, "test": result["stattest"], "p_value": result["p_value"],
+                     "drift_detected": result["drift_detected"], "evidently_test": evidently_test,
+                     "evidently_score": evidently_score, "evidently_drift_detected": evidently_drift,
+                     "test_agrees": result["stattest"] == evidently_test,
+                     "drift_agrees": result["drift_detected"] == evidently_drift})
+    return rows
@@ -0,0 +1,175 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from travel_pack.constants import SCHEMA_FLOAT_DTYPE, SCHEMA_CATEGORY_DTYPE, SCHEMA_INT_DTYPES
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+
+
+def get_schema_column_types(schema_config: dict) -> dict:
+    """
+    get the declared type of every column in schema.yaml
+    schema_config: dict content of schema.yaml
+    return: dict of column name -> "int" / "float" / "category"
+    """
+    try:
+        column_types = {}
+        for column in schema_config["columns"]:
+            column_types.update(column)
+        return column_types
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_int_dtype(constraint: dict) -> str:
+    """
+    get the smallest nullable integer dtype of SCHEMA_INT_DTYPES holding the values an int column may take
+    constraint: dict column constraint of schema.yaml with allowed or min and max
+    return: dtype name, the widest one when the column is unbounded
+    """
+    if "allowed" in constraint:
+        bounds = [min(constraint["allowed"]), max(constraint["allowed"])]
+    elif "min" in constraint and "max" in constraint:
+        bounds = [constraint["min"], constraint["max"]]
+    else:
+        return SCHEMA_INT_DTYPES[-1]
+    for dtype in SCHEMA_INT_DTYPES:
+        int_info = np.iinfo(dtype.lower())
+        if int_info.min <= bounds[0] and bounds[1] <= int_info.max:
+            return dtype
+    return SCHEMA_INT_DTYPES[-1]
+
+
+def get_schema_dtypes(schema_config: dict) -> dict:
+    """
+    get the compact dtype of every column of schema.yaml, from the schema alone so every chunk of a
+    stream gets the same dtypes: int -> nullable Int* from get_int_dtype, float -> float32,
+    category -> pandas Categorical
+    schema_config: dict content of schema.yaml
+    return: dict of column name -> dtype
+    """
+    try:
+        constraints = schema_config.get("column_constraints", {})
+        schema_dtypes = {}
+        for column, column_type in get_schema_column_types(schema_config).items():
+            if column_type == "int":
+                schema_dtypes[column] = get_int_dtype(constraints.get(column, {}))
+            elif column_type == "float":
+                schema_dtypes[column] = SCHEMA_FLOAT_DTYPE
+            else:
+                schema_dtypes[column] = SCHEMA_CATEGORY_DTYPE
+        return schema_dtypes
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_read_dtypes(schema_config: dict) -> dict:
+    """
+    get the dtypes which can be applied by pandas while parsing a csv file
+    int columns are left out, files written before their dtypes were nullable hold integers as "1.0",
+    they are cast by compact_dataframe
+    schema_config: dict content of schema.yaml
+    return: dict of column name -> dtype
+    """
+    try:
+        column_types = get_schema_column_types(schema_config)
+        return {column: dtype for column, dtype in get_schema_dtypes(schema_config).items()
+                if column_types[column] != "int"}
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def cast_int_column(series: pd.Series, dtype: str, column: str) -> pd.Series:
+    """
+    cast an int column to its schema dtype. Values outside the declared range keep a wider nullable
+    integer dtype and non integral values float32, both are reported by data validation
+    """
+    series = pd.to_numeric(series)
+    for cast_dtype in [dtype, SCHEMA_INT_DTYPES[-1]]:
+        try:
+            return series.astype(cast_dtype)
+        except (TypeError, ValueError):
+            logging.info(f"Column {column} does not fit {cast_dtype}")
+    return series.astype(SCHEMA_FLOAT_DTYPE)
+
+
+def estimate_default_memory_usage(dataframe: DataFrame) -> int:
+    """
+    estimate the bytes the dataframe would take with pandas default dtypes
+    (float64/int64 for numbers and python strings for categories)
+    dataframe: pandas DataFrame
+    return: estimated size in bytes
+    """
+    try:
+        n_rows = len(dataframe)
+        total_bytes = 0
+        for column in dataframe.columns:
+            series = dataframe[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                counts = series.value_counts(sort=False)
+                string_bytes = sum(sys.getsizeof(str(category)) * int(count) for category, count in counts.items())
+                total_bytes += n_rows * 8 + string_bytes
+            elif pd.api.types.is_numeric_dtype(series.dtype):
+                total_bytes += n_rows * 8
+            else:
+                total_bytes += int(series.memory_usage(index=False, deep=True))
+        return total_bytes
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def compact_dataframe(dataframe: DataFrame, schema_config: dict, stage: str) -> DataFrame:
+    """
+    convert the schema.yaml columns of a dataframe to the compact dtypes of get_schema_dtypes, which do not
+    depend on the values of the dataframe. Columns are converted in place and the memory saved is logged.
+    dataframe: pandas DataFrame
+    schema_config: dict content of schema.yaml
+    stage: name of the pipeline stage, used in the memory report
+    return: the compacted dataframe
+    """
+    logging.info("Entered compact_dataframe method of utils")
+    try:
+        default_bytes = estimate_default_memory_usage(dataframe)
+
+        column_types = get_schema_column_types(schema_config)
+        for column, dtype in get_schema_dtypes(schema_config).items():
+            if column not in dataframe.columns:
+                continue
+            series = dataframe[column]
+            if column_types[column] == "category":
+                if not isinstance(series.dtype, pd.CategoricalDtype):
+                    dataframe[column] = series.astype(dtype)
+            elif column_types[column] == "int":
+                dataframe[column] = cast_int_column(series, dtype, column)
+            else:
+                dataframe[column] = pd.to_numeric(series).astype(dtype)
+
+        compact_bytes = int(dataframe.memory_usage(index=False, deep=True).sum())
+        logging.info(
+            f"[{stage}] dataframe memory: {default_bytes / 1024 ** 2:.2f} MB with default dtypes, "
+            f"{compact_bytes / 1024 ** 2:.2f} MB with schema dtypes, "
+            f"saved {(default_bytes - compact_bytes) / 1024 ** 2:.2f} MB"
+        )
+        logging.info("Exited compact_dataframe method of utils")
+        return dataframe
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def read_csv_with_schema(file_path: str, schema_config: dict, stage: str) -> DataFrame:
+    """
+    read a csv file with the compact dtypes of schema.yaml
+    float and category columns are typed while parsing, int columns are cast afterwards
+    file_path: str location of csv file
+    schema_config: dict content of schema.yaml
+    stage: name of the pipeline stage, used in the memory report
+    return: pandas DataFrame
+    """
+    try:
+        dataframe = pd.read_csv(file_path, dtype=get_read_dtypes(schema_config))
+        return compact_dataframe(dataframe, schema_config, stage=stage)
+    except Exception as e:
+        raise TravelException(e, sys) from e
@@ -0,0 +1,72 @@
+import sys
+import time
+from collections import namedtuple
+from dataclasses import dataclass
+from typing import List, Optional
+
+import dill
+import numpy as np
+
+from travel_pack.exception import TravelException
+
+# median predict latency on one row and on a batch of rows, and pickled size of a model
+InferenceCost = namedtuple("InferenceCost", ["single_row_latency_ms", "batch_latency_ms", "model_size_bytes"])
+
+
+def measure_inference_cost(model: object, X, batch_size: int = 1000, n_repeats: int = 20) -> InferenceCost:
+    """
+    time model.predict on the first row and on the first batch_size rows of X after one warm up call
+    model: fitted estimator, or TravelModel with raw feature rows
+    X: feature rows the model predicts on, array, sparse matrix or dataframe
+    n_repeats: timed calls of the single row predict, the batch predict is timed max(n_repeats // 4, 1) times
+    return: InferenceCost with the median latencies
+    """
+    try:
+        rows = X.iloc[:batch_size] if hasattr(X, "iloc") else X[:batch_size]
+        single_row = rows.iloc[:1] if hasattr(rows, "iloc") else rows[:1]
+        latencies = {}
+        for name, data, n_calls in [("single_row", single_row, n_repeats),
+                                    ("batch", rows, max(n_repeats // 4, 1))]:
+            model.predict(data)
+            timings = []
+            for _ in range(n_calls):
+                start_time = time.perf_counter()
+                model.predict(data)
+                timings.append(time.perf_counter() - start_time)
+            latencies[name] = float(np.median(timings)) * 1000
+        return InferenceCost(single_row_latency_ms=latencies["single_row"], batch_latency_ms=latencies["batch"],
+                             model_size_bytes=len(dill.dumps(model)))
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+@dataclass
+class InferenceBudget:
+    """
+    Serving budget of a model, every limit left None is unlimited.
+    """
+    max_single_row_latency_ms: Optional[float] = None
+    max_batch_latency_ms: Optional[float] = None
+    max_model_size_mb: Optional[float] = None
+    batch_size: int = 1000
+
+    @property
+    def is_limited(self) -> bool:
+        return any(limit is not None for limit in
+                   [self.max_single_row_latency_ms, self.max_batch_latency_ms, self.max_model_size_mb])
+
+    def get_violations(self, cost: object) -> List[str]:
+        """
+        limits exceeded by a cost, measurements that are None (not measured) exceed no limit
+        cost: InferenceCost or ClassificationMetricArtifact
+        return: list of readable violations, empty within the budget
+        """
+        violations = []
+        for name, value, limit, unit in [
+                ("single row latency", cost.single_row_latency_ms, self.max_single_row_latency_ms, "ms"),
+                ("batch latency", cost.batch_latency_ms, self.max_batch_latency_ms, "ms"),
+                ("model size", None if cost.model_size_bytes is None else cost.model_size_bytes / 1024 ** 2,
+                 self.max_model_size_mb, "MB")]:
+            if limit is not None and value is not None and value > limit:
+                violations.append(f"{name} {value:.2f}{unit} > {limit}{unit}")
+        return violations
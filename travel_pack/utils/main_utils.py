@@ -1,9 +1,14 @@
 import os
 import sys
+import json
+import threading
+from contextlib import contextmanager
+from typing import Optional
 
 import yaml
 import dill
 import numpy as np
+from scipy import sparse
 from pandas import DataFrame
 from travel_pack.exception import TravelException
 from travel_pack.logger import logging
@@ -17,16 +22,57 @@ def read_yaml_file(file_path: str) -> dict:
     except Exception as e:
         raise TravelException(e, sys) from e
 
+def merge_config(config: dict, override: dict) -> dict:
+    """
+    copy of config with the keys of override replaced, nested dicts are merged key by key
+    """
+    merged = dict(config)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+@contextmanager
+def open_for_replace(file_path: str, mode: str = "w", **open_kwargs):
+    """
+    open a temporary file next to file_path that replaces file_path once it is written, so a file hard linked
+    from the artifact store or the stage cache gets a new inode instead of being overwritten in place,
+    and readers never see a partly written file
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_file_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file_path, mode, **open_kwargs) as file_obj:
+            yield file_obj
+        os.replace(tmp_file_path, file_path)
+    finally:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+
 def write_yaml_file(file_path: str, content: object, replace: bool = False) -> None:
     try:
-        if replace:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w") as file:
+        # the file is always replaced, replace is kept for the callers
+        with open_for_replace(file_path, "w") as file:
             yaml.dump(content, file)
     except Exception as e:
         raise TravelException(e, sys) from e
+
+def read_json_file(file_path: str) -> dict:
+    try:
+        with open(file_path, "r") as json_file:
+            return json.load(json_file)
+
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+def write_json_file(file_path: str, content: object) -> None:
+    try:
+        with open_for_replace(file_path, "w") as file:
+            json.dump(content, file)
+    except Exception as e:
+        raise TravelException(e, sys) from e
     
 def load_object(file_path: str) -> object:
     logging.info("Entered the load_object method of utils")
@@ -44,29 +90,68 @@ def load_object(file_path: str) -> object:
         raise TravelException(e, sys) from e
 
       
-def save_numpy_array_data(file_path: str, array: np.array):
+def save_numpy_array_data(file_path: str, array: np.array, dtype: Optional[str] = None):
     """
     Save numpy array data to file
     file_path: str location of file to save
     array: np.array data to save
+    dtype: optional dtype the array is stored as, e.g. float32
     """
     try:
-        dir_path = os.path.dirname(file_path)
-        os.makedirs(dir_path, exist_ok=True)
-        with open(file_path, 'wb') as file_obj:
+        if dtype is not None:
+            array = np.asarray(array, dtype=dtype)
+        with open_for_replace(file_path, 'wb') as file_obj:
             np.save(file_obj, array)
     except Exception as e:
         raise TravelException(e, sys) from e
     
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: optional numpy memory map mode, "r" maps the file read only so processes
+               loading the same file share its pages instead of holding private copies
     return: np.array data loaded
     """
+    try:
+        return np.load(file_path, mmap_mode=mmap_mode)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def save_feature_matrix(file_path: str, matrix: object, dtype: Optional[str] = None) -> None:
+    """
+    Save a transformed feature matrix, sparse matrices are written in the scipy .npz format
+    and dense arrays as .npy, load_feature_matrix tells them apart from the file content
+    file_path: str location of file to save
+    matrix: np.array or scipy sparse matrix to save
+    dtype: optional dtype the values are stored as, e.g. float32
+    """
+    try:
+        if not sparse.issparse(matrix):
+            save_numpy_array_data(file_path, array=matrix, dtype=dtype)
+            return
+        if dtype is not None:
+            matrix = matrix.astype(dtype)
+        with open_for_replace(file_path, 'wb') as file_obj:
+            sparse.save_npz(file_obj, sparse.csr_matrix(matrix))
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def load_feature_matrix(file_path: str, mmap_mode: Optional[str] = None) -> object:
+    """
+    load a feature matrix written by save_feature_matrix
+    file_path: str location of file to load
+    mmap_mode: optional numpy memory map mode of dense matrices, sparse matrices are always read in memory
+    return: np.array or scipy sparse csr matrix
+    """
     try:
         with open(file_path, 'rb') as file_obj:
-            return np.load(file_obj)
+            is_sparse = file_obj.read(4) == b"PK\x03\x04"
+        if is_sparse:
+            return sparse.load_npz(file_path).tocsr()
+        return load_numpy_array_data(file_path, mmap_mode=mmap_mode)
     except Exception as e:
         raise TravelException(e, sys) from e
 
@@ -75,8 +160,7 @@ def save_object(file_path: str, obj: object) -> None:
     logging.info("Entered the save_object method of utils")
 
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "wb") as file_obj:
+        with open_for_replace(file_path, "wb") as file_obj:
             dill.dump(obj, file_obj)
 
         logging.info("Exited the save_object method of utils")
@@ -0,0 +1,291 @@
+import sys
+import copy
+
+import numpy as np
+from pandas import DataFrame
+from pandas.api.types import is_numeric_dtype
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import PowerTransformer
+
+from travel_pack.exception import TravelException
+from travel_pack.utils.transformer_utils import DtypeCaster
+
+# ONNX string tensors have no NaN, missing categories are fed as this string
+ONNX_MISSING_STRING = ""
+# default onnx domain and the ai.onnx.ml domain of the tree ensemble operators
+ONNX_TARGET_OPSET = {"": 15, "ai.onnx.ml": 3}
+
+
+def get_dtype_caster_output_type(dtype: str) -> type:
+    from skl2onnx.common.data_types import DoubleTensorType, FloatTensorType
+
+    return DoubleTensorType if np.dtype(dtype) == np.float64 else FloatTensorType
+
+
+def parse_dtype_caster(scope, model, inputs, custom_parsers=None) -> list:
+    # the output type is declared while parsing, skl2onnx types the concatenation of the column groups by it
+    operator = scope.declare_local_operator("TravelPackDtypeCaster", model)
+    operator.inputs = inputs
+    operator.outputs.append(scope.declare_local_variable("cast", get_dtype_caster_output_type(model.dtype)()))
+    return operator.outputs
+
+
+def calculate_dtype_caster_output_shapes(operator) -> None:
+    output_type = get_dtype_caster_output_type(operator.raw_operator.dtype)
+    operator.outputs[0].type = output_type([operator.inputs[0].get_first_dimension(),
+                                            operator.raw_operator.n_features_in_])
+
+
+def convert_dtype_caster(scope, operator, container) -> None:
+    # like the sklearn graph the column groups compute in the input precision and are cast at their end,
+    # the trees split on the same float32 values as the pickled model
+    from onnx import TensorProto
+
+    to = TensorProto.DOUBLE if np.dtype(operator.raw_operator.dtype) == np.float64 else TensorProto.FLOAT
+    container.add_node("Cast", [operator.inputs[0].full_name], [operator.outputs[0].full_name],
+                       name=scope.get_unique_operator_name("DtypeCaster"), to=to)
+
+
+def convert_simple_imputer(scope, operator, container) -> None:
+    # numeric columns are imputed in the precision of the input, the Imputer operator of skl2onnx computes
+    # in float32 and ONNX Runtime has no float64 kernel for it. String columns use the skl2onnx converter
+    from skl2onnx.common.data_types import StringTensorType, guess_numpy_type
+    from skl2onnx.operator_converters.common import concatenate_variables
+    from skl2onnx.operator_converters.imputer_op import convert_sklearn_imputer
+
+    imputer = operator.raw_operator
+    if isinstance(operator.inputs[0].type, StringTensorType) or not np.isnan(imputer.missing_values):
+        convert_sklearn_imputer(scope, operator, container)
+        return
+    dtype = np.float64 if guess_numpy_type(operator.inputs[0].type) == np.float64 else np.float32
+    concatenated_feature = concatenate_variables(scope, operator.inputs, container)
+    statistics_name = scope.get_unique_variable_name("statistics")
+    is_missing_name = scope.get_unique_variable_name("is_missing")
+    container.add_initializer(statistics_name, 11 if dtype == np.float64 else 1, [len(imputer.statistics_)],
+                              imputer.statistics_.astype(dtype).tolist())
+    container.add_node("IsNaN", [concatenated_feature], [is_missing_name],
+                       name=scope.get_unique_operator_name("SimpleImputerIsNaN"))
+    container.add_node("Where", [is_missing_name, statistics_name, concatenated_feature],
+                       [operator.outputs[0].full_name], name=scope.get_unique_operator_name("SimpleImputer"))
+
+
+def calculate_power_transformer_output_shapes(operator) -> None:
+    operator.outputs[0].type = operator.inputs[0].type.__class__(operator.inputs[0].type.shape)
+
+
+def convert_power_transformer(scope, operator, container) -> None:
+    # yeo-johnson of scipy in the precision of the input, the skl2onnx converter computes its masks in float32
+    from skl2onnx.algebra.onnx_ops import OnnxAdd, OnnxSub, OnnxMul, OnnxDiv, OnnxExp, OnnxLog, OnnxNeg, \
+        OnnxLess, OnnxWhere, OnnxIdentity
+    from skl2onnx.common.data_types import guess_numpy_type
+
+    power_transformer = operator.raw_operator
+    if power_transformer.method != "yeo-johnson":
+        raise NotImplementedError(f"PowerTransformer method {power_transformer.method} is not supported")
+    opv = container.target_opset
+    dtype = guess_numpy_type(operator.inputs[0].type)
+    dtype = np.float64 if dtype == np.float64 else np.float32
+    X = operator.inputs[0]
+    lambdas = power_transformer.lambdas_.astype(np.float64)
+    one = np.array([1], dtype=dtype)
+    eps = np.finfo(np.float64).eps
+    is_zero_lambda, is_two_lambda = np.abs(lambdas) < eps, np.abs(lambdas - 2) <= eps
+    positive_lambdas = np.where(is_zero_lambda, 1, lambdas).astype(dtype)
+    negative_lambdas = np.where(is_two_lambda, 1, 2 - lambdas).astype(dtype)
+
+    # x >= 0: ((x + 1) ** lambda - 1) / lambda, log(x + 1) for lambda 0
+    positive_log = OnnxLog(OnnxAdd(X, one, op_version=opv), op_version=opv)
+    positive_power = OnnxDiv(OnnxSub(OnnxExp(OnnxMul(positive_log, positive_lambdas, op_version=opv), op_version=opv),
+                                     one, op_version=opv), positive_lambdas, op_version=opv)
+    positive = OnnxWhere(is_zero_lambda, positive_log, positive_power, op_version=opv)
+    # x < 0: -((1 - x) ** (2 - lambda) - 1) / (2 - lambda), -log(1 - x) for lambda 2
+    negative_log = OnnxLog(OnnxSub(one, X, op_version=opv), op_version=opv)
+    negative_power = OnnxDiv(OnnxSub(OnnxExp(OnnxMul(negative_log, negative_lambdas, op_version=opv), op_version=opv),
+                                     one, op_version=opv), negative_lambdas, op_version=opv)
+    negative = OnnxNeg(OnnxWhere(is_two_lambda, negative_log, negative_power, op_version=opv), op_version=opv)
+    transformed = OnnxWhere(OnnxLess(X, np.array([0], dtype=dtype), op_version=opv), negative, positive,
+                            op_version=opv)
+
+    output_name = operator.outputs[0].full_name
+    if power_transformer.standardize:
+        scaler = power_transformer._scaler
+        output = OnnxDiv(OnnxSub(transformed, scaler.mean_.astype(dtype), op_version=opv),
+                         scaler.scale_.astype(dtype), op_version=opv, output_names=[output_name])
+    else:
+        output = OnnxIdentity(transformed, op_version=opv, output_names=[output_name])
+    output.add_to(scope, container)
+
+
+def register_onnx_converters() -> None:
+    """
+    register the converters skl2onnx does not ship: DtypeCaster of the preprocessor, float64 SimpleImputer
+    and PowerTransformer, and XGBClassifier which onnxmltools converts
+    """
+    from skl2onnx import update_registered_converter
+    from skl2onnx.common.shape_calculator import calculate_linear_classifier_output_shapes
+    from skl2onnx.shape_calculators.imputer import calculate_sklearn_imputer_output_shapes
+    from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+    from xgboost import XGBClassifier
+
+    update_registered_converter(DtypeCaster, "TravelPackDtypeCaster",
+                                calculate_dtype_caster_output_shapes, convert_dtype_caster,
+                                parser=parse_dtype_caster)
+    update_registered_converter(SimpleImputer, "SklearnSimpleImputer",
+                                calculate_sklearn_imputer_output_shapes, convert_simple_imputer)
+    update_registered_converter(PowerTransformer, "SklearnPowerTransformer",
+                                calculate_power_transformer_output_shapes, convert_power_transformer)
+    update_registered_converter(XGBClassifier, "XGBoostXGBClassifier",
+                                calculate_linear_classifier_output_shapes, convert_xgboost,
+                                options={"nocl": [True, False], "zipmap": [True, False, "columns"]})
+
+
+def get_column_step(step: object, positions: np.ndarray) -> object:
+    """
+    copy of a fitted SimpleImputer or DtypeCaster working only on the columns at positions, the statistics
+    of the imputer are per column
+    """
+    column_step = copy.deepcopy(step)
+    if isinstance(step, SimpleImputer):
+        column_step.statistics_ = step.statistics_[positions]
+    column_step.n_features_in_ = len(positions)
+    if hasattr(step, "feature_names_in_"):
+        column_step.feature_names_in_ = step.feature_names_in_[positions]
+    return column_step
+
+
+def get_branch_caster(caster: DtypeCaster, branch: object, n_columns: int) -> DtypeCaster:
+    """
+    copy of a fitted DtypeCaster casting the output of one branch of a nested ColumnTransformer
+    """
+    branch_caster = copy.deepcopy(caster)
+    branch_caster.n_features_in_ = len(branch.get_feature_names_out()) if branch is not None else n_columns
+    return branch_caster
+
+
+def get_flat_transformers(name: str, transformer: object, columns: list) -> list:
+    """
+    top level transformers replacing a fitted pipeline of column casts and imputers, a nested ColumnTransformer
+    selecting columns by position and DtypeCasters, e.g. the continuous pipeline of the preprocessor. skl2onnx
+    can not convert the position selection of the nested ColumnTransformer, so every nested branch becomes a
+    pipeline of the casts and imputers restricted to the branch columns, the branch transformer and the
+    output casts, selecting its columns by name. Other transformers are returned unchanged
+    return: list of (name, transformer, columns)
+    """
+    if not isinstance(transformer, Pipeline):
+        return [(name, transformer, columns)]
+    nested_positions = [position for position, (_, step) in enumerate(transformer.steps)
+                        if isinstance(step, ColumnTransformer)]
+    if len(nested_positions) != 1:
+        return [(name, transformer, columns)]
+    column_steps = transformer.steps[:nested_positions[0]]
+    casters = transformer.steps[nested_positions[0] + 1:]
+    if not all(isinstance(step, DtypeCaster) or isinstance(step, SimpleImputer) and step.indicator_ is None
+               for _, step in column_steps) or \
+            not all(isinstance(step, DtypeCaster) for _, step in casters):
+        return [(name, transformer, columns)]
+
+    flat_transformers = []
+    for branch_name, branch, branch_columns in transformer.steps[nested_positions[0]][1].transformers_:
+        positions = np.arange(len(columns))[branch_columns]
+        if branch == "drop" or len(positions) == 0:
+            continue
+        if branch == "passthrough":
+            branch = None
+        steps = [(step_name, get_column_step(step, positions)) for step_name, step in column_steps]
+        steps += [(branch_name, branch)] if branch is not None else []
+        steps += [(caster_name, get_branch_caster(caster, branch, len(positions))) for caster_name, caster in casters]
+        flat_transformers.append((f"{name}__{branch_name}", Pipeline(steps) if steps else "passthrough",
+                                  [columns[position] for position in positions]))
+    return flat_transformers
+
+
+def get_onnx_preprocessor(preprocessor: ColumnTransformer) -> ColumnTransformer:
+    """
+    copy of a fitted preprocessor whose imputers of string columns impute ONNX_MISSING_STRING instead of NaN,
+    whose transformers of no column (never fitted by sklearn) are dropped and whose nested ColumnTransformers
+    are flattened by get_flat_transformers. The output columns keep their order
+    """
+    onnx_preprocessor = copy.deepcopy(preprocessor)
+    onnx_preprocessor.transformers_ = [(name, "drop" if len(columns) == 0 else transformer, columns)
+                                       for name, transformer, columns in onnx_preprocessor.transformers_]
+    onnx_preprocessor.transformers_ = [flat_transformer for name, transformer, columns
+                                       in onnx_preprocessor.transformers_
+                                       for flat_transformer in get_flat_transformers(name, transformer, columns)]
+    for _, transformer, _ in onnx_preprocessor.transformers_:
+        steps = transformer.steps if isinstance(transformer, Pipeline) else [(None, transformer)]
+        for _, step in steps:
+            if isinstance(step, SimpleImputer) and step.statistics_.dtype == object:
+                step.missing_values = ONNX_MISSING_STRING
+    return onnx_preprocessor
+
+
+def get_onnx_initial_types(features: DataFrame) -> list:
+    """
+    one [None, 1] input per raw feature column, named like the column, string for categories and double
+    otherwise, the numeric groups of the preprocessor compute in float64 after their input casts
+    """
+    from skl2onnx.common.data_types import DoubleTensorType, StringTensorType
+
+    return [(column, DoubleTensorType([None, 1]) if is_numeric_dtype(features[column]) else StringTensorType([None, 1]))
+            for column in features.columns]
+
+
+def convert_travel_model_to_onnx(travel_model: object, features: DataFrame) -> bytes:
+    """
+    convert the preprocessor and estimator of a TravelModel into one ONNX graph
+    travel_model: TravelModel
+    features: raw feature rows, their columns and dtypes define the graph inputs
+    return: serialized ONNX model, its outputs are label and probabilities
+    """
+    try:
+        from skl2onnx import convert_sklearn
+
+        register_onnx_converters()
+        estimator = travel_model.trained_model_object
+        pipeline = Pipeline([("preprocessor", get_onnx_preprocessor(travel_model.preprocessing_object)),
+                             ("classifier", estimator)])
+        onnx_model = convert_sklearn(pipeline, initial_types=get_onnx_initial_types(features),
+                                     options={id(estimator): {"zipmap": False}}, target_opset=ONNX_TARGET_OPSET)
+        return onnx_model.SerializeToString()
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def get_onnx_inputs(session: object, dataframe: DataFrame) -> dict:
+    """
+    input feed of an ONNX Runtime session from raw feature rows
+    """
+    inputs = {}
+    for model_input in session.get_inputs():
+        column = dataframe[model_input.name]
+        if model_input.type == "tensor(string)":
+            values = column.astype(object).where(column.notna(), ONNX_MISSING_STRING).astype(str).to_numpy()
+        elif model_input.type == "tensor(double)":
+            values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values = column.to_numpy(dtype=np.float32, na_value=np.nan)
+        inputs[model_input.name] = values.reshape(-1, 1)
+    return inputs
+
+
+def get_prediction_agreement(model: object, onnx_model: object, features: DataFrame) -> float:
+    """
+    share of rows on which the ONNX graph predicts the label of the pickled model, the float32 graph can
+    differ on rows right at a decision threshold
+    """
+    return float(np.mean(np.asarray(model.predict(features)) == np.asarray(onnx_model.predict(features))))
+
+
+def check_prediction_agreement(model: object, onnx_model: object, features: DataFrame, min_agreement: float) -> float:
+    """
+    parity gate of an ONNX export, raises when the ONNX graph predicts the label of the model on less than
+    min_agreement of the rows
+    return: prediction agreement
+    """
+    agreement = get_prediction_agreement(model, onnx_model, features)
+    if agreement < min_agreement:
+        raise Exception(f"ONNX model predicts the label of the pickled model on {agreement:.4%} of "
+                        f"{len(features)} rows, below the minimum agreement {min_agreement:.4%}")
+    return agreement
@@ -0,0 +1,192 @@
+import sys
+import time
+import tracemalloc
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from imblearn.combine import SMOTEENN
+from imblearn.over_sampling import SMOTE
+from imblearn.under_sampling import EditedNearestNeighbours, RandomUnderSampler
+from sklearn.base import BaseEstimator
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.class_weight import compute_sample_weight
+
+from travel_pack.constants import RANDOM_STATE
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+
+RESAMPLING_STRATEGIES = ["smoteenn", "smote", "random_under", "class_weight", "none"]
+SMOTE_K_NEIGHBORS = 5
+ENN_N_NEIGHBORS = 3
+
+
+class ApproximateNearestNeighbors(BaseEstimator):
+    """
+    Approximate k nearest neighbors on a pynndescent graph with the subset of the
+    sklearn NearestNeighbors interface used by the imblearn samplers.
+    pynndescent is an optional dependency, only needed when approximate neighbors are enabled.
+    """
+
+    def __init__(self, n_neighbors: int = 5, n_jobs: int = 1, random_state: Optional[int] = None):
+        self.n_neighbors = n_neighbors
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        from pynndescent import NNDescent
+
+        self.index_ = NNDescent(X, n_jobs=self.n_jobs, random_state=self.random_state)
+        self.index_.prepare()
+        return self
+
+    def kneighbors(self, X=None, n_neighbors=None, return_distance=True):
+        n_neighbors = self.n_neighbors if n_neighbors is None else n_neighbors
+        indices, distances = self.index_.query(X, k=n_neighbors)
+        return (distances, indices) if return_distance else indices
+
+    def kneighbors_graph(self, X=None, n_neighbors=None, mode="connectivity"):
+        distances, indices = self.kneighbors(X, n_neighbors=n_neighbors, return_distance=True)
+        n_queries, n_neighbors = indices.shape
+        data = distances.ravel() if mode == "distance" else np.ones(indices.size)
+        indptr = np.arange(0, n_queries * n_neighbors + 1, n_neighbors)
+        return sparse.csr_matrix((data, indices.ravel(), indptr), shape=(n_queries, self.index_._raw_data.shape[0]))
+
+
+class ResamplingStage:
+    """
+    Pluggable class balancing step of data transformation.
+
+    strategies: "smoteenn" (SMOTE followed by Edited Nearest Neighbours), "smote", "random_under",
+    "class_weight" (no resampling, balanced sample weights are returned instead) and "none".
+    Neighbor searches run with n_jobs and can use approximate neighbors, and large inputs can be
+    resampled in stratified chunks so the kNN cost grows with the chunk size instead of the data size.
+    """
+
+    def __init__(self, strategy: str = "smoteenn", n_jobs: int = 1, approximate_neighbors: bool = False,
+                 chunk_size: Optional[int] = None, random_state: int = RANDOM_STATE):
+        """
+        :param strategy: one of RESAMPLING_STRATEGIES
+        :param n_jobs: number of jobs of the neighbor searches
+        :param approximate_neighbors: use pynndescent instead of exact neighbor search
+        :param chunk_size: optional number of rows resampled at once
+        :param random_state: seed of sampling and chunking
+        """
+        try:
+            if strategy not in RESAMPLING_STRATEGIES:
+                raise Exception(f"Unknown resampling strategy: {strategy}, expected one of {RESAMPLING_STRATEGIES}")
+            self.strategy = strategy
+            self.n_jobs = n_jobs
+            self.approximate_neighbors = approximate_neighbors
+            self.chunk_size = chunk_size
+            self.random_state = random_state
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_params(self) -> dict:
+        return {"strategy": self.strategy, "approximate_neighbors": self.approximate_neighbors,
+                "chunk_size": self.chunk_size, "random_state": self.random_state}
+
+    def _get_neighbors(self, n_neighbors: int) -> BaseEstimator:
+        if self.approximate_neighbors:
+            return ApproximateNearestNeighbors(n_neighbors=n_neighbors, n_jobs=self.n_jobs,
+                                               random_state=self.random_state)
+        return NearestNeighbors(n_neighbors=n_neighbors, n_jobs=self.n_jobs)
+
+    def get_sampler(self) -> Optional[object]:
+        """
+        Method Name :   get_sampler
+        Description :   This method creates the imblearn sampler of the strategy
+
+        Output      :   Returns imblearn sampler, None for strategies which do not resample
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            smote = SMOTE(sampling_strategy="minority", random_state=self.random_state,
+                          k_neighbors=self._get_neighbors(SMOTE_K_NEIGHBORS + 1))
+            if self.strategy == "smoteenn":
+                enn = EditedNearestNeighbours(sampling_strategy="all",
+                                              n_neighbors=self._get_neighbors(ENN_N_NEIGHBORS + 1))
+                return SMOTEENN(sampling_strategy="minority", random_state=self.random_state, smote=smote, enn=enn)
+            if self.strategy == "smote":
+                return smote
+            if self.strategy == "random_under":
+                return RandomUnderSampler(random_state=self.random_state)
+            return None
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_chunk_ids(self, y: np.ndarray) -> np.ndarray:
+        """
+        assign rows to chunks round robin inside every class, so all chunks keep the class balance
+        """
+        n_chunks = int(np.ceil(len(y) / self.chunk_size))
+        order = np.random.RandomState(self.random_state).permutation(len(y))
+        chunk_ids = np.empty(len(y), dtype=np.int64)
+        for label in np.unique(y):
+            positions = order[y[order] == label]
+            chunk_ids[positions] = np.arange(len(positions)) % n_chunks
+        return chunk_ids
+
+    def fit_resample(self, X, y) -> Tuple[object, np.ndarray, Optional[np.ndarray]]:
+        """
+        Method Name :   fit_resample
+        Description :   This method balances the classes of a feature matrix and target
+
+        Output      :   Returns resampled features, resampled target and optional sample weights
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            y = np.asarray(y)
+            logging.info(f"Resampling {X.shape[0]} rows with strategy {self.strategy}")
+            if self.strategy == "class_weight":
+                return X, y, compute_sample_weight(class_weight="balanced", y=y)
+
+            sampler = self.get_sampler()
+            if sampler is None:
+                return X, y, None
+            if self.chunk_size is None or X.shape[0] <= self.chunk_size:
+                X_resampled, y_resampled = sampler.fit_resample(X, y)
+                return X_resampled, np.asarray(y_resampled), None
+
+            chunk_ids = self.get_chunk_ids(y)
+            X_parts, y_parts = [], []
+            for chunk_id in range(chunk_ids.max() + 1):
+                rows = np.flatnonzero(chunk_ids == chunk_id)
+                X_chunk, y_chunk = sampler.fit_resample(X[rows], y[rows])
+                X_parts.append(X_chunk)
+                y_parts.append(np.asarray(y_chunk))
+            X_resampled = sparse.vstack(X_parts, format="csr") if sparse.issparse(X) else np.concatenate(X_parts)
+            return X_resampled, np.concatenate(y_parts), None
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+
+def benchmark_resampling_strategies(X, y, strategies: list, n_jobs: int = 1, approximate_neighbors: bool = False,
+                                    chunk_size: Optional[int] = None) -> list:
+    """
+    time and peak traced memory of every resampling strategy on the same data
+    X: feature matrix
+    y: target
+    strategies: list of strategy names
+    return: list of dict results, one per strategy
+    """
+    try:
+        results = []
+        for strategy in strategies:
+            stage = ResamplingStage(strategy=strategy, n_jobs=n_jobs, approximate_neighbors=approximate_neighbors,
+                                    chunk_size=chunk_size)
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            X_resampled, y_resampled, _ = stage.fit_resample(X, y)
+            seconds = time.perf_counter() - start_time
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({"strategy": strategy, "seconds": round(seconds, 4),
+                            "peak_memory_mb": round(peak_bytes / 1024 ** 2, 2),
+                            "rows_in": int(X.shape[0]), "rows_out": int(X_resampled.shape[0]),
+                            "positive_share_out": round(float(np.mean(y_resampled == 1)), 4)})
+            logging.info(f"Resampling benchmark: {results[-1]}")
+        return results
+    except Exception as e:
+        raise TravelException(e, sys) from e
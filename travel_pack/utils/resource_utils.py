@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Iterator, List, Optional
+
+from threadpoolctl import threadpool_limits
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+
+
+def get_available_cores() -> int:
+    """
+    number of cores the process may run on, respecting cpu affinity where the platform supports it
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def resolve_n_jobs(n_jobs: Optional[int], n_cores: int) -> int:
+    """
+    n_jobs setting of a stage resolved within its core budget, None and negative values follow the
+    joblib convention relative to the budget (-1 = all cores of the budget)
+    n_jobs: configured n_jobs
+    n_cores: core budget of the stage
+    return: number of jobs between 1 and n_cores
+    """
+    if n_jobs is None:
+        return n_cores
+    if n_jobs < 0:
+        return max(1, n_cores + 1 + n_jobs)
+    return max(1, min(n_jobs, n_cores))
+
+
+class ResourceManager:
+    """
+    Core budget of the training pipeline.
+
+    Stages running at the same time share the pipeline's cores, every stage gets its share capped per
+    stage by stage_max_cores and waits while no core is free. The n_jobs settings of a stage config are
+    resolved within its share on a copy of the config, and the estimators of a stage get their threads
+    through n_jobs. The BLAS thread pools are limited once for the whole run by limit_native_threads,
+    as native thread pool limits are process wide and can not be scoped to one of the concurrent stages.
+    """
+
+    def __init__(self, n_cores: Optional[int] = None, stage_max_cores: Optional[dict] = None):
+        """
+        :param n_cores: cores used by the pipeline, None uses every core available to the process
+        :param stage_max_cores: optional dict of stage name -> maximum cores of the stage
+        """
+        try:
+            self.n_cores = min(n_cores, get_available_cores()) if n_cores else get_available_cores()
+            self.stage_max_cores = dict(stage_max_cores or {})
+            # stage name -> cores held by the running stage
+            self._running_stages = {}
+            self._condition = threading.Condition()
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_free_cores(self) -> int:
+        return self.n_cores - sum(self._running_stages.values())
+
+    def get_stage_cores(self, stage_name: str, n_concurrent_stages: int = 1) -> int:
+        """
+        core share of a stage when n_concurrent_stages stages (this one included) run at the same time,
+        the stages already running keep their shares and the next share is taken from the free cores
+        """
+        n_concurrent_stages = max(1, n_concurrent_stages, len(self._running_stages) + 1)
+        shares = self.get_worker_cores(self.n_cores, n_concurrent_stages)
+        share = shares[min(len(self._running_stages), n_concurrent_stages - 1)]
+        return max(1, min(share, self.get_free_cores(), self.stage_max_cores.get(stage_name, self.n_cores)))
+
+    @staticmethod
+    def get_worker_cores(n_cores: int, n_workers: int) -> List[int]:
+        """
+        split a core budget over workers as evenly as possible, every worker gets at least one core
+        """
+        return [max(1, n_cores // n_workers + (1 if worker < n_cores % n_workers else 0)) for worker in range(n_workers)]
+
+    @staticmethod
+    def limit_n_jobs(config: object, n_cores: int, fields: List[str]) -> object:
+        """
+        copy of a stage config with its n_jobs fields resolved within the core budget of the stage,
+        the config itself is left unchanged
+        """
+        return replace(config, **{field: resolve_n_jobs(getattr(config, field), n_cores) for field in fields})
+
+    @contextmanager
+    def limit_native_threads(self) -> Iterator[None]:
+        """
+        limit the BLAS thread pools of the process to one thread, entered once around all stages by the
+        thread scheduling them, the stages parallelise through their n_jobs
+        """
+        with threadpool_limits(limits=1, user_api="blas"):
+            yield
+
+    @contextmanager
+    def stage(self, stage_name: str, n_concurrent_stages: int = 1) -> Iterator[int]:
+        """
+        Method Name :   stage
+        Description :   This method reserves the core share of a stage while it runs, waiting while the running
+                        stages hold every core
+
+        Output      :   Yields the core budget of the stage
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.get_free_cores() > 0)
+            n_cores = self.get_stage_cores(stage_name, n_concurrent_stages)
+            self._running_stages[stage_name] = n_cores
+        logging.info(f"Running {stage_name} with a budget of {n_cores} of {self.n_cores} cores")
+        try:
+            yield n_cores
+        finally:
+            with self._condition:
+                self._running_stages.pop(stage_name, None)
+                self._condition.notify_all()
@@ -0,0 +1,443 @@
+import sys
+import math
+import time
+import importlib
+from collections import namedtuple
+from typing import Callable, List, Optional
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs, parallel_config
+from threadpoolctl import threadpool_limits
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import GridSearchCV, ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+
+from travel_pack.constants import RANDOM_STATE
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.utils.resource_utils import ResourceManager
+from travel_pack.utils.trial_utils import TrialStore, get_data_fingerprint
+from travel_pack.utils.xgb_utils import XGBFoldData, is_xgboost_classifier
+from travel_pack.utils.inference_utils import InferenceBudget, measure_inference_cost
+
+SEARCH_STRATEGIES = ["successive_halving", "grid"]
+
+# same fields as the neuro_mf BestModel, so ModelTrainer handles both search paths alike
+BestModel = namedtuple("BestModel", ["model_serial_number", "model", "best_model", "best_parameters", "best_score"])
+
+
+def get_class(module_name: str, class_name: str) -> type:
+    """
+    equivalent of from module_name import class_name
+    """
+    try:
+        return getattr(importlib.import_module(module_name), class_name)
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def fit_and_score(estimator: object, params: dict, X, y, train_index: np.ndarray, test_index: np.ndarray,
+                  scoring: str, sample_weight: Optional[np.ndarray] = None) -> dict:
+    """
+    fit a clone of the estimator with params on the train rows, weighted by their sample weights when given,
+    and score it on the test rows
+    return: dict with the score and fit time
+    """
+    model = clone(estimator).set_params(**params)
+    fit_params = {} if sample_weight is None else {"sample_weight": sample_weight[train_index]}
+    start_time = time.perf_counter()
+    model.fit(X[train_index], y[train_index], **fit_params)
+    fit_seconds = time.perf_counter() - start_time
+    score = get_scorer(scoring)(model, X[test_index], y[test_index])
+    return {"score": float(score), "fit_seconds": fit_seconds}
+
+
+def run_task(task_number: int, function: Callable, *args, **kwargs) -> tuple:
+    """
+    call a function and return its result with the number of its task, so results arriving out of order
+    are matched to their task
+    """
+    return task_number, function(*args, **kwargs)
+
+
+class SuccessiveHalvingSearch:
+    """
+    Budgeted successive halving over a parameter grid.
+
+    All candidates are cross validated on a small stratified sample of the rows, the best 1/factor of them
+    move on to a sample factor times larger, and so on until one rung uses all rows or one candidate is left.
+    The search stops early, keeping the best candidate of the last finished rung, when the next rung would
+    exceed max_fits or the time budget. With an inference budget the candidates of the last rung are refit
+    in score order until one predicts within the budget.
+    """
+
+    def __init__(self, estimator: object, param_grid: dict, scoring: str = "f1", cv: int = 3, factor: int = 3,
+                 min_resources: Optional[int] = None, max_candidates: Optional[int] = None,
+                 max_fits: Optional[int] = None, time_budget_seconds: Optional[float] = None, n_jobs: int = 1,
+                 random_state: int = RANDOM_STATE, trial_store: Optional[TrialStore] = None,
+                 xgb_early_stopping_rounds: Optional[int] = None, xgb_validation_fraction: float = 0.1,
+                 inference_budget: Optional[InferenceBudget] = None):
+        """
+        :param estimator: estimator with the fixed parameters
+        :param param_grid: dict of parameter name -> list of values
+        :param scoring: sklearn scorer name
+        :param cv: number of stratified folds per candidate
+        :param factor: share of candidates kept (1/factor) and growth of the sample per rung
+        :param min_resources: rows of the first rung, derived from the number of candidates when None
+        :param max_candidates: optional number of candidates sampled from the grid
+        :param max_fits: optional budget of fits
+        :param time_budget_seconds: optional wall clock budget
+        :param n_jobs: number of fits run in parallel
+        :param random_state: seed of candidate sampling and row sampling
+        :param trial_store: optional store of finished fits, which makes the search resumable
+        :param xgb_early_stopping_rounds: when set, XGBClassifier candidates train on quantized fold data
+                                          shared by all candidates, with early stopping on a validation split
+        :param xgb_validation_fraction: share of the train rows of a fold used for early stopping
+        :param inference_budget: optional latency / size budget the selected candidate has to meet
+        """
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.cv = cv
+        self.factor = factor
+        self.min_resources = min_resources
+        self.max_candidates = max_candidates
+        self.max_fits = max_fits
+        self.time_budget_seconds = time_budget_seconds
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.trial_store = trial_store
+        self.xgb_early_stopping_rounds = xgb_early_stopping_rounds
+        self.xgb_validation_fraction = xgb_validation_fraction
+        self.inference_budget = inference_budget
+
+    @property
+    def uses_xgb_fold_data(self) -> bool:
+        return self.xgb_early_stopping_rounds is not None and is_xgboost_classifier(self.estimator)
+
+    def get_candidates(self) -> List[dict]:
+        grid = ParameterGrid(self.param_grid)
+        if self.max_candidates is None or self.max_candidates >= len(grid):
+            return list(grid)
+        return list(ParameterSampler(self.param_grid, n_iter=self.max_candidates, random_state=self.random_state))
+
+    def get_rung_resources(self, n_samples: int, n_candidates: int) -> List[int]:
+        """
+        rows used by every rung, the last rung uses all rows
+        """
+        n_rungs = 1 + int(math.floor(math.log(max(n_candidates, 1)) / math.log(self.factor)))
+        min_resources = self.min_resources or max(n_samples // self.factor ** (n_rungs - 1), 20 * self.cv)
+        n_rungs = min(n_rungs, 1 + int(math.floor(math.log(max(n_samples / min_resources, 1)) / math.log(self.factor))))
+        resources = [min(min_resources * self.factor ** rung, n_samples) for rung in range(n_rungs)]
+        resources[-1] = n_samples
+        return resources
+
+    def get_rung_rows(self, y: np.ndarray, n_resources: int) -> np.ndarray:
+        if n_resources >= len(y):
+            return np.arange(len(y))
+        rows, _ = train_test_split(np.arange(len(y)), train_size=n_resources, stratify=y,
+                                   random_state=self.random_state)
+        return np.sort(rows)
+
+    def get_trial_key(self, params: dict, n_resources: int, fold: int, data_fingerprint: str) -> str:
+        estimator_params = {name: value for name, value in self.estimator.get_params().items() if name != "n_jobs"}
+        return TrialStore.get_trial_key(estimator=type(self.estimator).__name__, estimator_params=estimator_params,
+                                        params=params, n_resources=n_resources, fold=fold, cv=self.cv,
+                                        scoring=self.scoring, random_state=self.random_state,
+                                        data_fingerprint=data_fingerprint,
+                                        xgb_early_stopping_rounds=self.xgb_early_stopping_rounds
+                                        if self.uses_xgb_fold_data else None,
+                                        xgb_validation_fraction=self.xgb_validation_fraction
+                                        if self.uses_xgb_fold_data else None)
+
+    def run_fits(self, X, y, pending: list, sample_weight: Optional[np.ndarray] = None):
+        """
+        fit and score the pending (candidate, fold) tasks, yielding every task with its result as it finishes,
+        in completion order so a slow fit does not hold back recording the fits finished after it.
+        XGBClassifier candidates share one XGBFoldData per fold and train in threads
+        """
+        if not self.uses_xgb_fold_data:
+            results = Parallel(n_jobs=self.n_jobs, return_as="generator_unordered")(
+                delayed(run_task)(task_number, fit_and_score, self.estimator, task[3], X, y, task[4], task[5],
+                                  self.scoring, sample_weight=sample_weight)
+                for task_number, task in enumerate(pending))
+            for task_number, result in results:
+                yield pending[task_number], result
+            return
+        for fold in sorted({task[1] for task in pending}):
+            fold_tasks = [task for task in pending if task[1] == fold]
+            fold_data = XGBFoldData(X, y, train_rows=fold_tasks[0][4], test_rows=fold_tasks[0][5],
+                                    validation_fraction=self.xgb_validation_fraction, random_state=self.random_state,
+                                    sample_weight=sample_weight)
+            results = Parallel(n_jobs=self.n_jobs, backend="threading", return_as="generator_unordered")(
+                delayed(run_task)(task_number, fold_data.fit_and_score, self.estimator, task[3], self.scoring,
+                                  early_stopping_rounds=self.xgb_early_stopping_rounds)
+                for task_number, task in enumerate(fold_tasks))
+            for task_number, result in results:
+                yield fold_tasks[task_number], result
+
+    def evaluate_rung(self, candidates: List[dict], X, y, rows: np.ndarray,
+                      data_fingerprint: Optional[str] = None,
+                      sample_weight: Optional[np.ndarray] = None) -> List[dict]:
+        """
+        cross validate every candidate on the given rows, fits recorded in the trial store are read back
+        and every new fit is recorded as soon as it finishes
+        return: list of dict with params, mean score and fit time, in the order of candidates
+        """
+        folds = list(StratifiedKFold(n_splits=self.cv, shuffle=True, random_state=self.random_state)
+                     .split(rows, y[rows]))
+        fold_results, pending = {}, []
+        for i, params in enumerate(candidates):
+            for fold, (train_index, test_index) in enumerate(folds):
+                key = None
+                if self.trial_store is not None:
+                    key = self.get_trial_key(params, n_resources=len(rows), fold=fold,
+                                             data_fingerprint=data_fingerprint)
+                    recorded_trial = self.trial_store.lookup(key)
+                    if recorded_trial is not None:
+                        fold_results[(i, fold)] = recorded_trial
+                        continue
+                pending.append((i, fold, key, params, rows[train_index], rows[test_index]))
+        self.n_reused_fits_ += len(fold_results)
+
+        for (i, fold, key, params, _, _), result in self.run_fits(X, y, pending, sample_weight=sample_weight):
+            fold_results[(i, fold)] = result
+            if self.trial_store is not None:
+                self.trial_store.record(key, dict(result, params=params, n_resources=len(rows), fold=fold,
+                                                  data_fingerprint=data_fingerprint))
+
+        trials = []
+        for i, params in enumerate(candidates):
+            results = [fold_results[(i, fold)] for fold in range(self.cv)]
+            trial = {"params": params,
+                     "fold_scores": [result["score"] for result in results],
+                     "score": float(np.mean([result["score"] for result in results])),
+                     "fit_seconds": float(np.sum([result["fit_seconds"] for result in results]))}
+            if all("n_estimators" in result for result in results):
+                # number of trees kept by early stopping, the refit of the best candidate uses their mean
+                trial["n_estimators"] = int(round(np.mean([result["n_estimators"] for result in results])))
+            trials.append(trial)
+        return trials
+
+    def fit(self, X, y, sample_weight: Optional[np.ndarray] = None) -> "SuccessiveHalvingSearch":
+        """
+        Method Name :   fit
+        Description :   This method runs the successive halving rungs within the budget and refits the
+                        best candidate on all rows, every fit weighted by the optional sample weights
+
+        Output      :   Returns self with best_estimator_, best_params_, best_score_, n_fits_ and history_
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            y = np.asarray(y)
+            start_time = time.perf_counter()
+            candidates = self.get_candidates()
+            resources = self.get_rung_resources(n_samples=len(y), n_candidates=len(candidates))
+            self.n_fits_, self.n_reused_fits_, self.history_, best_trials = 0, 0, [], None
+            data_fingerprint = get_data_fingerprint(X, y, sample_weight) if self.trial_store is not None else None
+            for rung, n_resources in enumerate(resources):
+                n_fits = len(candidates) * self.cv
+                elapsed = time.perf_counter() - start_time
+                if best_trials is not None:
+                    if self.max_fits is not None and self.n_fits_ + n_fits > self.max_fits:
+                        logging.info(f"Stopped search before rung {rung}, fit budget {self.max_fits} reached")
+                        break
+                    if self.time_budget_seconds is not None:
+                        rows_ratio = n_resources / self.history_[-1]["n_resources"]
+                        expected_seconds = self.history_[-1]["seconds"] * rows_ratio * n_fits / self.history_[-1]["n_fits"]
+                        if elapsed + expected_seconds > self.time_budget_seconds:
+                            logging.info(f"Stopped search before rung {rung}, time budget "
+                                         f"{self.time_budget_seconds}s would be exceeded")
+                            break
+
+                rung_start_time = time.perf_counter()
+                trials = self.evaluate_rung(candidates, X, y, rows=self.get_rung_rows(y, n_resources),
+                                            data_fingerprint=data_fingerprint, sample_weight=sample_weight)
+                self.n_fits_ += n_fits
+                best_trials = sorted(trials, key=lambda trial: trial["score"], reverse=True)
+                self.history_.append({"rung": rung, "n_resources": n_resources, "n_candidates": len(candidates),
+                                      "n_fits": n_fits, "seconds": time.perf_counter() - rung_start_time,
+                                      "best_score": best_trials[0]["score"]})
+                logging.info(f"Successive halving rung {rung}: {self.history_[-1]}")
+                candidates = [trial["params"] for trial in best_trials[:max(1, len(best_trials) // self.factor)]]
+
+            self.refit_best_candidate(X, y, best_trials, sample_weight=sample_weight)
+            logging.info(f"Successive halving finished with {self.n_fits_} fits "
+                         f"({self.n_reused_fits_} read from the trial store) in "
+                         f"{time.perf_counter() - start_time:.1f}s, best params: {self.best_params_}")
+            return self
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def refit_best_candidate(self, X, y, best_trials: List[dict], sample_weight: Optional[np.ndarray] = None) -> None:
+        """
+        refit the best candidate on all rows, with an inference budget the next best candidates are refit
+        until one is within the budget, best_estimator_ is None when none of them is
+        best_trials: trials of the last rung sorted by score
+        """
+        self.best_estimator_, self.best_params_, self.best_score_ = None, best_trials[0]["params"], None
+        for trial in best_trials:
+            params = trial["params"]
+            if "n_estimators" in trial:
+                params = dict(params, n_estimators=trial["n_estimators"])
+            fit_params = {} if sample_weight is None else {"sample_weight": sample_weight}
+            estimator = clone(self.estimator).set_params(**params).fit(X, y, **fit_params)
+            if self.inference_budget is not None and self.inference_budget.is_limited:
+                cost = measure_inference_cost(estimator, X, batch_size=self.inference_budget.batch_size)
+                violations = self.inference_budget.get_violations(cost)
+                if violations:
+                    logging.info(f"Candidate {params} exceeds the inference budget: {violations}")
+                    continue
+            self.best_estimator_, self.best_params_, self.best_score_ = estimator, params, trial["score"]
+            return
+
+
+class ModelSearch:
+    """
+    Hyperparameter search configured by the search section of model.yaml over the model_selection entries,
+    the in project replacement of the neuro_mf ModelFactory used when model.yaml has a search section.
+    """
+
+    def __init__(self, model_config: dict, trial_store_dir: Optional[str] = None, n_jobs: Optional[int] = None,
+                 inference_budget: Optional[InferenceBudget] = None):
+        """
+        :param model_config: dict content of model.yaml
+        :param trial_store_dir: optional directory of the trial stores of resumable searches
+        :param n_jobs: optional core budget overriding the n_jobs of the search section
+        :param inference_budget: optional latency / size budget, models exceeding it are not selected
+        """
+        try:
+            self.trial_store_dir = trial_store_dir
+            self.inference_budget = inference_budget
+            self.search_config = dict(model_config["search"])
+            if n_jobs is not None:
+                self.search_config["n_jobs"] = n_jobs
+            self.models_config = dict(model_config["model_selection"])
+            if self.search_config.get("strategy", "successive_halving") not in SEARCH_STRATEGIES:
+                raise Exception(f"Unknown search strategy: {self.search_config['strategy']}, "
+                                f"expected one of {SEARCH_STRATEGIES}")
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_model(self, model_serial_number: str) -> object:
+        model_config = self.models_config[model_serial_number]
+        model = get_class(model_config["module"], model_config["class"])()
+        return model.set_params(**dict(model_config.get("params", {})))
+
+    def get_search(self, model: object, param_grid: dict, n_jobs: Optional[int] = None,
+                   trial_store: Optional[TrialStore] = None) -> object:
+        strategy = self.search_config.get("strategy", "successive_halving")
+        scoring = self.search_config.get("scoring", "f1")
+        cv = self.search_config.get("cv", 3)
+        n_jobs = self.search_config.get("n_jobs", 1) if n_jobs is None else n_jobs
+        if strategy == "grid":
+            return GridSearchCV(estimator=model, param_grid=param_grid, scoring=scoring, cv=cv, n_jobs=n_jobs)
+        return SuccessiveHalvingSearch(estimator=model, param_grid=param_grid, scoring=scoring, cv=cv,
+                                       factor=self.search_config.get("factor", 3),
+                                       min_resources=self.search_config.get("min_resources"),
+                                       max_candidates=self.search_config.get("max_candidates"),
+                                       max_fits=self.search_config.get("max_fits"),
+                                       time_budget_seconds=self.search_config.get("time_budget_seconds"),
+                                       n_jobs=n_jobs,
+                                       random_state=self.search_config.get("random_state", RANDOM_STATE),
+                                       trial_store=trial_store,
+                                       xgb_early_stopping_rounds=self.search_config.get("xgb_early_stopping_rounds"),
+                                       xgb_validation_fraction=self.search_config.get("xgb_validation_fraction", 0.1),
+                                       inference_budget=self.inference_budget)
+
+    def search_model(self, model_serial_number: str, X, y, n_jobs: int, isolated: bool = False,
+                     sample_weight: Optional[np.ndarray] = None) -> BestModel:
+        """
+        Method Name :   search_model
+        Description :   This method searches the parameters of one configured model with n_jobs parallel fits.
+                        The estimator is limited to one thread per fit, and in an isolated worker process the
+                        fits run in threads with the native thread pools limited to one thread each, so the
+                        search uses at most n_jobs cores whatever the n_jobs of the configured estimator.
+                        The optional sample weights weight every fit of the search, scored and refit alike
+
+        Output      :   Returns BestModel of the model, with best_model None when no candidate is within
+                        the inference budget
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            model = self.get_model(model_serial_number)
+            model_n_jobs = model.get_params().get("n_jobs")
+            # parallel fits get one thread each, a single fit at a time keeps to the one core of the budget too
+            single_threaded_fits = "n_jobs" in model.get_params()
+            if single_threaded_fits:
+                model.set_params(n_jobs=1)
+            param_grid = dict(self.models_config[model_serial_number]["search_param_grid"])
+            trial_store = None
+            if self.trial_store_dir is not None:
+                trial_store = TrialStore(store_dir=self.trial_store_dir,
+                                         name=f"{model_serial_number}_{type(model).__name__}")
+            search = self.get_search(model, param_grid=param_grid, n_jobs=n_jobs, trial_store=trial_store)
+            logging.info(f"Searching parameters of {type(model).__name__} ({model_serial_number}) with {n_jobs} jobs")
+            # GridSearchCV routes the sample weights of its fit params to the estimator fit of every fold
+            fit_params = {} if sample_weight is None else {"sample_weight": sample_weight}
+            if isolated:
+                with threadpool_limits(limits=1), parallel_config(backend="threading"):
+                    search.fit(X, y, **fit_params)
+            else:
+                search.fit(X, y, **fit_params)
+            best_estimator = search.best_estimator_
+            # successive halving already selected its candidate within the budget
+            if best_estimator is not None and not isinstance(search, SuccessiveHalvingSearch) and \
+                    self.inference_budget is not None and self.inference_budget.is_limited:
+                cost = measure_inference_cost(best_estimator, X, batch_size=self.inference_budget.batch_size)
+                logging.info(f"{type(model).__name__} inference cost: {cost}")
+                violations = self.inference_budget.get_violations(cost)
+                if violations:
+                    logging.info(f"{type(model).__name__} exceeds the inference budget: {violations}")
+                    best_estimator = None
+            if best_estimator is None:
+                return BestModel(model_serial_number=model_serial_number, model=model, best_model=None,
+                                 best_parameters=search.best_params_, best_score=None)
+            if single_threaded_fits:
+                best_estimator.set_params(n_jobs=model_n_jobs)
+            logging.info(f"{type(model).__name__} best score: {search.best_score_}")
+            return BestModel(model_serial_number=model_serial_number, model=model, best_model=best_estimator,
+                             best_parameters=search.best_params_, best_score=search.best_score_)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_best_model(self, X, y, base_accuracy: float = 0.6, sample_weight: Optional[np.ndarray] = None) -> BestModel:
+        """
+        Method Name :   get_best_model
+        Description :   This method searches the parameters of every configured model and returns the best one.
+                        With parallel_models the searches run at the same time in separate worker processes,
+                        each with its share of the n_jobs cores. The optional sample weights are passed to
+                        every fit of the searches
+
+        Output      :   Returns BestModel of the model with the highest search score above base_accuracy,
+                        among the models within the inference budget
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            model_serial_numbers = list(self.models_config)
+            n_cores = effective_n_jobs(self.search_config.get("n_jobs", 1))
+            n_workers = min(len(model_serial_numbers), n_cores)
+            if self.search_config.get("parallel_models", False) and n_workers > 1:
+                core_allocation = ResourceManager.get_worker_cores(n_cores, n_workers=len(model_serial_numbers))
+                logging.info(f"Searching {model_serial_numbers} in {n_workers} worker processes "
+                             f"with cores {core_allocation}")
+                searched_models = Parallel(n_jobs=n_workers, backend="loky")(
+                    delayed(self.search_model)(model_serial_number, X, y, n_jobs=n_jobs, isolated=True,
+                                               sample_weight=sample_weight)
+                    for model_serial_number, n_jobs in zip(model_serial_numbers, core_allocation))
+            else:
+                searched_models = [self.search_model(model_serial_number, X, y, n_jobs=n_cores,
+                                                     sample_weight=sample_weight)
+                                   for model_serial_number in model_serial_numbers]
+
+            best_model = None
+            for searched_model in searched_models:
+                if searched_model.best_model is not None and searched_model.best_score > base_accuracy:
+                    base_accuracy = searched_model.best_score
+                    best_model = searched_model
+            if best_model is None:
+                raise Exception(f"None of Model has base accuracy: {base_accuracy}")
+            logging.info(f"Best model: {best_model}")
+            return best_model
+        except Exception as e:
+            raise TravelException(e, sys) from e
@@ -0,0 +1,253 @@
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.utils.main_utils import read_json_file, write_json_file
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of a numeric column made of about max_centroids weighted centroids.
+    Columns with fewer distinct values than max_centroids are kept exactly, values holding more than
+    1 / max_centroids of the weight keep a centroid of their own.
+    """
+
+    def __init__(self, max_centroids: int = 200):
+        """
+        :param max_centroids: number of rank groups the centroids are compressed to
+        """
+        self.max_centroids = max_centroids
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        # centroids of one distinct value, the CDF steps at them instead of being interpolated
+        self.is_point = np.empty(0, dtype=bool)
+        self.n_null = 0
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    @property
+    def is_exact(self) -> bool:
+        return bool(self.is_point.all())
+
+    @property
+    def rank_error(self) -> float:
+        """
+        bound of the error of the interpolated CDF of a compressed sketch, half the weight of one centroid
+        """
+        return 0.0 if self.is_exact else 0.5 / self.max_centroids
+
+    def update(self, values: pd.Series) -> None:
+        """
+        add the values of one chunk to the sketch
+        """
+        try:
+            values = pd.to_numeric(values)
+            self.n_null += int(values.isna().sum())
+            means, weights = np.unique(values.dropna().to_numpy(dtype=np.float64), return_counts=True)
+            self._add(means, weights.astype(np.float64), np.ones(len(means), dtype=bool))
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """
+        add another sketch of the same column to this sketch
+        """
+        self.n_null += other.n_null
+        self._add(other.means, other.weights, other.is_point)
+
+    def _add(self, means: np.ndarray, weights: np.ndarray, is_point: np.ndarray) -> None:
+        means, inverse = np.unique(np.concatenate([self.means, means]), return_inverse=True)
+        weights = np.bincount(inverse, weights=np.concatenate([self.weights, weights]))
+        is_point = np.bincount(inverse, weights=~np.concatenate([self.is_point, is_point])) == 0
+        if len(means) > self.max_centroids:
+            cumulative = np.cumsum(weights) - weights
+            rank_group = np.floor(cumulative / weights.sum() * self.max_centroids).astype(np.int64)
+            heavy = weights * self.max_centroids >= weights.sum()
+            starts = np.concatenate([[True], (rank_group[1:] != rank_group[:-1]) | heavy[1:] | heavy[:-1]])
+            group = np.cumsum(starts) - 1
+            group_weights = np.bincount(group, weights=weights)
+            keep = group_weights > 0
+            means = (np.bincount(group, weights=means * weights)[keep] / group_weights[keep])
+            is_point = ((np.bincount(group) == 1) & (np.bincount(group, weights=~is_point) == 0))[keep]
+            weights = group_weights[keep]
+        self.means, self.weights, self.is_point = means, weights, is_point
+
+    def quantiles(self, probabilities: np.ndarray) -> np.ndarray:
+        """
+        approximate quantiles of the column
+        """
+        if len(self.means) == 0:
+            return np.full(len(probabilities), np.nan)
+        cumulative = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return np.interp(probabilities, cumulative, self.means)
+
+    def cdf(self, values: np.ndarray) -> np.ndarray:
+        """
+        approximate weight of the column at or below values. The weight of a point centroid counts from its
+        value on, the weight of a compressed centroid is spread by interpolating between the mid ranks of the
+        centroids like quantiles, so the CDF of an exact sketch is exact
+        """
+        after = np.cumsum(self.weights)
+        before = after - self.weights
+        knots = np.where(self.is_point, after, after - self.weights / 2)
+        # the step of a point centroid is a knot at its weight before just below its value
+        point_means = self.means[self.is_point]
+        x = np.concatenate([self.means, np.nextafter(point_means, -np.inf)])
+        y = np.concatenate([knots, before[self.is_point]])
+        order = np.argsort(x, kind="stable")
+        return np.interp(values, x[order], y[order], left=0.0)
+
+    def histogram(self, edges: np.ndarray) -> np.ndarray:
+        """
+        approximate counts in the bins defined by the inner edges, first and last bins are open ended
+        """
+        if len(self.means) == 0:
+            return np.zeros(len(edges) + 1)
+        return np.diff(np.concatenate([[0.0], self.cdf(edges), [self.count]]))
+
+    def to_dict(self) -> dict:
+        return {"type": "quantile", "max_centroids": self.max_centroids, "n_null": self.n_null,
+                "means": self.means.tolist(), "weights": self.weights.tolist(), "is_point": self.is_point.tolist()}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "QuantileSketch":
+        sketch = cls(max_centroids=content["max_centroids"])
+        sketch.n_null = content["n_null"]
+        sketch.means = np.asarray(content["means"], dtype=np.float64)
+        sketch.weights = np.asarray(content["weights"], dtype=np.float64)
+        # profiles saved before is_point was stored are compressed when they are full
+        sketch.is_point = np.asarray(content.get("is_point", [len(sketch.means) < sketch.max_centroids]
+                                                  * len(sketch.means)), dtype=bool)
+        return sketch
+
+
+class FrequencySketch:
+    """
+    Mergeable frequency counts of a categorical column.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.n_null = 0
+
+    @property
+    def count(self) -> float:
+        return float(sum(self.counts.values()))
+
+    def update(self, values: pd.Series) -> None:
+        """
+        add the values of one chunk to the sketch
+        """
+        try:
+            self.n_null += int(values.isna().sum())
+            for category, count in values.value_counts(dropna=True, sort=False).items():
+                if count > 0:
+                    self.counts[str(category)] = self.counts.get(str(category), 0) + int(count)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def merge(self, other: "FrequencySketch") -> None:
+        """
+        add another sketch of the same column to this sketch
+        """
+        self.n_null += other.n_null
+        for category, count in other.counts.items():
+            self.counts[category] = self.counts.get(category, 0) + count
+
+    def to_dict(self) -> dict:
+        return {"type": "frequency", "n_null": self.n_null, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "FrequencySketch":
+        sketch = cls()
+        sketch.n_null = content["n_null"]
+        sketch.counts = dict(content["counts"])
+        return sketch
+
+
+class DatasetProfile:
+    """
+    Per column sketches of a dataset, built in one streaming pass and stored as a small json file.
+    """
+
+    def __init__(self, columns: dict, max_centroids: int = 200):
+        """
+        :param columns: dict column -> kind ("numeric" / "categorical")
+        :param max_centroids: maximum number of centroids of the numeric sketches
+        """
+        self.columns = dict(columns)
+        self.n_rows = 0
+        self.sketches = {column: QuantileSketch(max_centroids=max_centroids) if kind == "numeric" else FrequencySketch()
+                         for column, kind in self.columns.items()}
+
+    def update(self, dataframe: DataFrame) -> None:
+        """
+        Method Name :   update
+        Description :   This method adds one chunk of data to the sketch of every profiled column
+
+        Output      :   sketches are updated in place
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            self.n_rows += len(dataframe)
+            for column, sketch in self.sketches.items():
+                if column in dataframe.columns:
+                    sketch.update(dataframe[column])
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def merge(self, other: "DatasetProfile") -> None:
+        """
+        Method Name :   merge
+        Description :   This method adds another profile of the same columns to this profile
+
+        Output      :   sketches are merged in place
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            self.n_rows += other.n_rows
+            for column, sketch in self.sketches.items():
+                if column in other.sketches:
+                    sketch.merge(other.sketches[column])
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def to_dict(self) -> dict:
+        return {"n_rows": self.n_rows, "columns": self.columns,
+                "sketches": {column: sketch.to_dict() for column, sketch in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "DatasetProfile":
+        profile = cls(columns=content["columns"])
+        profile.n_rows = content["n_rows"]
+        for column, sketch in content["sketches"].items():
+            sketch_class = QuantileSketch if sketch["type"] == "quantile" else FrequencySketch
+            profile.sketches[column] = sketch_class.from_dict(sketch)
+        return profile
+
+    def save(self, file_path: str) -> None:
+        logging.info(f"Saving dataset profile of {self.n_rows} rows to {file_path}")
+        write_json_file(file_path=file_path, content=self.to_dict())
+
+    @classmethod
+    def load(cls, file_path: str) -> "DatasetProfile":
+        return cls.from_dict(read_json_file(file_path=file_path))
+
+    @classmethod
+    def merged(cls, profiles: list) -> Optional["DatasetProfile"]:
+        """
+        merge several profiles of the same columns into a new profile
+        """
+        if len(profiles) == 0:
+            return None
+        profile = cls.from_dict(profiles[0].to_dict())
+        for other in profiles[1:]:
+            profile.merge(other)
+        return profile
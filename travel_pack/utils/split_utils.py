@@ -0,0 +1,160 @@
+import sys
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+
+
+def _hash_keys(keys: pd.Series, hash_key: Optional[str] = None) -> np.ndarray:
+    if hash_key is None:
+        hashed = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    else:
+        # pandas only salts the hash of object values, so salted keys are hashed as strings
+        hashed = pd.util.hash_pandas_object(keys.astype(str).astype(object), index=False,
+                                            hash_key=hash_key).to_numpy()
+    return hashed / np.float64(2 ** 64)
+
+
+def get_hash_fractions(keys: pd.Series, hash_key: Optional[str] = None) -> np.ndarray:
+    """
+    map every key to a number in [0, 1) which only depends on the key value
+    integer keys, and integral float keys, are hashed as int64 so int32/int64/float columns give the same
+    result, non integral float keys are hashed as strings instead of being truncated
+    keys: pandas Series of row keys
+    hash_key: optional 16 character salt, different salts give independent fractions for the same keys
+    return: np.array of float64, NaN for null keys
+    """
+    try:
+        fractions = np.full(len(keys), np.nan)
+        positions = np.flatnonzero(keys.notna().to_numpy())
+        keys = keys.iloc[positions]
+        if pd.api.types.is_float_dtype(keys.dtype):
+            is_integral = (keys % 1 == 0).to_numpy()
+            fractions[positions[is_integral]] = _hash_keys(keys[is_integral].astype("int64"), hash_key)
+            fractions[positions[~is_integral]] = _hash_keys(keys[~is_integral].astype(str), hash_key)
+        elif pd.api.types.is_numeric_dtype(keys.dtype):
+            fractions[positions] = _hash_keys(keys.astype("int64"), hash_key)
+        else:
+            fractions[positions] = _hash_keys(keys.astype(str), hash_key)
+        return fractions
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+class HashSplitter:
+    """
+    Deterministic train/test splitter which works chunk by chunk on a stream.
+
+    A row goes to the test set when the hash of its key falls below the test threshold of its class,
+    so its side only depends on its own key and class, never on chunking, order or the other rows.
+    Rows without key always go to the train set. Without stratification every row has the threshold
+    test_ratio, the key hash is uniform so test_ratio of the rows go to the test set up to the binomial
+    deviation, and a row never changes side when the data grows.
+
+    With stratification fit ranks the key hashes of every class of the whole data once, the threshold of a
+    class is the hash of its round(test_ratio * n)-th key, so every class sends exactly that many rows to the
+    test set whatever the chunking. fit holds one float per row, and as the data grows the thresholds move,
+    rows next to a threshold can change side between runs on different data.
+    """
+
+    def __init__(self, key_column: str, test_ratio: float, stratify_column: Optional[str] = None,
+                 hash_key: Optional[str] = None, class_test_ratios: Optional[dict] = None):
+        """
+        :param key_column: column whose hash assigns the row to train or test
+        :param test_ratio: share of rows to put in the test set
+        :param stratify_column: optional class column to put exactly test_ratio of every class in the test
+            set, the splitter must be fitted on the whole data first
+        :param hash_key: optional 16 character salt of the key hash, independent of the train/test split salt
+        :param class_test_ratios: optional dict of class -> test threshold of the class, other classes use
+            test_ratio. Set by fit when stratified
+        """
+        self.key_column = key_column
+        self.test_ratio = test_ratio
+        self.stratify_column = stratify_column
+        self.hash_key = hash_key
+        self.class_test_ratios = dict(class_test_ratios or {})
+        self.is_fitted = stratify_column is None
+        self.n_train = 0
+        self.n_test = 0
+        self.n_null_keys = 0
+
+    def fit(self, dataframe: Optional[DataFrame]) -> "HashSplitter":
+        """
+        Method Name :   fit
+        Description :   This method sets the test threshold of every class from the key hashes of the class,
+                        dataframe holds the key and stratify columns of the whole data, e.g. read by a key
+                        only pass over the stream. Unstratified splitters need no fit
+
+        Output      :   Returns the fitted splitter
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if self.stratify_column is None:
+                return self
+            if dataframe is None:
+                raise Exception(f"Stratified split on {self.stratify_column} needs the keys of the whole data")
+            fractions = get_hash_fractions(dataframe[self.key_column], hash_key=self.hash_key)
+            labels = dataframe[self.stratify_column].to_numpy()
+            has_key = ~np.isnan(fractions) & dataframe[self.stratify_column].notna().to_numpy()
+            for label in pd.unique(labels[has_key]):
+                class_fractions = np.sort(fractions[has_key & (labels == label)])
+                n_test = int(round(self.test_ratio * len(class_fractions)))
+                self.class_test_ratios[label] = \
+                    float(class_fractions[n_test]) if n_test < len(class_fractions) else 1.0
+            self.is_fitted = True
+            logging.info(f"Fitted test thresholds of {len(self.class_test_ratios)} classes of {self.stratify_column}")
+            return self
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_thresholds(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        test threshold of every row, the threshold of its class when stratified
+        """
+        if not self.is_fitted:
+            raise Exception(f"Stratified split on {self.stratify_column} is not fitted")
+        if self.stratify_column is None or len(self.class_test_ratios) == 0:
+            return np.full(len(dataframe), self.test_ratio)
+        labels = dataframe[self.stratify_column]
+        return labels.map(self.class_test_ratios).astype(np.float64).fillna(self.test_ratio).to_numpy()
+
+    def get_test_mask(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Method Name :   get_test_mask
+        Description :   This method assigns every row of a chunk to train (False) or test (True), each row
+                        independently from the hash of its key and the threshold of its class. Rows without
+                        key go to train
+
+        Output      :   Returns boolean np.array with one entry per row
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            fractions = get_hash_fractions(dataframe[self.key_column], hash_key=self.hash_key)
+            return ~np.isnan(fractions) & (fractions < self.get_thresholds(dataframe))
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def split(self, dataframe: DataFrame) -> Tuple[DataFrame, DataFrame]:
+        """
+        Method Name :   split
+        Description :   This method splits one chunk of the stream into its train and test rows
+
+        Output      :   Returns train dataframe and test dataframe of the chunk
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            is_test = self.get_test_mask(dataframe)
+            train_set, test_set = dataframe[~is_test], dataframe[is_test]
+            n_null_keys = int(dataframe[self.key_column].isna().sum())
+            self.n_train += len(train_set)
+            self.n_test += len(test_set)
+            self.n_null_keys += n_null_keys
+            logging.info(f"Hash split chunk of {len(dataframe)} rows: "
+                         f"{len(train_set)} train ({n_null_keys} without {self.key_column}), {len(test_set)} test")
+            return train_set, test_set
+        except Exception as e:
+            raise TravelException(e, sys) from e
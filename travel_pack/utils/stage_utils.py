@@ -0,0 +1,481 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field, fields, asdict, is_dataclass
+from typing import Callable, Dict, List, Optional, get_type_hints
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.utils.cache_utils import get_file_hash, get_object_hash, link_or_copy
+
+STAGE_STATUS_COMPLETED = "completed"
+STAGE_STATUS_CACHED = "cached"
+STAGE_STATUS_SKIPPED = "skipped"
+STAGE_STATUS_RUNNING = "running"
+STAGE_STATUS_FAILED = "failed"
+# stages in these states are not run again when a run is resumed
+STAGE_FINISHED_STATUSES = (STAGE_STATUS_COMPLETED, STAGE_STATUS_CACHED, STAGE_STATUS_SKIPPED)
+
+
+def get_code_version(package_dir: str, env_key: Optional[str] = None) -> str:
+    """
+    version of the pipeline code, taken from the environment variable env_key (e.g. a git sha set at build time)
+    or else the sha256 of every python source file of the package
+    """
+    try:
+        if env_key is not None and os.getenv(env_key):
+            return os.getenv(env_key)
+        code_hash = hashlib.sha256()
+        for root, dir_names, file_names in os.walk(package_dir):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if file_name.endswith(".py"):
+                    file_path = os.path.join(root, file_name)
+                    code_hash.update(os.path.relpath(file_path, package_dir).encode())
+                    code_hash.update(get_file_hash(file_path).encode())
+        return code_hash.hexdigest()
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+def artifact_to_dict(artifact: object) -> Optional[dict]:
+    return asdict(artifact) if artifact is not None else None
+
+
+def artifact_from_dict(artifact_class: type, data: Optional[dict]) -> object:
+    """
+    rebuild an artifact dataclass, nested artifact dataclasses included, from its dict
+    """
+    if data is None:
+        return None
+    type_hints = get_type_hints(artifact_class)
+    values = {}
+    for artifact_field in fields(artifact_class):
+        value = data.get(artifact_field.name)
+        field_type = type_hints[artifact_field.name]
+        values[artifact_field.name] = artifact_from_dict(field_type, value) if is_dataclass(field_type) else value
+    return artifact_class(**values)
+
+
+def get_artifact_files(artifact: object) -> List[str]:
+    """
+    files referenced by the (nested) string fields of an artifact
+    """
+    if artifact is None:
+        return []
+    files = []
+    for value in artifact_to_dict(artifact).values():
+        if isinstance(value, dict):
+            files.extend(path for path in value.values() if isinstance(path, str) and os.path.isfile(path))
+        elif isinstance(value, str) and os.path.isfile(value):
+            files.append(value)
+    return files
+
+
+def relocate_artifact(data: dict, output_files: List[str], from_dir: str, to_dir: str) -> dict:
+    """
+    hard link the files of an artifact dict from one run artifact directory into another
+    return: artifact dict with the paths of the linked files
+    """
+    relocated = {}
+    for name, value in data.items():
+        if isinstance(value, dict):
+            value = relocate_artifact(value, output_files, from_dir, to_dir)
+        elif isinstance(value, str) and value in output_files and value.startswith(from_dir + os.sep):
+            to_file_path = to_dir + value[len(from_dir):]
+            link_or_copy(value, to_file_path)
+            value = to_file_path
+        relocated[name] = value
+    return relocated
+
+
+def describe_config(config: object, run_artifact_dir: str) -> dict:
+    """
+    description of a stage config for its cache key, paths inside the run artifact directory and
+    n_jobs settings are left out as they differ between runs without changing the result
+    """
+    if config is None:
+        return {}
+    return {name: value for name, value in asdict(config).items()
+            if not name.endswith("n_jobs")
+            and not (isinstance(value, str) and value.startswith(run_artifact_dir))}
+
+
+@dataclass
+class Stage:
+    """
+    Node of the training pipeline DAG.
+
+    run gets the artifacts of the finished stages and returns the artifact of the stage. A stage with
+    inputs is cacheable: inputs returns name -> value of everything its result depends on besides its
+    config and the code version, values which are existing file paths take part in the key by content.
+    Stages reading external state (mongodb, the production model in s3) declare no inputs and always run.
+    """
+    name: str
+    run: Callable[[Dict[str, object]], object]
+    artifact_class: Optional[type] = None
+    depends_on: List[str] = field(default_factory=list)
+    inputs: Optional[Callable[[Dict[str, object]], dict]] = None
+    config: Optional[object] = None
+    condition: Optional[Callable[[Dict[str, object]], bool]] = None
+
+
+class StageCache:
+    """
+    Index of stage artifacts keyed by the content hash of the stage inputs.
+
+    Every entry is a json file <cache_dir>/<stage>/<key>.json with the artifact and the hashes of the
+    files it references, an entry whose files were deleted or changed is a miss. On a hit the files are
+    hard linked into the artifact directory of the current run and the entry follows them, so every run
+    directory stays complete and older runs can be deleted.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def get_entry_file_path(self, stage_name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, stage_name, f"{key}.json")
+
+    def lookup(self, stage: Stage, key: str, run_artifact_dir: str) -> Optional[object]:
+        """
+        Method Name :   lookup
+        Description :   This method looks up the artifact of a stage run with the same inputs and links its files
+                        into the artifact directory of the current run
+
+        Output      :   Returns the artifact on a hit, None on a miss
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            entry_file_path = self.get_entry_file_path(stage.name, key)
+            if not os.path.exists(entry_file_path):
+                return None
+            with open(entry_file_path, "r") as file_obj:
+                entry = json.load(file_obj)
+            for file_path, file_hash in entry["output_files"].items():
+                if not os.path.exists(file_path) or get_file_hash(file_path) != file_hash:
+                    logging.info(f"Stage cache entry {entry_file_path} is stale, {file_path} changed")
+                    return None
+            artifact = entry["artifact"]
+            from_dir = entry.get("run_artifact_dir")
+            if from_dir is not None and from_dir != run_artifact_dir and artifact is not None:
+                artifact = relocate_artifact(artifact, list(entry["output_files"]), from_dir, run_artifact_dir)
+                artifact = artifact_from_dict(stage.artifact_class, artifact)
+                self.store(stage, key, artifact, run_artifact_dir)
+                return artifact
+            return artifact_from_dict(stage.artifact_class, artifact)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def store(self, stage: Stage, key: str, artifact: object, run_artifact_dir: str) -> None:
+        """
+        Method Name :   store
+        Description :   This method records the artifact of a stage under the key of its inputs
+
+        Output      :   entry file is written atomically
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            entry_file_path = self.get_entry_file_path(stage.name, key)
+            os.makedirs(os.path.dirname(entry_file_path), exist_ok=True)
+            entry = {"stage": stage.name, "key": key, "created": time.time(),
+                     "run_artifact_dir": run_artifact_dir, "artifact": artifact_to_dict(artifact),
+                     "output_files": {file_path: get_file_hash(file_path)
+                                      for file_path in get_artifact_files(artifact)}}
+            tmp_file_path = f"{entry_file_path}.{os.getpid()}.tmp"
+            with open(tmp_file_path, "w") as file_obj:
+                json.dump(entry, file_obj, indent=2)
+            os.replace(tmp_file_path, entry_file_path)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def collect_garbage(self) -> int:
+        """
+        Method Name :   collect_garbage
+        Description :   This method removes the entries whose artifact files were deleted, e.g. with their run
+
+        Output      :   Returns the number of removed entries
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            removed = 0
+            if not os.path.isdir(self.cache_dir):
+                return removed
+            for stage_name in os.listdir(self.cache_dir):
+                stage_dir = os.path.join(self.cache_dir, stage_name)
+                for file_name in os.listdir(stage_dir):
+                    if not file_name.endswith(".json"):
+                        continue
+                    entry_file_path = os.path.join(stage_dir, file_name)
+                    with open(entry_file_path, "r") as file_obj:
+                        entry = json.load(file_obj)
+                    if any(not os.path.exists(file_path) for file_path in entry["output_files"]):
+                        os.remove(entry_file_path)
+                        removed += 1
+            logging.info(f"Removed {removed} stale stage cache entries")
+            return removed
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+
+class RunManifest:
+    """
+    Json record of one pipeline run: run status, code version and per stage status, key, timing and artifact.
+
+    The manifest is rewritten atomically after every stage transition, so after a crash it holds the
+    artifacts of every finished stage and a resumed run continues from the first unfinished one.
+    """
+
+    def __init__(self, file_path: str, run_id: str):
+        """
+        :param file_path: location of the manifest file, inside the artifact directory of the run
+        :param run_id: id of the run
+        """
+        self.file_path = file_path
+        self.content = {"run_id": run_id, "status": STAGE_STATUS_RUNNING, "code_version": None, "stages": {}}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.file_path)
+
+    def load(self) -> "RunManifest":
+        """
+        Method Name :   load
+        Description :   This method reads the manifest of an earlier run
+
+        Output      :   Returns the manifest
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            with open(self.file_path, "r") as file_obj:
+                self.content = json.load(file_obj)
+            return self
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def save(self) -> None:
+        """
+        Method Name :   save
+        Description :   This method writes the manifest through a temporary file and an atomic rename
+
+        Output      :   manifest file is replaced
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            tmp_file_path = f"{self.file_path}.{os.getpid()}.tmp"
+            with open(tmp_file_path, "w") as file_obj:
+                json.dump(self.content, file_obj, indent=2)
+            os.replace(tmp_file_path, self.file_path)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def get_stage(self, stage_name: str) -> dict:
+        return self.content["stages"].get(stage_name, {})
+
+    def update_stage(self, stage_name: str, **values) -> None:
+        self.content["stages"].setdefault(stage_name, {}).update(values)
+        self.save()
+
+    def update_run(self, **values) -> None:
+        self.content.update(values)
+        self.save()
+
+    def get_finished_artifact(self, stage: Stage) -> tuple:
+        """
+        status and artifact of a stage finished in the recorded run, (None, None) when the stage has to run,
+        either because it did not finish or because one of its artifact files is gone
+        """
+        record = self.get_stage(stage.name)
+        status = record.get("status")
+        if status not in STAGE_FINISHED_STATUSES:
+            return None, None
+        if any(not os.path.exists(file_path) for file_path in record.get("output_files", [])):
+            logging.info(f"Artifact files of stage {stage.name} are missing, running it again")
+            return None, None
+        return status, artifact_from_dict(stage.artifact_class, record.get("artifact"))
+
+
+class StageExecutor:
+    """
+    Runs the stages of the training pipeline in dependency order and reuses the artifacts of
+    cacheable stages whose data, config and code version match an earlier run.
+
+    Stages whose dependencies are finished run concurrently in up to max_workers threads, the
+    manifest is only written by the scheduling thread.
+    """
+
+    def __init__(self, stages: List[Stage], run_artifact_dir: str, code_version: str,
+                 stage_cache: Optional[StageCache] = None, manifest: Optional[RunManifest] = None,
+                 max_workers: int = 1):
+        """
+        :param stages: stages of the pipeline
+        :param run_artifact_dir: artifact directory of the run
+        :param code_version: version of the pipeline code, part of every stage key
+        :param stage_cache: stage cache, None runs every stage
+        :param manifest: manifest recording the stages of the run, None records nothing
+        :param max_workers: number of stages running at the same time
+        """
+        try:
+            self.stages = self.sort_stages(stages)
+            self.run_artifact_dir = run_artifact_dir
+            self.code_version = code_version
+            self.stage_cache = stage_cache
+            self.manifest = manifest
+            self.max_workers = max(1, max_workers)
+            self._file_hashes = {}
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    @staticmethod
+    def sort_stages(stages: List[Stage]) -> List[Stage]:
+        """
+        topological order of the stages, keeping the declared order between independent stages
+        """
+        stage_names = [stage.name for stage in stages]
+        for stage in stages:
+            for dependency in stage.depends_on:
+                if dependency not in stage_names:
+                    raise Exception(f"Stage {stage.name} depends on unknown stage {dependency}")
+        ordered, done = [], set()
+        while len(ordered) < len(stages):
+            ready = [stage for stage in stages if stage.name not in done and set(stage.depends_on) <= done]
+            if len(ready) == 0:
+                raise Exception(f"Stages {sorted(set(stage_names) - done)} have cyclic dependencies")
+            ordered.append(ready[0])
+            done.add(ready[0].name)
+        return ordered
+
+    def _get_file_hash(self, file_path: str) -> str:
+        file_stat = os.stat(file_path)
+        stat_key = (os.path.abspath(file_path), file_stat.st_size, file_stat.st_mtime_ns)
+        if stat_key not in self._file_hashes:
+            self._file_hashes[stat_key] = get_file_hash(file_path)
+        return self._file_hashes[stat_key]
+
+    def get_stage_key(self, stage: Stage, artifacts: Dict[str, object]) -> str:
+        """
+        Method Name :   get_stage_key
+        Description :   This method hashes the declared inputs (files by content), config and code version of a stage
+
+        Output      :   Returns the hex digest keying the stage cache
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            inputs = {}
+            for name, value in stage.inputs(artifacts).items():
+                if isinstance(value, str) and os.path.isfile(value):
+                    value = {"file_hash": self._get_file_hash(value)}
+                inputs[name] = value
+            return get_object_hash({"stage": stage.name, "inputs": inputs,
+                                    "config": describe_config(stage.config, self.run_artifact_dir),
+                                    "code_version": self.code_version})
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def run_stage(self, stage: Stage, artifacts: Dict[str, object]) -> tuple:
+        """
+        Method Name :   run_stage
+        Description :   This method returns the cached artifact of a stage or runs it and caches the result
+
+        Output      :   Returns tuple of (artifact, status, key)
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            key = None
+            if stage.inputs is not None and self.stage_cache is not None:
+                key = self.get_stage_key(stage, artifacts)
+                artifact = self.stage_cache.lookup(stage, key, self.run_artifact_dir)
+                if artifact is not None:
+                    logging.info(f"Stage {stage.name} inputs unchanged, reusing artifact of key {key}")
+                    return artifact, STAGE_STATUS_CACHED, key
+            artifact = stage.run(artifacts)
+            if key is not None:
+                self.stage_cache.store(stage, key, artifact, self.run_artifact_dir)
+            return artifact, STAGE_STATUS_COMPLETED, key
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def record_stage(self, stage_name: str, **values) -> None:
+        if self.manifest is not None:
+            self.manifest.update_stage(stage_name, **values)
+
+    def restore_finished_stages(self, pending: List[Stage], artifacts: Dict[str, object], skipped: set) -> None:
+        """
+        restore the stages finished in the manifest of the resumed run, in dependency order up to the
+        first unfinished stage, which runs with every stage after it
+        """
+        while len(pending) > 0:
+            stage = pending[0]
+            status, artifact = self.manifest.get_finished_artifact(stage)
+            if status is None:
+                logging.info(f"Resuming the run from stage {stage.name}")
+                return
+            logging.info(f"Stage {stage.name} {status} in the resumed run, not running it again")
+            if status == STAGE_STATUS_SKIPPED:
+                skipped.add(stage.name)
+            else:
+                artifacts[stage.name] = artifact
+            pending.pop(0)
+
+    def run(self, resume: bool = False) -> Dict[str, object]:
+        """
+        Method Name :   run
+        Description :   This method runs the pipeline, every stage starts as soon as its dependencies finished and
+                        a stage whose condition fails is skipped with its dependents. With resume the finished
+                        stages recorded in the manifest are restored up to the first unfinished stage
+
+        Output      :   Returns dict of stage name -> artifact of the stages which ran or were reused
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            if resume and self.manifest is None:
+                raise Exception("Resuming a run needs its manifest")
+            if self.manifest is not None:
+                if resume and self.manifest.content.get("code_version") != self.code_version:
+                    logging.info("Code version changed since the run started, resuming with the current code")
+                self.manifest.update_run(status=STAGE_STATUS_RUNNING, code_version=self.code_version)
+            artifacts, skipped, pending = {}, set(), list(self.stages)
+            if resume:
+                self.restore_finished_stages(pending, artifacts, skipped)
+            running = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while len(pending) > 0 or len(running) > 0:
+                    ready = [stage for stage in pending if set(stage.depends_on) <= set(artifacts) | skipped]
+                    for stage in ready:
+                        pending.remove(stage)
+                        if any(dependency in skipped for dependency in stage.depends_on) or (
+                                stage.condition is not None and not stage.condition(artifacts)):
+                            logging.info(f"Skipping stage {stage.name}")
+                            skipped.add(stage.name)
+                            self.record_stage(stage.name, status=STAGE_STATUS_SKIPPED, artifact=None, output_files=[])
+                            continue
+                        started = time.time()
+                        self.record_stage(stage.name, status=STAGE_STATUS_RUNNING, started=started, error=None)
+                        running[executor.submit(self.run_stage, stage, dict(artifacts))] = (stage, started)
+                    if len(running) == 0:
+                        if len(ready) > 0:
+                            continue
+                        raise Exception(f"Stages {[stage.name for stage in pending]} can not run")
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, started = running.pop(future)
+                        try:
+                            artifacts[stage.name], status, key = future.result()
+                        except Exception as stage_error:
+                            self.record_stage(stage.name, status=STAGE_STATUS_FAILED, finished=time.time(),
+                                              error=str(stage_error))
+                            if self.manifest is not None:
+                                self.manifest.update_run(status=STAGE_STATUS_FAILED)
+                            logging.info(f"Stage {stage.name} failed, waiting for {len(running)} running stages")
+                            raise
+                        self.record_stage(stage.name, status=status, key=key, finished=time.time(),
+                                          artifact=artifact_to_dict(artifacts[stage.name]),
+                                          output_files=get_artifact_files(artifacts[stage.name]))
+                        logging.info(f"Stage {stage.name} {status} in {time.time() - started:.2f} seconds")
+            if self.manifest is not None:
+                self.manifest.update_run(status=STAGE_STATUS_COMPLETED)
+            return artifacts
+        except Exception as e:
+            raise TravelException(e, sys) from e
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+from typing import List, Optional
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.utils.cache_utils import get_file_hash
+
+
+class ArtifactStore:
+    """
+    Content addressed store of run artifacts.
+
+    Every file added to the store is kept once as blobs/<hash[:2]>/<hash> and the run file becomes a
+    hard link to that blob, so identical outputs of different runs (ingested csv files, arrays,
+    pickles) take disk space once. A blob with a single link is no longer referenced by any run or
+    cache and is removed by collect_garbage.
+    """
+
+    BLOB_DIR_NAME = "blobs"
+
+    def __init__(self, store_dir: str):
+        """
+        :param store_dir: directory of the store, on the same file system as the artifact directories
+        """
+        self.store_dir = store_dir
+        self.blob_dir = os.path.join(store_dir, self.BLOB_DIR_NAME)
+
+    def get_blob_path(self, file_hash: str) -> str:
+        return os.path.join(self.blob_dir, file_hash[:2], file_hash)
+
+    def put(self, file_path: str) -> bool:
+        """
+        Method Name :   put
+        Description :   This method adds a file to the store, a file whose content is already stored is
+                        replaced by a hard link to the stored blob
+
+        Output      :   Returns True when the file was deduplicated against an existing blob
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            blob_path = self.get_blob_path(get_file_hash(file_path))
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                try:
+                    os.link(file_path, blob_path)
+                except OSError as link_error:
+                    logging.info(f"Can not link {file_path} into the artifact store: {link_error}")
+                return False
+            if os.path.samefile(blob_path, file_path):
+                return False
+            tmp_file_path = f"{file_path}.{os.getpid()}.link"
+            os.link(blob_path, tmp_file_path)
+            os.replace(tmp_file_path, file_path)
+            return True
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def add_dir(self, dir_path: str) -> dict:
+        """
+        Method Name :   add_dir
+        Description :   This method adds every file below a directory to the store
+
+        Output      :   Returns dict with the number of files, deduplicated files and bytes saved
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            stats = {"files": 0, "deduplicated": 0, "bytes_saved": 0}
+            for root, _, file_names in os.walk(dir_path):
+                for file_name in file_names:
+                    file_path = os.path.join(root, file_name)
+                    if os.path.islink(file_path):
+                        continue
+                    stats["files"] += 1
+                    if self.put(file_path):
+                        stats["deduplicated"] += 1
+                        stats["bytes_saved"] += os.path.getsize(file_path)
+            logging.info(f"Added {dir_path} to the artifact store: {stats}")
+            return stats
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    @staticmethod
+    def detach_dir(dir_path: str) -> None:
+        """
+        Method Name :   detach_dir
+        Description :   This method replaces the hard linked files below a directory by private copies,
+                        so stages writing their outputs in place can not change stored blobs
+
+        Output      :   linked files are copied
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            for root, _, file_names in os.walk(dir_path):
+                for file_name in file_names:
+                    file_path = os.path.join(root, file_name)
+                    if os.path.islink(file_path) or os.stat(file_path).st_nlink < 2:
+                        continue
+                    tmp_file_path = f"{file_path}.{os.getpid()}.copy"
+                    with open(file_path, "rb") as src, open(tmp_file_path, "wb") as dst:
+                        for block in iter(lambda: src.read(1024 * 1024), b""):
+                            dst.write(block)
+                    os.replace(tmp_file_path, file_path)
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def verify(self) -> List[str]:
+        """
+        Method Name :   verify
+        Description :   This method hashes every blob again, a blob whose content no longer matches its name
+                        was overwritten in place through one of its links
+
+        Output      :   Returns list of corrupted blob paths, empty when every blob verifies
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            corrupted_blob_paths = []
+            if not os.path.isdir(self.blob_dir):
+                return corrupted_blob_paths
+            for root, _, file_names in os.walk(self.blob_dir):
+                for file_name in file_names:
+                    blob_path = os.path.join(root, file_name)
+                    if get_file_hash(blob_path) != file_name:
+                        corrupted_blob_paths.append(blob_path)
+            return corrupted_blob_paths
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def collect_garbage(self) -> dict:
+        """
+        Method Name :   collect_garbage
+        Description :   This method removes the blobs no run or cache links to any more
+
+        Output      :   Returns dict with the number of removed blobs and freed bytes
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            stats = {"blobs_removed": 0, "bytes_freed": 0}
+            if not os.path.isdir(self.blob_dir):
+                return stats
+            for root, _, file_names in os.walk(self.blob_dir):
+                for file_name in file_names:
+                    blob_path = os.path.join(root, file_name)
+                    blob_stat = os.stat(blob_path)
+                    if blob_stat.st_nlink == 1:
+                        os.remove(blob_path)
+                        stats["blobs_removed"] += 1
+                        stats["bytes_freed"] += blob_stat.st_size
+            logging.info(f"Artifact store garbage collection: {stats}")
+            return stats
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+
+def get_runs(artifact_root: str, manifest_file_name: str) -> List[dict]:
+    """
+    runs below an artifact root, newest first, a run is a directory with a manifest
+    return: list of dicts with run_id, run_dir and manifest content
+    """
+    runs = []
+    if not os.path.isdir(artifact_root):
+        return runs
+    for run_id in os.listdir(artifact_root):
+        manifest_file_path = os.path.join(artifact_root, run_id, manifest_file_name)
+        if not os.path.isfile(manifest_file_path):
+            continue
+        try:
+            with open(manifest_file_path, "r") as file_obj:
+                manifest = json.load(file_obj)
+        except json.JSONDecodeError:
+            manifest = {}
+        runs.append({"run_id": run_id, "run_dir": os.path.join(artifact_root, run_id), "manifest": manifest,
+                     "updated": os.path.getmtime(manifest_file_path)})
+    return sorted(runs, key=lambda run: run["updated"], reverse=True)
+
+
+def is_run_accepted(manifest: dict) -> bool:
+    evaluation_artifact = manifest.get("stages", {}).get("model_evaluation", {}).get("artifact") or {}
+    return bool(evaluation_artifact.get("is_model_accepted", False))
+
+
+def select_expired_runs(runs: List[dict], keep_last_runs: int, keep_accepted_runs: Optional[int],
+                        protected_run_ids: List[str]) -> List[dict]:
+    """
+    runs outside the retention policy: the keep_last_runs newest runs and the keep_accepted_runs newest
+    runs with an accepted model (every accepted run when None) are kept, as are the protected runs
+    runs: runs newest first as returned by get_runs
+    """
+    kept = {run["run_id"] for run in runs[:keep_last_runs]} | set(protected_run_ids)
+    accepted_runs = [run for run in runs if is_run_accepted(run["manifest"])]
+    if keep_accepted_runs is not None:
+        accepted_runs = accepted_runs[:keep_accepted_runs]
+    kept |= {run["run_id"] for run in accepted_runs}
+    return [run for run in runs if run["run_id"] not in kept]
+
+
+def remove_old_log_files(log_dir: str, keep_log_files: int, protected_file_names: List[str]) -> int:
+    """
+    remove all but the keep_log_files newest log files of log_dir
+    return: number of removed files
+    """
+    log_file_paths = sorted((os.path.join(log_dir, file_name) for file_name in os.listdir(log_dir)
+                             if file_name.endswith(".log") and file_name not in protected_file_names),
+                            key=os.path.getmtime, reverse=True)
+    expired = log_file_paths[max(0, keep_log_files - len(protected_file_names)):]
+    for log_file_path in expired:
+        os.remove(log_file_path)
+    return len(expired)
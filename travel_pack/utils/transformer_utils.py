@@ -0,0 +1,37 @@
+import sys
+
+import numpy as np
+from pandas import DataFrame
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from travel_pack.exception import TravelException
+
+
+class DtypeCaster(BaseEstimator, TransformerMixin):
+    """
+    First and last step of the column group pipelines of the preprocessor. As first step it casts the
+    raw numeric columns, whatever dtype the ingestion compacted them to, so the group computes in the
+    same precision in training and serving; as last step it casts the dense or sparse output of the
+    group to the configured dtype before the ColumnTransformer stacks the groups.
+    """
+
+    def __init__(self, dtype: str = "float64"):
+        """
+        :param dtype: output dtype, e.g. float32
+        """
+        self.dtype = dtype
+
+    def fit(self, X, y=None):
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def transform(self, X):
+        try:
+            if sparse.issparse(X):
+                return X.astype(self.dtype)
+            if isinstance(X, DataFrame):
+                return X.to_numpy(dtype=self.dtype, na_value=np.nan)
+            return np.asarray(X, dtype=self.dtype)
+        except Exception as e:
+            raise TravelException(e, sys) from e
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import hashlib
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.utils.cache_utils import get_object_hash
+
+
+# bytes of an array hashed at a time, a memory mapped matrix is read block by block instead of copied
+FINGERPRINT_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def update_array_hash(data_hash: object, array: np.ndarray) -> None:
+    """
+    feed the C ordered bytes of an array to a hash in blocks of rows, a contiguous block is hashed
+    through a memoryview without copying it
+    """
+    array = np.atleast_1d(array)
+    row_bytes = max(array.itemsize * int(np.prod(array.shape[1:])), 1)
+    rows_per_block = max(FINGERPRINT_BLOCK_SIZE // row_bytes, 1)
+    for start in range(0, len(array), rows_per_block):
+        data_hash.update(memoryview(np.ascontiguousarray(array[start:start + rows_per_block])).cast("B"))
+
+
+def get_data_fingerprint(X, y, sample_weight=None) -> str:
+    """
+    sha256 of the content of a dense or sparse feature matrix, target and optional sample weights
+    X: np.array, np.memmap or scipy sparse matrix
+    y: target
+    sample_weight: optional weights of the rows
+    return: hex digest
+    """
+    try:
+        data_hash = hashlib.sha256()
+        if sparse.issparse(X):
+            X = sparse.csr_matrix(X)
+            arrays = [X.data, X.indices, X.indptr, np.asarray(X.shape)]
+        else:
+            arrays = [np.asarray(X), np.asarray(X.shape)]
+        arrays.append(np.asarray(y))
+        if sample_weight is not None:
+            arrays.append(np.asarray(sample_weight))
+        for array in arrays:
+            data_hash.update(str(array.dtype).encode())
+            update_array_hash(data_hash, array)
+        return data_hash.hexdigest()
+    except Exception as e:
+        raise TravelException(e, sys) from e
+
+
+class TrialStore:
+    """
+    Append only json lines store of finished cross validation fits of one model.
+
+    Every fit is written as soon as it finishes, keyed by a hash of everything its score depends on
+    (estimator, parameters, rows, fold, scoring and data fingerprint), so an interrupted or repeated
+    search reads the recorded fits back instead of fitting them again.
+    """
+
+    def __init__(self, store_dir: str, name: str):
+        """
+        :param store_dir: directory of the trial store
+        :param name: name of the store file, one per model so parallel model searches never share a file
+        """
+        try:
+            self.file_path = os.path.join(store_dir, f"{name}.jsonl")
+            os.makedirs(store_dir, exist_ok=True)
+            self._trials = self.load()
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    @staticmethod
+    def get_trial_key(**description) -> str:
+        return get_object_hash(description)
+
+    def load(self) -> dict:
+        """
+        read the recorded trials, a line cut off by an interrupted write is skipped
+        """
+        trials = {}
+        if not os.path.exists(self.file_path):
+            return trials
+        with open(self.file_path, "r") as file_obj:
+            for line in file_obj:
+                try:
+                    trial = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                trials[trial["key"]] = trial
+        logging.info(f"Loaded {len(trials)} recorded trials from {self.file_path}")
+        return trials
+
+    def lookup(self, key: str) -> Optional[dict]:
+        return self._trials.get(key)
+
+    def record(self, key: str, trial: dict) -> None:
+        """
+        Method Name :   record
+        Description :   This method appends a finished trial to the store and flushes it to disk
+
+        Output      :   trial is written to the store file
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            trial = dict(trial, key=key)
+            with open(self.file_path, "a") as file_obj:
+                file_obj.write(json.dumps(trial) + "\n")
+                file_obj.flush()
+                os.fsync(file_obj.fileno())
+            self._trials[key] = trial
+        except Exception as e:
+            raise TravelException(e, sys) from e
@@ -0,0 +1,115 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from travel_pack.exception import TravelException
+from travel_pack.logger import logging
+from travel_pack.utils.dtype_utils import get_schema_column_types
+
+VIOLATION_TYPES = ["dtype", "null", "below_min", "above_max", "not_allowed"]
+
+
+class SchemaValidator:
+    """
+    Columnar validator of the schema.yaml column types and column_constraints.
+
+    Every chunk is checked with one vectorized pass per column and the violations are accumulated,
+    so a whole file is validated in a single linear scan whatever its size.
+    """
+
+    def __init__(self, schema_config: dict):
+        """
+        :param schema_config: dict content of schema.yaml
+        """
+        try:
+            self.column_types = get_schema_column_types(schema_config)
+            self.constraints = schema_config.get("column_constraints", {})
+            self.n_rows = 0
+            self.missing_columns = set()
+            self.violations = {column: dict.fromkeys(VIOLATION_TYPES, 0) for column in self.column_types}
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def _check_numeric(self, series: pd.Series, column_type: str, constraint: dict) -> dict:
+        values = pd.to_numeric(series, errors="coerce")
+        present = values.notna().to_numpy()
+        bad_dtype = series.notna().to_numpy() & ~present
+        if column_type == "int":
+            bad_dtype |= present & (np.mod(values.to_numpy(dtype=np.float64, na_value=np.nan), 1) != 0)
+        counts = {"dtype": int(bad_dtype.sum())}
+        if "min" in constraint:
+            counts["below_min"] = int((values < constraint["min"]).sum())
+        if "max" in constraint:
+            counts["above_max"] = int((values > constraint["max"]).sum())
+        if "allowed" in constraint:
+            counts["not_allowed"] = int((present & ~values.isin(constraint["allowed"]).to_numpy()).sum())
+        return counts
+
+    @staticmethod
+    def _check_category(series: pd.Series, constraint: dict) -> dict:
+        if "allowed" not in constraint:
+            return {}
+        allowed = [str(value) for value in constraint["allowed"]]
+        present = series.notna()
+        return {"not_allowed": int((present & ~series.astype(str).isin(allowed)).sum())}
+
+    def validate(self, dataframe: DataFrame) -> None:
+        """
+        Method Name :   validate
+        Description :   This method checks dtype, nullability, numeric ranges and allowed values of one chunk
+
+        Output      :   violation counts are accumulated per column
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            self.n_rows += len(dataframe)
+            for column, column_type in self.column_types.items():
+                if column not in dataframe.columns:
+                    self.missing_columns.add(column)
+                    continue
+                series = dataframe[column]
+                constraint = self.constraints.get(column, {})
+                if column_type == "category":
+                    counts = self._check_category(series, constraint)
+                else:
+                    counts = self._check_numeric(series, column_type, constraint)
+                if constraint.get("nullable", True) is False:
+                    counts["null"] = int(series.isna().sum())
+                for violation_type, count in counts.items():
+                    self.violations[column][violation_type] += count
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def validate_file(self, file_path: str, chunk_size: int) -> None:
+        """
+        Method Name :   validate_file
+        Description :   This method validates a csv file chunk by chunk
+
+        Output      :   violation counts are accumulated per column
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        try:
+            for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+                self.validate(chunk)
+            logging.info(f"Validated {self.n_rows} rows of {file_path}")
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    @property
+    def is_valid(self) -> bool:
+        return len(self.missing_columns) == 0 and all(
+            count == 0 for counts in self.violations.values() for count in counts.values())
+
+    def get_report(self) -> dict:
+        """
+        validation report with the violation counts of every column which has violations
+        """
+        return {
+            "n_rows": self.n_rows,
+            "is_valid": self.is_valid,
+            "missing_columns": sorted(self.missing_columns),
+            "violations": {column: {violation_type: count for violation_type, count in counts.items() if count > 0}
+                           for column, counts in self.violations.items() if any(counts.values())},
+        }
@@ -0,0 +1,49 @@
+import sys
+import copy
+
+import numpy as np
+from sklearn.base import clone
+
+from travel_pack.exception import TravelException
+from travel_pack.utils.cache_utils import get_object_hash
+from travel_pack.utils.xgb_utils import is_xgboost_classifier
+
+
+def get_preprocessor_signature(preprocessor: object) -> str:
+    """
+    hash of the configuration and input columns of a preprocessor, independent of its fitted statistics,
+    so a preprocessor refitted on new data keeps its signature while a changed column layout does not
+    """
+    return get_object_hash({"type": type(preprocessor).__name__,
+                            "params": preprocessor.get_params(deep=True),
+                            "feature_names_in": [str(name) for name in getattr(preprocessor, "feature_names_in_", [])]})
+
+
+def supports_warm_start(estimator: object) -> bool:
+    return is_xgboost_classifier(estimator) or (
+        "warm_start" in estimator.get_params() and "n_estimators" in estimator.get_params())
+
+
+def warm_start_estimator(estimator: object, X, y: np.ndarray, n_estimators: int) -> object:
+    """
+    continue training a fitted ensemble on new rows, the fitted estimator itself is left unchanged
+    estimator: fitted XGBClassifier, or a fitted sklearn ensemble with warm_start (e.g. RandomForestClassifier)
+    X: new rows transformed with the estimator's preprocessor
+    y: target of the new rows
+    n_estimators: number of boosting rounds or trees added
+    return: estimator with the added rounds or trees
+    """
+    try:
+        if is_xgboost_classifier(estimator):
+            model = clone(estimator).set_params(n_estimators=n_estimators)
+            model.fit(X, y, xgb_model=estimator.get_booster())
+            # the booster holds the production rounds too, the ONNX converter counts classes by n_estimators
+            return model.set_params(n_estimators=model.get_booster().num_boosted_rounds())
+        if not supports_warm_start(estimator):
+            raise Exception(f"{type(estimator).__name__} does not support warm start")
+        model = copy.deepcopy(estimator)
+        model.set_params(warm_start=True, n_estimators=estimator.n_estimators + n_estimators)
+        model.fit(X, y)
+        return model.set_params(warm_start=False)
+    except Exception as e:
+        raise TravelException(e, sys) from e
@@ -0,0 +1,87 @@
+import sys
+import time
+
+import numpy as np
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from travel_pack.exception import TravelException
+
+XGB_MAX_BIN = 256
+
+# scorer name -> (metric function, metric takes probabilities)
+SCORE_FUNCTIONS = {
+    "f1": (f1_score, False),
+    "accuracy": (accuracy_score, False),
+    "precision": (precision_score, False),
+    "recall": (recall_score, False),
+    "roc_auc": (roc_auc_score, True),
+}
+
+
+def is_xgboost_classifier(estimator: object) -> bool:
+    return isinstance(estimator, xgb.XGBClassifier)
+
+
+class XGBFoldData:
+    """
+    Quantized XGBoost training data of one cross validation fold, shared by all candidates of the fold.
+
+    The fold's train rows are split into a fit part, built once as a hist QuantileDMatrix, and a validation
+    part used for early stopping. The test rows reuse the quantile cuts of the fit part, so every
+    candidate trains from the same quantized bins instead of sketching the dense array again.
+    """
+
+    def __init__(self, X, y, train_rows: np.ndarray, test_rows: np.ndarray, validation_fraction: float = 0.1,
+                 max_bin: int = XGB_MAX_BIN, random_state: int = None, sample_weight: np.ndarray = None):
+        """
+        :param X: feature matrix
+        :param y: target
+        :param train_rows: rows of the fold used for training and early stopping
+        :param test_rows: rows of the fold used for scoring
+        :param validation_fraction: share of the train rows used for early stopping
+        :param max_bin: number of histogram bins of the quantized data
+        :param random_state: seed of the validation split
+        :param sample_weight: optional weights of all rows, applied to the fit and validation rows
+        """
+        try:
+            fit_rows, validation_rows = train_test_split(train_rows, test_size=validation_fraction,
+                                                         stratify=y[train_rows], random_state=random_state)
+            self.max_bin = max_bin
+            fit_weight, validation_weight = (None, None) if sample_weight is None else \
+                (sample_weight[fit_rows], sample_weight[validation_rows])
+            self.dfit = xgb.QuantileDMatrix(X[fit_rows], y[fit_rows], weight=fit_weight, max_bin=max_bin)
+            self.dvalidation = xgb.QuantileDMatrix(X[validation_rows], y[validation_rows], weight=validation_weight,
+                                                   ref=self.dfit)
+            self.dtest = xgb.QuantileDMatrix(X[test_rows], ref=self.dfit)
+            self.y_test = y[test_rows]
+        except Exception as e:
+            raise TravelException(e, sys) from e
+
+    def fit_and_score(self, estimator: object, params: dict, scoring: str, early_stopping_rounds: int,
+                      n_threads: int = 1) -> dict:
+        """
+        train the booster of an XGBClassifier with params on the shared fold data, with n_estimators
+        as the upper bound of boosting rounds, and score it on the test rows
+        return: dict with the score, fit time and number of trees kept by early stopping
+        """
+        try:
+            model = clone(estimator).set_params(**params)
+            xgb_params = {name: value for name, value in model.get_xgb_params().items()
+                          if value is not None and name != "n_jobs"}
+            xgb_params.update(tree_method="hist", max_bin=self.max_bin, nthread=n_threads)
+            start_time = time.perf_counter()
+            booster = xgb.train(xgb_params, self.dfit, num_boost_round=model.get_params()["n_estimators"] or 100,
+                                evals=[(self.dvalidation, "validation")],
+                                early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+            fit_seconds = time.perf_counter() - start_time
+            n_estimators = booster.best_iteration + 1
+            probabilities = booster.predict(self.dtest, iteration_range=(0, n_estimators))
+            score_function, uses_probabilities = SCORE_FUNCTIONS[scoring]
+            predictions = probabilities if uses_probabilities else (probabilities > 0.5).astype(self.y_test.dtype)
+            return {"score": float(score_function(self.y_test, predictions)), "fit_seconds": fit_seconds,
+                    "n_estimators": int(n_estimators)}
+        except Exception as e:
+            raise TravelException(e, sys) from e